@@ -18,7 +18,7 @@ import network_oft
 import torch
 from typing import Union
 
-from modules import shared, devices, sd_models, errors, scripts, sd_hijack
+from modules import shared, devices, sd_models, errors, scripts, sd_hijack, file_index
 import modules.textual_inversion.textual_inversion as textual_inversion
 import modules.models.sd3.mmdit
 
@@ -648,29 +648,35 @@ def network_MultiheadAttention_load_state_dict(self, *args, **kwargs):
 
 
 def process_network_files(names: list[str] | None = None):
-    candidates = list(shared.walk_files(shared.cmd_opts.lora_dir, allowed_extensions=[".pt", ".ckpt", ".safetensors"]))
-    candidates += list(shared.walk_files(shared.cmd_opts.lyco_dir_backcompat, allowed_extensions=[".pt", ".ckpt", ".safetensors"]))
-    for filename in candidates:
-        if os.path.isdir(filename):
-            continue
+    candidates = list(file_index.index.walk_files(shared.cmd_opts.lora_dir, allowed_extensions=[".pt", ".ckpt", ".safetensors"]))
+    candidates += list(file_index.index.walk_files(shared.cmd_opts.lyco_dir_backcompat, allowed_extensions=[".pt", ".ckpt", ".safetensors"]))
+    for file in candidates:
+        filename = file.path
         name = os.path.splitext(os.path.basename(filename))[0]
         # if names is provided, only load networks with names in the list
         if names and name not in names:
             continue
         try:
-            entry = network.NetworkOnDisk(name, filename)
+            entry = networks_on_disk.get(file, lambda name=name, filename=filename: network.NetworkOnDisk(name, filename))
         except OSError:  # should catch FileNotFoundError and PermissionError etc.
             errors.report(f"Failed to load network {name} from {filename}", exc_info=True)
             continue
 
         available_networks[name] = entry
 
+        # an entry kept from an earlier refresh does not add itself to the lookup again, as that happens in set_hash
+        if entry.shorthash:
+            available_network_hash_lookup[entry.shorthash] = entry
+
         if entry.alias in available_network_aliases:
             forbidden_network_aliases[entry.alias.lower()] = 1
 
         available_network_aliases[name] = entry
         available_network_aliases[entry.alias] = entry
 
+    if not names:
+        networks_on_disk.retain(file.path for file in candidates)
+
 
 def update_available_networks_by_names(names: list[str]):
     process_network_files(names)
@@ -727,6 +733,7 @@ originals: lora_patches.LoraPatches = None
 extra_network_lora = None
 
 available_networks = {}
+networks_on_disk = file_index.FileObjects()
 available_network_aliases = {}
 loaded_networks = []
 loaded_bundle_embeddings = {}
@@ -244,7 +244,7 @@ def apply_masks(
     return masks_for_overlay
 
 
-def weighted_histogram_filter(img, kernel, kernel_center, percentile_min=0.0, percentile_max=1.0, min_width=1.0):
+def weighted_histogram_filter(img, kernel, kernel_center, percentile_min=0.0, percentile_max=1.0, min_width=1.0, rows_per_chunk=64):
     """
     Generalization convolution filter capable of applying
     weighted mean, median, maximum, and minimum filters
@@ -266,106 +266,73 @@ def weighted_histogram_filter(img, kernel, kernel_center, percentile_min=0.0, pe
         min_width (float):
             The minimum size of the histogram window bounds, in weight units.
             Must be greater than 0.
+        rows_per_chunk (int):
+            How many rows of the image are filtered at once; bounds the
+            memory used, which is about rows * width * kernel size floats.
 
     Returns:
         (nparray): A filtered copy of the input image "img", a 2-D array of floats.
     """
 
-    # Converts an index tuple into a vector.
-    def vec(x):
-        return np.array(x)
+    kernel = np.asarray(kernel, dtype=np.float64)
+    kernel_center = np.broadcast_to(np.asarray(kernel_center), (2,))
+    pad_before = kernel_center
+    pad_after = np.array(kernel.shape) - kernel_center - 1
+
+    # Parts of the kernel that fall outside the image are given zero weight, which
+    # makes them drop out of the histogram just like skipping them would.
+    pad = ((pad_before[0], pad_after[0]), (pad_before[1], pad_after[1]))
+    padded_img = np.pad(img.astype(np.float64), pad)
+    padded_weights = np.pad(np.ones(img.shape), pad)
+
+    # Every pixel's neighborhood as a flat list of samples: shape (H, W, kernel size).
+    value_windows = np.lib.stride_tricks.sliding_window_view(padded_img, kernel.shape)
+    weight_windows = np.lib.stride_tricks.sliding_window_view(padded_weights, kernel.shape) * kernel
+
+    img_out = np.empty_like(img)
+
+    for start in range(0, img.shape[0], rows_per_chunk):
+        rows = slice(start, start + rows_per_chunk)
+        values = value_windows[rows].reshape(*value_windows[rows].shape[:2], -1)
+        weights = weight_windows[rows].reshape(*weight_windows[rows].shape[:2], -1)
 
-    kernel_min = -kernel_center
-    kernel_max = vec(kernel.shape) - kernel_center
-
-    def weighted_histogram_filter_single(idx):
-        idx = vec(idx)
-        min_index = np.maximum(0, idx + kernel_min)
-        max_index = np.minimum(vec(img.shape), idx + kernel_max)
-        window_shape = max_index - min_index
-
-        class WeightedElement:
-            """
-            An element of the histogram, its weight
-            and bounds.
-            """
-
-            def __init__(self, value, weight):
-                self.value: float = value
-                self.weight: float = weight
-                self.window_min: float = 0.0
-                self.window_max: float = 1.0
-
-        # Collect the values in the image as WeightedElements,
-        # weighted by their corresponding kernel values.
-        values = []
-        for window_tup in np.ndindex(tuple(window_shape)):
-            window_index = vec(window_tup)
-            image_index = window_index + min_index
-            centered_kernel_index = image_index - idx
-            kernel_index = centered_kernel_index + kernel_center
-            element = WeightedElement(img[tuple(image_index)], kernel[tuple(kernel_index)])
-            values.append(element)
-
-        def sort_key(x: WeightedElement):
-            return x.value
-
-        values.sort(key=sort_key)
-
-        # Calculate the height of the stack (sum)
-        # and each sample's range they occupy in the stack
-        sum = 0
-        for i in range(len(values)):
-            values[i].window_min = sum
-            sum += values[i].weight
-            values[i].window_max = sum
+        # Sort the samples of each histogram by value, and calculate
+        # the range each sample occupies in the stack of weights.
+        order = np.argsort(values, axis=-1, kind="stable")
+        values = np.take_along_axis(values, order, axis=-1)
+        weights = np.take_along_axis(weights, order, axis=-1)
+
+        element_max = np.cumsum(weights, axis=-1)
+        element_min = element_max - weights
+        total = element_max[..., -1:]
 
         # Calculate what range of this stack ("window")
         # we want to get the weighted average across.
-        window_min = sum * percentile_min
-        window_max = sum * percentile_max
-        window_width = window_max - window_min
+        window_min = total * percentile_min
+        window_max = total * percentile_max
 
         # Ensure the window is within the stack and at least a certain size.
-        if window_width < min_width:
-            window_center = (window_min + window_max) / 2
-            window_min = window_center - min_width / 2
-            window_max = window_center + min_width / 2
-
-            if window_max > sum:
-                window_max = sum
-                window_min = sum - min_width
+        too_narrow = window_max - window_min < min_width
+        window_center = (window_min + window_max) / 2
+        window_min = np.where(too_narrow, window_center - min_width / 2, window_min)
+        window_max = np.where(too_narrow, window_center + min_width / 2, window_max)
 
-            if window_min < 0:
-                window_min = 0
-                window_max = min_width
+        past_end = too_narrow & (window_max > total)
+        window_max = np.where(past_end, total, window_max)
+        window_min = np.where(past_end, total - min_width, window_min)
 
-        value = 0
-        value_weight = 0
+        before_start = too_narrow & (window_min < 0)
+        window_min = np.where(before_start, 0, window_min)
+        window_max = np.where(before_start, min_width, window_max)
 
         # Get the weighted average of all the samples
         # that overlap with the window, weighted
         # by the size of their overlap.
-        for i in range(len(values)):
-            if window_min >= values[i].window_max:
-                continue
-            if window_max <= values[i].window_min:
-                break
-
-            s = max(window_min, values[i].window_min)
-            e = min(window_max, values[i].window_max)
-            w = e - s
-
-            value += values[i].value * w
-            value_weight += w
-
-        return value / value_weight if value_weight != 0 else 0
-
-    img_out = img.copy()
+        overlap = np.clip(np.minimum(window_max, element_max) - np.maximum(window_min, element_min), 0, None)
+        value = np.sum(values * overlap, axis=-1)
+        value_weight = np.sum(overlap, axis=-1)
 
-    # Apply the kernel operation over each pixel.
-    for index in np.ndindex(img.shape):
-        img_out[index] = weighted_histogram_filter_single(index)
+        img_out[rows] = np.divide(value, value_weight, out=np.zeros_like(value), where=value_weight != 0)
 
     return img_out
 
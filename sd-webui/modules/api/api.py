@@ -1,6 +1,9 @@
 import base64
 import io
+import json
 import os
+import queue
+import threading
 import time
 import datetime
 import uvicorn
@@ -12,26 +15,27 @@ from io import BytesIO
 from fastapi import APIRouter, Depends, FastAPI, Request, Response
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.exceptions import HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 from secrets import compare_digest
 
 import modules.shared as shared
-from modules import sd_samplers, deepbooru, sd_hijack, images, scripts, ui, postprocessing, errors, restart, shared_items, script_callbacks, infotext_utils, sd_models, sd_schedulers
-from modules.api import models
+from modules import sd_samplers, sd_hijack, images, scripts, errors, restart, shared_items, script_callbacks, infotext_utils, sd_models, sd_schedulers, worker_pool, priority_lock, metrics, profiling, initialize, prefetch
+from modules.api import models, jobs
 from modules.shared import opts
 from modules.processing import StableDiffusionProcessingTxt2Img, StableDiffusionProcessingImg2Img, process_images
 from modules.textual_inversion.textual_inversion import create_embedding, train_embedding
 from modules.hypernetworks.hypernetwork import create_hypernetwork, train_hypernetwork
 from PIL import PngImagePlugin
+from pydantic import ValidationError
 from modules.sd_models_config import find_checkpoint_config_near_filename
 from modules.realesrgan_model import get_realesrgan_models
 from modules import devices
 from typing import Any
 import piexif
 import piexif.helper
-from contextlib import closing
-from modules.progress import create_task_id, add_task_to_queue, start_task, finish_task, current_task
+from contextlib import closing, contextmanager, nullcontext
+from modules.progress import create_task_id, add_task_to_queue, remove_task_from_queue, start_task, finish_task, current_task
 
 def script_name_to_index(name, scripts):
     try:
@@ -99,30 +103,93 @@ def decode_base64_to_image(encoding):
         raise HTTPException(status_code=500, detail="Invalid encoded image") from e
 
 
-def encode_pil_to_base64(image):
+response_encoding_keys = ('image_format', 'image_quality', 'image_lossless')
+saved_image_extensions = {"png": (".png",), "jpg": (".jpg", ".jpeg"), "jpeg": (".jpg", ".jpeg"), "webp": (".webp",)}
+
+# image_quality is the compression level for PNG and the quality for JPEG and WebP
+image_quality_ranges = {"png": (0, 9), "jpg": (1, 100), "jpeg": (1, 100), "webp": (1, 100)}
+
+
+def encode_pil_to_base64(image, image_format=None, quality=None, lossless=None):
+    if isinstance(image, str):
+        return image
+
+    with metrics.stage_seconds.time(stage="image_encode"):
+        return encode_image_to_base64(image, image_format, quality, lossless)
+
+
+def encode_images_to_base64(images_list, image_format=None, quality=None, lossless=None):
+    """Encodes the images of a response in api_encode_workers threads at once; Pillow does not hold the GIL while compressing."""
+
+    if len(images_list) <= 1 or opts.api_encode_workers <= 1:
+        return [encode_pil_to_base64(image, image_format, quality, lossless) for image in images_list]
+
+    def encode(image):
+        return encode_pil_to_base64(image, image_format, quality, lossless)
+
+    res = []
+    for _, encoded, error in prefetch.prefetch(encode, images_list, workers=opts.api_encode_workers, ahead=len(images_list)):
+        if error is not None:
+            raise error
+
+        res.append(encoded)
+
+    return res
+
+
+def read_saved_image(image, image_format, quality, lossless):
+    """Returns the bytes of the file images.save_image() wrote for image if it is already in the requested format, or None.
+
+    Files are saved with jpeg_quality and webp_lossless, so a JPEG or WebP file is only used if the request did not ask
+    for a different quality; PNG is lossless at any compression level. With save_images_replace_action set to "Replace",
+    a later image can have overwritten the file, so it is not used then.
+    """
+
+    if opts.save_images_replace_action == "Replace":
+        return None
+
+    filename = getattr(image, 'already_saved_as', None)
+    if not filename or os.path.splitext(filename)[1].lower() not in saved_image_extensions.get(image_format, ()):
+        return None
+
+    if image_format != "png" and (quality not in (None, opts.jpeg_quality) or lossless not in (None, opts.webp_lossless)):
+        return None
+
+    try:
+        with open(filename, "rb") as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def encode_image_to_base64(image, image_format=None, quality=None, lossless=None):
+    image_format = (image_format or opts.samples_format).lower()
+
+    bytes_data = read_saved_image(image, image_format, quality, lossless)
+    if bytes_data is not None:
+        return base64.b64encode(bytes_data)
+
     with io.BytesIO() as output_bytes:
-        if isinstance(image, str):
-            return image
-        if opts.samples_format.lower() == 'png':
+        if image_format == 'png':
             use_metadata = False
             metadata = PngImagePlugin.PngInfo()
             for key, value in image.info.items():
                 if isinstance(key, str) and isinstance(value, str):
                     metadata.add_text(key, value)
                     use_metadata = True
-            image.save(output_bytes, format="PNG", pnginfo=(metadata if use_metadata else None), quality=opts.jpeg_quality)
+            image.save(output_bytes, format="PNG", pnginfo=(metadata if use_metadata else None), compress_level=6 if quality is None else quality)
 
-        elif opts.samples_format.lower() in ("jpg", "jpeg", "webp"):
+        elif image_format in ("jpg", "jpeg", "webp"):
             if image.mode in ("RGBA", "P"):
                 image = image.convert("RGB")
             parameters = image.info.get('parameters', None)
             exif_bytes = piexif.dump({
                 "Exif": { piexif.ExifIFD.UserComment: piexif.helper.UserComment.dump(parameters or "", encoding="unicode") }
             })
-            if opts.samples_format.lower() in ("jpg", "jpeg"):
-                image.save(output_bytes, format="JPEG", exif = exif_bytes, quality=opts.jpeg_quality)
+            if image_format in ("jpg", "jpeg"):
+                image.save(output_bytes, format="JPEG", exif = exif_bytes, quality=opts.jpeg_quality if quality is None else quality)
             else:
-                image.save(output_bytes, format="WEBP", exif = exif_bytes, quality=opts.jpeg_quality)
+                image.save(output_bytes, format="WEBP", exif = exif_bytes, quality=opts.jpeg_quality if quality is None else quality, lossless=opts.webp_lossless if lossless is None else lossless)
 
         else:
             raise HTTPException(status_code=500, detail="Invalid image format")
@@ -132,6 +199,61 @@ def encode_pil_to_base64(image):
     return base64.b64encode(bytes_data)
 
 
+def response_encoding(req):
+    """Returns the image encoding asked for in a request as keyword arguments for encode_images_to_base64()."""
+
+    image_format = req.image_format.lower() if req.image_format else None
+    if image_format is not None and image_format not in saved_image_extensions:
+        raise HTTPException(status_code=422, detail=f"Invalid image format: {req.image_format}")
+
+    if req.image_quality is not None:
+        low, high = image_quality_ranges.get(image_format or opts.samples_format.lower(), (1, 100))
+        if not low <= req.image_quality <= high:
+            raise HTTPException(status_code=422, detail=f"Invalid image quality: {req.image_quality}, must be between {low} and {high}")
+
+    return {"image_format": image_format, "quality": req.image_quality, "lossless": req.image_lossless}
+
+
+def run_streamed(lock, results):
+    """Runs the generator function results in a thread of its own while holding lock, and yields what it yields.
+
+    The lock is taken and released by that one thread however the consumer is driven, e.g. by a StreamingResponse from
+    varying threads of a pool. If the consumer stops early, like when the client disconnects, the generator is closed
+    at its next item and the lock is released then, rather than whenever the consumer is garbage collected.
+    """
+
+    items = queue.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def run():
+        try:
+            with lock, closing(results()) as generator:
+                for item in generator:
+                    if stop.is_set():
+                        break
+
+                    items.put((item, None))
+        except Exception as e:
+            items.put((None, e))
+        finally:
+            items.put((done, None))
+
+    threading.Thread(target=run, daemon=True).start()
+
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+
+            yield item
+    finally:
+        stop.set()
+
+
 def api_middleware(app: FastAPI):
     rich_available = False
     try:
@@ -151,6 +273,9 @@ def api_middleware(app: FastAPI):
         duration = str(round(time.time() - ts, 4))
         res.headers["X-Process-Time"] = duration
         endpoint = req.scope.get('path', 'err')
+        if endpoint.startswith('/sdapi'):
+            route = req.scope.get('route')
+            metrics.api_requests.inc(endpoint=route.path if route is not None else endpoint, code=res.status_code)
         if shared.cmd_opts.api_log and endpoint.startswith('/sdapi'):
             print('API {t} {code} {prot}/{ver} {method} {endpoint} {cli} {duration}'.format(
                 t=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"),
@@ -207,6 +332,13 @@ class Api:
         self.router = APIRouter()
         self.app = app
         self.queue_lock = queue_lock
+        self.worker_pool = worker_pool.create_pool(shared.cmd_opts.api_workers, shared.cmd_opts.api_stub_workers, local_handlers={"txt2img": self.process_txt2img, "img2img": self.process_img2img})
+        self.jobs = jobs.JobManager(
+            handlers={"txt2img": self.text2imgapi, "img2img": self.img2imgapi},
+            runners=len(self.worker_pool.workers) + 1 if self.worker_pool is not None else 2,
+            store_size_limit=int(opts.api_jobs_store_size * 2**20),
+            ttl=opts.api_jobs_result_ttl * 3600,
+        )
         api_middleware(self.app)
         self.add_api_route("/sdapi/v1/txt2img", self.text2imgapi, methods=["POST"], response_model=models.TextToImageResponse)
         self.add_api_route("/sdapi/v1/img2img", self.img2imgapi, methods=["POST"], response_model=models.ImageToImageResponse)
@@ -215,8 +347,15 @@ class Api:
         self.add_api_route("/sdapi/v1/png-info", self.pnginfoapi, methods=["POST"], response_model=models.PNGInfoResponse)
         self.add_api_route("/sdapi/v1/progress", self.progressapi, methods=["GET"], response_model=models.ProgressResponse)
         self.add_api_route("/sdapi/v1/interrogate", self.interrogateapi, methods=["POST"])
+        self.add_api_route("/sdapi/v1/interrogate/batch", self.interrogate_batch_api, methods=["POST"], response_model=models.InterrogateBatchResponse)
         self.add_api_route("/sdapi/v1/interrupt", self.interruptapi, methods=["POST"])
         self.add_api_route("/sdapi/v1/skip", self.skip, methods=["POST"])
+        self.add_api_route("/sdapi/v1/queue", self.get_queue, methods=["GET"], response_model=models.QueueResponse)
+        self.add_api_route("/sdapi/v1/queue/cancel", self.cancel_task, methods=["POST"])
+        self.add_api_route("/sdapi/v1/jobs", self.submit_job, methods=["POST"], response_model=models.JobSubmitResponse)
+        self.add_api_route("/sdapi/v1/jobs/batch", self.submit_jobs_batch, methods=["POST"], response_model=list[models.JobSubmitResponse])
+        self.add_api_route("/sdapi/v1/jobs/{id_task}", self.get_job, methods=["GET"], response_model=models.JobStatusResponse)
+        self.add_api_route("/sdapi/v1/jobs/{id_task}", self.delete_job, methods=["DELETE"])
         self.add_api_route("/sdapi/v1/options", self.get_config, methods=["GET"], response_model=models.OptionsModel)
         self.add_api_route("/sdapi/v1/options", self.set_config, methods=["POST"])
         self.add_api_route("/sdapi/v1/cmd-flags", self.get_cmd_flags, methods=["GET"], response_model=models.FlagsModel)
@@ -244,6 +383,10 @@ class Api:
         self.add_api_route("/sdapi/v1/scripts", self.get_scripts_list, methods=["GET"], response_model=models.ScriptsList)
         self.add_api_route("/sdapi/v1/script-info", self.get_script_info, methods=["GET"], response_model=list[models.ScriptInfo])
         self.add_api_route("/sdapi/v1/extensions", self.get_extensions_list, methods=["GET"], response_model=list[models.ExtensionItem])
+        self.add_api_route("/sdapi/v1/traces", self.get_traces, methods=["GET"], response_model=list[str])
+        self.add_api_route("/sdapi/v1/traces/{trace_id}", self.get_trace, methods=["GET"])
+        self.add_api_route("/sdapi/v1/traces/{trace_id}/timeline", self.get_trace_timeline, methods=["GET"])
+        self.add_api_route("/metrics", self.get_metrics, methods=["GET"], response_class=PlainTextResponse)
 
         if shared.cmd_opts.api_server_stop:
             self.add_api_route("/sdapi/v1/server-kill", self.kill_webui, methods=["POST"])
@@ -256,7 +399,14 @@ class Api:
         txt2img_script_runner = scripts.scripts_txt2img
         img2img_script_runner = scripts.scripts_img2img
 
-        if not txt2img_script_runner.scripts or not img2img_script_runner.scripts:
+        if initialize.api_fast_startup():
+            # only the scripts' controls are created, for their positions in script_args and their default values
+            for script_runner, is_img2img in ((txt2img_script_runner, False), (img2img_script_runner, True)):
+                if not script_runner.scripts:
+                    script_runner.initialize_scripts(is_img2img)
+                    script_runner.setup_ui_without_layout()
+        elif not txt2img_script_runner.scripts or not img2img_script_runner.scripts:
+            from modules import ui
             ui.create_ui()
 
         if not txt2img_script_runner.scripts:
@@ -429,8 +579,61 @@ class Api:
 
         return params
 
+    @contextmanager
+    def queued(self, task_id, priority="normal", client_id=None, queue_timeout=None):
+        """Waits for the queue lock as task_id; responds with an error if the task gets cancelled or misses its deadline while queued."""
+
+        try:
+            self.queue_lock.acquire(id_task=task_id, priority=priority or "normal", client=client_id, timeout=queue_timeout)
+        except ValueError as e:
+            remove_task_from_queue(task_id)
+            raise HTTPException(status_code=422, detail=str(e)) from e
+        except priority_lock.TaskCancelled as e:
+            remove_task_from_queue(task_id)
+            raise HTTPException(status_code=409, detail=str(e)) from e
+        except priority_lock.TaskExpired as e:
+            remove_task_from_queue(task_id)
+            raise HTTPException(status_code=503, detail=str(e)) from e
+
+        self.jobs.started(task_id)
+
+        try:
+            yield
+        finally:
+            self.queue_lock.release()
+
+    def run_on_worker_pool(self, kind, req, response_model):
+        try:
+            priority_lock.priority_index(req.priority or "normal")
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e)) from e
+
+        task_id = req.force_task_id or create_task_id(kind)
+        req.force_task_id = task_id
+
+        try:
+            result = self.worker_pool.run(task_id, kind, req, priority=req.priority or "normal", on_start=lambda: self.jobs.started(task_id))
+        except priority_lock.TaskCancelled as e:
+            raise HTTPException(status_code=409, detail=str(e)) from e
+        if isinstance(result, dict):  # remote and stub workers return the JSON body of their response
+            result = response_model(**result)
+
+        return result
+
     def text2imgapi(self, txt2imgreq: models.StableDiffusionTxt2ImgProcessingAPI):
+        if self.worker_pool is not None:
+            return self.run_on_worker_pool("txt2img", txt2imgreq, models.TextToImageResponse)
+
+        return self.process_txt2img(txt2imgreq)
+
+    def process_txt2img(self, txt2imgreq: models.StableDiffusionTxt2ImgProcessingAPI):
         task_id = txt2imgreq.force_task_id or create_task_id("txt2img")
+        encoding = response_encoding(txt2imgreq)
+
+        # upscalers and face restoration may still be loading with --api-fast-startup; plain txt2img does not need them
+        restore_faces = opts.face_restoration if txt2imgreq.restore_faces is None else txt2imgreq.restore_faces
+        if restore_faces or txt2imgreq.enable_hr or txt2imgreq.script_name or txt2imgreq.alwayson_scripts:
+            initialize.wait_for_deferred_startup()
 
         script_runner = scripts.scripts_txt2img
 
@@ -456,41 +659,72 @@ class Api:
         args.pop('script_args', None) # will refeed them to the pipeline directly after initializing them
         args.pop('alwayson_scripts', None)
         args.pop('infotext', None)
+        queue_args = {k: args.pop(k, None) for k in ('priority', 'client_id', 'queue_timeout')}
 
         script_args = self.init_script_args(txt2imgreq, self.default_script_arg_txt2img, selectable_scripts, selectable_script_idx, script_runner, input_script_args=infotext_script_args)
 
         send_images = args.pop('send_images', True)
         args.pop('save_images', None)
+        profile = args.pop('profile', False)
+        for key in response_encoding_keys:
+            args.pop(key, None)
+
+        if args.pop('preview', False):
+            # a quick look at what the request makes: TAESD instead of the full VAE, and none of the passes that only add detail
+            args['enable_hr'] = False
+            args['restore_faces'] = False
+            args['override_settings'] = {**(args.get('override_settings') or {}), 'sd_vae_decode_method': 'TAESD'}
+
+        if args.get('firstpass_image'):
+            # hires fix of an image made earlier, like a kept preview, instead of a new first pass
+            args['firstpass_image'] = decode_base64_to_image(args['firstpass_image'])
 
         add_task_to_queue(task_id)
 
-        with self.queue_lock:
+        with self.queued(task_id, **queue_args):
             with closing(StableDiffusionProcessingTxt2Img(sd_model=shared.sd_model, **args)) as p:
                 p.is_api = True
                 p.scripts = script_runner
                 p.outpath_grids = opts.outdir_txt2img_grids
                 p.outpath_samples = opts.outdir_txt2img_samples
 
+                p.trace_id = profiling.new_trace_id() if profile else None
+                profiler = profiling.Profiler(trace_id=p.trace_id) if p.trace_id is not None else None
+
                 try:
                     shared.state.begin(job="scripts_txt2img")
                     start_task(task_id)
-                    if selectable_scripts is not None:
-                        p.script_args = script_args
-                        processed = scripts.scripts_txt2img.run(p, *p.script_args) # Need to pass args as list here
-                    else:
-                        p.script_args = tuple(script_args) # Need to pass args as tuple here
-                        processed = process_images(p)
+                    with profiler or nullcontext():
+                        if selectable_scripts is not None:
+                            p.script_args = script_args
+                            processed = scripts.scripts_txt2img.run(p, *p.script_args) # Need to pass args as list here
+                        else:
+                            p.script_args = tuple(script_args) # Need to pass args as tuple here
+                            processed = process_images(p)
                     finish_task(task_id)
                 finally:
                     shared.state.end()
                     shared.total_tqdm.clear()
 
-        b64images = list(map(encode_pil_to_base64, processed.images)) if send_images else []
+        # written after the queue lock is released, so that the next task does not wait for it
+        if profiler is not None:
+            profiler.export()
+
+        b64images = encode_images_to_base64(processed.images, **encoding) if send_images else []
 
-        return models.TextToImageResponse(images=b64images, parameters=vars(txt2imgreq), info=processed.js())
+        return models.TextToImageResponse(images=b64images, parameters=vars(txt2imgreq), info=processed.js(), trace_id=p.trace_id)
 
     def img2imgapi(self, img2imgreq: models.StableDiffusionImg2ImgProcessingAPI):
+        if self.worker_pool is not None:
+            return self.run_on_worker_pool("img2img", img2imgreq, models.ImageToImageResponse)
+
+        return self.process_img2img(img2imgreq)
+
+    def process_img2img(self, img2imgreq: models.StableDiffusionImg2ImgProcessingAPI):
         task_id = img2imgreq.force_task_id or create_task_id("img2img")
+        encoding = response_encoding(img2imgreq)
+
+        initialize.wait_for_deferred_startup()
 
         init_images = img2imgreq.init_images
         if init_images is None:
@@ -526,15 +760,19 @@ class Api:
         args.pop('script_args', None)  # will refeed them to the pipeline directly after initializing them
         args.pop('alwayson_scripts', None)
         args.pop('infotext', None)
+        queue_args = {k: args.pop(k, None) for k in ('priority', 'client_id', 'queue_timeout')}
 
         script_args = self.init_script_args(img2imgreq, self.default_script_arg_img2img, selectable_scripts, selectable_script_idx, script_runner, input_script_args=infotext_script_args)
 
         send_images = args.pop('send_images', True)
         args.pop('save_images', None)
+        profile = args.pop('profile', False)
+        for key in response_encoding_keys:
+            args.pop(key, None)
 
         add_task_to_queue(task_id)
 
-        with self.queue_lock:
+        with self.queued(task_id, **queue_args):
             with closing(StableDiffusionProcessingImg2Img(sd_model=shared.sd_model, **args)) as p:
                 p.init_images = [decode_base64_to_image(x) for x in init_images]
                 p.is_api = True
@@ -542,40 +780,62 @@ class Api:
                 p.outpath_grids = opts.outdir_img2img_grids
                 p.outpath_samples = opts.outdir_img2img_samples
 
+                p.trace_id = profiling.new_trace_id() if profile else None
+                profiler = profiling.Profiler(trace_id=p.trace_id) if p.trace_id is not None else None
+
                 try:
                     shared.state.begin(job="scripts_img2img")
                     start_task(task_id)
-                    if selectable_scripts is not None:
-                        p.script_args = script_args
-                        processed = scripts.scripts_img2img.run(p, *p.script_args) # Need to pass args as list here
-                    else:
-                        p.script_args = tuple(script_args) # Need to pass args as tuple here
-                        processed = process_images(p)
+                    with profiler or nullcontext():
+                        if selectable_scripts is not None:
+                            p.script_args = script_args
+                            processed = scripts.scripts_img2img.run(p, *p.script_args) # Need to pass args as list here
+                        else:
+                            p.script_args = tuple(script_args) # Need to pass args as tuple here
+                            processed = process_images(p)
                     finish_task(task_id)
                 finally:
                     shared.state.end()
                     shared.total_tqdm.clear()
 
-        b64images = list(map(encode_pil_to_base64, processed.images)) if send_images else []
+        # written after the queue lock is released, so that the next task does not wait for it
+        if profiler is not None:
+            profiler.export()
+
+        b64images = encode_images_to_base64(processed.images, **encoding) if send_images else []
 
         if not img2imgreq.include_init_images:
             img2imgreq.init_images = None
             img2imgreq.mask = None
 
-        return models.ImageToImageResponse(images=b64images, parameters=vars(img2imgreq), info=processed.js())
+        return models.ImageToImageResponse(images=b64images, parameters=vars(img2imgreq), info=processed.js(), trace_id=p.trace_id)
 
     def extras_single_image_api(self, req: models.ExtrasSingleImageRequest):
+        from modules import postprocessing
+
+        initialize.wait_for_deferred_startup()
+
+        encoding = response_encoding(req)
         reqDict = setUpscalers(req)
+        for key in response_encoding_keys:
+            reqDict.pop(key, None)
 
         reqDict['image'] = decode_base64_to_image(reqDict['image'])
 
         with self.queue_lock:
             result = postprocessing.run_extras(extras_mode=0, image_folder="", input_dir="", output_dir="", save_output=False, **reqDict)
 
-        return models.ExtrasSingleImageResponse(image=encode_pil_to_base64(result[0][0]), html_info=result[1])
+        return models.ExtrasSingleImageResponse(image=encode_pil_to_base64(result[0][0], **encoding), html_info=result[1])
 
     def extras_batch_images_api(self, req: models.ExtrasBatchImagesRequest):
+        from modules import postprocessing
+
+        initialize.wait_for_deferred_startup()
+
+        encoding = response_encoding(req)
         reqDict = setUpscalers(req)
+        for key in response_encoding_keys:
+            reqDict.pop(key, None)
 
         image_list = reqDict.pop('imageList', [])
         image_folder = [decode_base64_to_image(x.data) for x in image_list]
@@ -583,7 +843,7 @@ class Api:
         with self.queue_lock:
             result = postprocessing.run_extras(extras_mode=1, image_folder=image_folder, image="", input_dir="", output_dir="", save_output=False, **reqDict)
 
-        return models.ExtrasBatchImagesResponse(images=list(map(encode_pil_to_base64, result[0])), html_info=result[1])
+        return models.ExtrasBatchImagesResponse(images=encode_images_to_base64(result[0], **encoding), html_info=result[1])
 
     def pnginfoapi(self, req: models.PNGInfoRequest):
         image = decode_base64_to_image(req.image.strip())
@@ -602,8 +862,10 @@ class Api:
     def progressapi(self, req: models.ProgressRequest = Depends()):
         # copy from check_progress_call of ui.py
 
+        workers = self.worker_pool.progress() if self.worker_pool is not None else None
+
         if shared.state.job_count == 0:
-            return models.ProgressResponse(progress=0, eta_relative=0, state=shared.state.dict(), textinfo=shared.state.textinfo)
+            return models.ProgressResponse(progress=0, eta_relative=0, state=shared.state.dict(), textinfo=shared.state.textinfo, workers=workers)
 
         # avoid dividing zero
         progress = 0.01
@@ -625,7 +887,7 @@ class Api:
         if shared.state.current_image and not req.skip_current_image:
             current_image = encode_pil_to_base64(shared.state.current_image)
 
-        return models.ProgressResponse(progress=progress, eta_relative=eta_relative, state=shared.state.dict(), current_image=current_image, textinfo=shared.state.textinfo, current_task=current_task)
+        return models.ProgressResponse(progress=progress, eta_relative=eta_relative, state=shared.state.dict(), current_image=current_image, textinfo=shared.state.textinfo, current_task=current_task, workers=workers)
 
     def interrogateapi(self, interrogatereq: models.InterrogateRequest):
         image_b64 = interrogatereq.image
@@ -640,15 +902,85 @@ class Api:
             if interrogatereq.model == "clip":
                 processed = shared.interrogator.interrogate(img)
             elif interrogatereq.model == "deepdanbooru":
+                from modules import deepbooru
                 processed = deepbooru.model.tag(img)
             else:
                 raise HTTPException(status_code=404, detail="Model not found")
 
         return models.InterrogateResponse(caption=processed)
 
+    def interrogate_batch_api(self, req: models.InterrogateBatchRequest):
+        if not req.images:
+            raise HTTPException(status_code=404, detail="Image not found")
+
+        if req.model not in ("clip", "deepdanbooru"):
+            raise HTTPException(status_code=404, detail="Model not found")
+
+        # decoded before anything is sent, so that a bad image is an error response rather than a broken stream
+        images = [decode_base64_to_image(x).convert('RGB') for x in req.images]
+
+        def interrogate():
+            if req.model == "clip":
+                yield from enumerate(shared.interrogator.interrogate_batch(images))
+            else:
+                from modules import deepbooru
+                yield from deepbooru.model.tag_batch(images)
+
+        if req.stream:
+            lines = (json.dumps({"index": index, "caption": caption}) + "\n" for index, caption in run_streamed(self.queue_lock, interrogate))
+            return StreamingResponse(lines, media_type="application/x-ndjson")
+
+        captions = [None] * len(req.images)
+        with self.queue_lock:
+            for index, caption in interrogate():
+                captions[index] = caption
+
+        return models.InterrogateBatchResponse(captions=captions)
+
+    def create_job(self, req: models.JobSubmitRequest):
+        try:
+            if req.type == "txt2img":
+                request = models.StableDiffusionTxt2ImgProcessingAPI(**req.request)
+            else:
+                request = models.StableDiffusionImg2ImgProcessingAPI(**req.request)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors()) from e
+
+        if req.type == "img2img" and request.init_images is None:
+            raise HTTPException(status_code=404, detail="Init image not found")
+
+        try:
+            job = self.jobs.submit(req.type, request)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e)) from e
+
+        return models.JobSubmitResponse(id_task=job.id_task, status=job.status)
+
+    def submit_job(self, req: models.JobSubmitRequest):
+        return self.create_job(req)
+
+    def submit_jobs_batch(self, req: models.JobBatchSubmitRequest):
+        return [self.create_job(x) for x in req.jobs]
+
+    def get_job(self, id_task: str):
+        job = self.jobs.get(id_task)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {id_task} not found")
+
+        return job
+
+    def delete_job(self, id_task: str):
+        if not self.jobs.delete(id_task):
+            raise HTTPException(status_code=404, detail=f"Job {id_task} not found or is running")
+
+        return {}
+
     def interruptapi(self):
         shared.state.interrupt()
 
+        if self.worker_pool is not None:
+            self.worker_pool.interrupt()
+
         return {}
 
     def unloadapi(self):
@@ -664,6 +996,23 @@ class Api:
     def skip(self):
         shared.state.skip()
 
+    def get_queue(self):
+        stats = self.queue_lock.stats()
+        if self.worker_pool is not None:
+            stats["worker_pool_queued"] = self.worker_pool.queued_tasks()
+
+        return stats
+
+    def cancel_task(self, req: models.CancelTaskRequest):
+        cancelled = self.queue_lock.cancel(req.id_task)
+        if not cancelled and self.worker_pool is not None:
+            cancelled = self.worker_pool.cancel(req.id_task)
+
+        if not cancelled:
+            raise HTTPException(status_code=404, detail=f"Task {req.id_task} is not queued")
+
+        return {}
+
     def get_config(self):
         options = {}
         for key in shared.opts.data.keys():
@@ -704,6 +1053,8 @@ class Api:
             for scheduler in sd_schedulers.schedulers]
 
     def get_upscalers(self):
+        initialize.wait_for_deferred_startup()
+
         return [
             {
                 "name": upscaler.name,
@@ -735,6 +1086,8 @@ class Api:
         return [{"name": name, "path": shared.hypernetworks[name]} for name in shared.hypernetworks]
 
     def get_face_restorers(self):
+        initialize.wait_for_deferred_startup()
+
         return [{"name":x.name(), "cmd_dir": getattr(x, "cmd_dir", None)} for x in shared.face_restorers]
 
     def get_realesrgan_models(self):
@@ -883,6 +1236,26 @@ class Api:
             cuda = {'error': f'{err}'}
         return models.MemoryResponse(ram=ram, cuda=cuda)
 
+    def get_traces(self):
+        return profiling.list_traces()
+
+    def trace_file(self, trace_id, filename):
+        if not profiling.is_valid_trace_id(trace_id) or not os.path.exists(filename):
+            raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found")
+
+        return filename
+
+    def get_trace(self, trace_id: str):
+        filename = self.trace_file(trace_id, profiling.trace_filename(trace_id))
+        return FileResponse(filename, media_type="application/json", filename=f"trace-{trace_id}.json")
+
+    def get_trace_timeline(self, trace_id: str):
+        filename = self.trace_file(trace_id, profiling.timeline_filename(trace_id))
+        return FileResponse(filename, media_type="application/json")
+
+    def get_metrics(self):
+        return PlainTextResponse(metrics.exposition(), media_type="text/plain; version=0.0.4")
+
     def get_extensions_list(self):
         from modules import extensions
         extensions.list_extensions()
@@ -0,0 +1,155 @@
+import itertools
+import os
+import threading
+import time
+
+import diskcache
+
+from modules import cache, priority_lock
+from modules.progress import create_task_id, add_task_to_queue, remove_task_from_queue
+
+
+class Job:
+    def __init__(self, id_task, kind, request, priority, seq):
+        self.id_task = id_task
+        self.kind = kind
+        self.request = request
+        self.priority = priority_lock.priority_index(priority)
+        self.seq = seq
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+
+        timeout = getattr(request, "queue_timeout", None)
+        self.deadline = self.submitted_at + timeout if timeout is not None else None
+
+    def expired(self, now):
+        return self.deadline is not None and now >= self.deadline
+
+    def info(self):
+        return {
+            "id_task": self.id_task,
+            "type": self.kind,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": None,
+            "error": None,
+        }
+
+
+class JobManager:
+    """Runs txt2img/img2img API requests in the background.
+
+    Submitted jobs wait in memory, ordered by priority and then by submission; a few runner threads take them one by one
+    and call the regular API handlers, which then wait for the queue lock. A job stays queued until the handler reports
+    with started() that it holds the lock, and its queue_timeout counts from submission, across both waits. Finished jobs, with their results, go to an
+    on-disk store that is limited in size and drops entries older than the TTL, so they survive restarts for a while.
+    """
+
+    def __init__(self, handlers, runners=2, store_dir=None, store_size_limit=2**30, ttl=24 * 3600):
+        self.handlers = handlers
+        self.ttl = ttl
+        self.store = diskcache.Cache(store_dir or os.path.join(cache.cache_dir, "api-jobs"), size_limit=store_size_limit, eviction_policy="least-recently-stored")
+        self.jobs = {}
+        self.pending = []
+        self.seq = itertools.count()
+        self.condition = threading.Condition()
+
+        for i in range(runners):
+            threading.Thread(target=self.run_loop, name=f"api job runner {i}", daemon=True).start()
+
+    def submit(self, kind, request):
+        if kind not in self.handlers:
+            raise ValueError(f"unknown job type {kind!r}; must be one of: {', '.join(self.handlers)}")
+
+        id_task = request.force_task_id or create_task_id(kind)
+        request.force_task_id = id_task
+
+        job = Job(id_task, kind, request, request.priority or "normal", next(self.seq))
+
+        with self.condition:
+            self.jobs[id_task] = job
+            self.pending.append(job)
+            self.condition.notify()
+
+        add_task_to_queue(id_task)
+
+        return job
+
+    def next_job(self):
+        with self.condition:
+            while True:
+                now = time.time()
+                for job in [x for x in self.pending if x.expired(now)]:
+                    self.pending.remove(job)
+                    self.finish(job, "expired", error="job has not started before its queue_timeout")
+
+                if self.pending:
+                    job = min(self.pending, key=lambda x: (x.priority, x.seq))
+                    self.pending.remove(job)
+                    return job
+
+                self.condition.wait()
+
+    def run_loop(self):
+        while True:
+            job = self.next_job()
+
+            # the handler waits for the queue lock for what is left of the job's queue_timeout, not for all of it again
+            if job.deadline is not None:
+                job.request.queue_timeout = max(job.deadline - time.time(), 0)
+
+            try:
+                response = self.handlers[job.kind](job.request)
+                self.finish(job, "done", result=response.dict())
+            except Exception as e:
+                status = "expired" if isinstance(e.__cause__, priority_lock.TaskExpired) else "failed"
+                self.finish(job, status, error=f"{type(e).__name__}: {getattr(e, 'detail', None) or e}")
+
+    def started(self, id_task):
+        """Marks a job as running; called by handlers once they hold the queue lock. Does nothing for tasks that are not jobs."""
+
+        with self.condition:
+            job = self.jobs.get(id_task)
+            if job is not None and job.status == "queued":
+                job.status = "running"
+                job.started_at = time.time()
+
+    def finish(self, job, status, result=None, error=None):
+        record = {**job.info(), "status": status, "finished_at": time.time(), "error": error, "result": result}
+
+        self.store.set(job.id_task, record, expire=self.ttl)
+        self.jobs.pop(job.id_task, None)
+        remove_task_from_queue(job.id_task)
+
+    def cancel(self, id_task):
+        """Cancels a queued job; returns False if the job is not waiting (it may be running or finished already)."""
+
+        with self.condition:
+            job = next((x for x in self.pending if x.id_task == id_task), None)
+            if job is None:
+                return False
+
+            self.pending.remove(job)
+            self.finish(job, "cancelled")
+
+        return True
+
+    def queue_position(self, job):
+        with self.condition:
+            queued = sorted(self.pending, key=lambda x: (x.priority, x.seq))
+
+        return queued.index(job) + 1 if job in queued else None
+
+    def get(self, id_task):
+        """Returns the status of a job and, once it has finished, its result; None if the id is unknown or has expired from the store."""
+
+        job = self.jobs.get(id_task)
+        if job is not None:
+            return {**job.info(), "queue_position": self.queue_position(job), "result": None}
+
+        return self.store.get(id_task)
+
+    def delete(self, id_task):
+        return self.cancel(id_task) or self.store.delete(id_task)
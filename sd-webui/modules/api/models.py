@@ -109,6 +109,14 @@ StableDiffusionTxt2ImgProcessingAPI = PydanticModelGenerator(
         {"key": "alwayson_scripts", "type": dict, "default": {}},
         {"key": "force_task_id", "type": str, "default": None},
         {"key": "infotext", "type": str, "default": None},
+        {"key": "priority", "type": str, "default": "normal"},
+        {"key": "client_id", "type": str, "default": None},
+        {"key": "queue_timeout", "type": float, "default": None},
+        {"key": "profile", "type": bool, "default": False},
+        {"key": "image_format", "type": str, "default": None},
+        {"key": "image_quality", "type": int, "default": None},
+        {"key": "image_lossless", "type": bool, "default": None},
+        {"key": "preview", "type": bool, "default": False},
     ]
 ).generate_model()
 
@@ -128,6 +136,13 @@ StableDiffusionImg2ImgProcessingAPI = PydanticModelGenerator(
         {"key": "alwayson_scripts", "type": dict, "default": {}},
         {"key": "force_task_id", "type": str, "default": None},
         {"key": "infotext", "type": str, "default": None},
+        {"key": "priority", "type": str, "default": "normal"},
+        {"key": "client_id", "type": str, "default": None},
+        {"key": "queue_timeout", "type": float, "default": None},
+        {"key": "profile", "type": bool, "default": False},
+        {"key": "image_format", "type": str, "default": None},
+        {"key": "image_quality", "type": int, "default": None},
+        {"key": "image_lossless", "type": bool, "default": None},
     ]
 ).generate_model()
 
@@ -135,15 +150,20 @@ class TextToImageResponse(BaseModel):
     images: list[str] = Field(default=None, title="Image", description="The generated image in base64 format.")
     parameters: dict
     info: str
+    trace_id: Optional[str] = Field(default=None, title="Trace ID", description="Id of the trace recorded for this request when it was sent with profile: true; get it from /sdapi/v1/traces/{trace_id}.")
 
 class ImageToImageResponse(BaseModel):
     images: list[str] = Field(default=None, title="Image", description="The generated image in base64 format.")
     parameters: dict
     info: str
+    trace_id: Optional[str] = Field(default=None, title="Trace ID", description="Id of the trace recorded for this request when it was sent with profile: true; get it from /sdapi/v1/traces/{trace_id}.")
 
 class ExtrasBaseRequest(BaseModel):
     resize_mode: Literal[0, 1] = Field(default=0, title="Resize Mode", description="Sets the resize mode: 0 to upscale by upscaling_resize amount, 1 to upscale up to upscaling_resize_h x upscaling_resize_w.")
     show_extras_results: bool = Field(default=True, title="Show results", description="Should the backend return the generated image?")
+    image_format: Optional[str] = Field(default=None, title="Image format", description="Format of the returned images: png, jpeg or webp; samples_format setting if not set.")
+    image_quality: Optional[int] = Field(default=None, title="Image quality", description="Quality (1-100) for jpeg and webp, or compression level (0-9) for png.")
+    image_lossless: Optional[bool] = Field(default=None, title="Lossless", description="Use lossless compression for webp.")
     gfpgan_visibility: float = Field(default=0, title="GFPGAN Visibility", ge=0, le=1, allow_inf_nan=False, description="Sets the visibility of GFPGAN, values should be between 0 and 1.")
     codeformer_visibility: float = Field(default=0, title="CodeFormer Visibility", ge=0, le=1, allow_inf_nan=False, description="Sets the visibility of CodeFormer, values should be between 0 and 1.")
     codeformer_weight: float = Field(default=0, title="CodeFormer Weight", ge=0, le=1, allow_inf_nan=False, description="Sets the weight of CodeFormer, values should be between 0 and 1.")
@@ -192,6 +212,41 @@ class ProgressResponse(BaseModel):
     state: dict = Field(title="State", description="The current state snapshot")
     current_image: str = Field(default=None, title="Current image", description="The current image in base64 format. opts.show_progress_every_n_steps is required for this to work.")
     textinfo: str = Field(default=None, title="Info text", description="Info text used by WebUI.")
+    workers: Optional[list[dict]] = Field(default=None, title="Workers", description="Per-worker progress when the API runs on a worker pool (--api-workers).")
+
+class QueueResponse(BaseModel):
+    locked: bool = Field(title="Locked", description="Whether a task is running right now")
+    queue_depth: int = Field(title="Queue depth", description="Number of tasks waiting for the queue lock")
+    queued: list[dict] = Field(title="Queued tasks", description="Waiting tasks in the order they will be started, with their priority, client and seconds spent waiting")
+    wait_time: dict[str, dict] = Field(title="Wait time", description="Count, mean and max seconds spent in queue by recently started tasks, per priority class")
+    expired: int = Field(title="Expired", description="Number of tasks dropped because their queue_timeout passed before they started")
+    cancelled: int = Field(title="Cancelled", description="Number of queued tasks cancelled by id")
+    worker_pool_queued: Optional[list[str]] = Field(default=None, title="Worker pool queue", description="Tasks waiting for a free worker when --api-workers is used")
+
+class CancelTaskRequest(BaseModel):
+    id_task: str = Field(title="Task ID", description="id of a queued task to remove from the queue; running tasks are stopped with /sdapi/v1/interrupt instead")
+
+class JobSubmitRequest(BaseModel):
+    type: Literal["txt2img", "img2img"] = Field(default="txt2img", title="Type", description="Which generation endpoint the job runs through.")
+    request: dict = Field(title="Request", description="Body of the request, as it would be sent to /sdapi/v1/txt2img or /sdapi/v1/img2img.")
+
+class JobBatchSubmitRequest(BaseModel):
+    jobs: list[JobSubmitRequest] = Field(title="Jobs", description="Jobs to queue; they are submitted in this order.")
+
+class JobSubmitResponse(BaseModel):
+    id_task: str = Field(title="Task ID", description="Use with /sdapi/v1/jobs/{id_task} to get the status and result, or with /internal/progress for progress.")
+    status: str = Field(title="Status")
+
+class JobStatusResponse(BaseModel):
+    id_task: str = Field(title="Task ID")
+    type: str = Field(title="Type")
+    status: Literal["queued", "running", "done", "failed", "cancelled", "expired"] = Field(title="Status")
+    queue_position: Optional[int] = Field(default=None, title="Queue position", description="1-based position among jobs waiting to be taken by a runner; null once a runner is waiting for the queue lock for it.")
+    submitted_at: float = Field(title="Submitted at", description="Unix time.")
+    started_at: Optional[float] = Field(default=None, title="Started at", description="Unix time.")
+    finished_at: Optional[float] = Field(default=None, title="Finished at", description="Unix time.")
+    error: Optional[str] = Field(default=None, title="Error")
+    result: Optional[dict] = Field(default=None, title="Result", description="Response of the txt2img/img2img endpoint, once the job is done.")
 
 class InterrogateRequest(BaseModel):
     image: str = Field(default="", title="Image", description="Image to work on, must be a Base64 string containing the image's data.")
@@ -200,6 +255,14 @@ class InterrogateRequest(BaseModel):
 class InterrogateResponse(BaseModel):
     caption: str = Field(default=None, title="Caption", description="The generated caption for the image.")
 
+class InterrogateBatchRequest(BaseModel):
+    images: list[str] = Field(default=[], title="Images", description="Images to work on, must be Base64 strings containing the images' data.")
+    model: str = Field(default="clip", title="Model", description="The interrogate model used.")
+    stream: bool = Field(default=False, title="Stream", description="Send each caption as soon as it is ready, as a line of JSON with its index and caption, instead of all at once.")
+
+class InterrogateBatchResponse(BaseModel):
+    captions: list[Optional[str]] = Field(default=[], title="Captions", description="The generated captions, in the same order as the images; null for images that could not be read.")
+
 class TrainResponse(BaseModel):
     info: str = Field(title="Train info", description="Response string from train embedding or hypernetwork task.")
 
@@ -0,0 +1,112 @@
+import math
+
+import torch
+
+from modules import cache, devices, errors, prompt_parser, shared
+
+probes = {}
+
+# share of the memory free before sampling that a batch may use, leaving the rest for the VAE, extra networks and fragmentation
+memory_fraction = 0.85
+
+
+def even_batches(count, max_batch_size, exact=False):
+    """Returns (batch_size, n_iter) for generating count images in batches of at most max_batch_size, with the fewest
+    batches possible and the images spread over them as evenly as batches of one size allow, so that the last batch is
+    not left nearly empty.
+
+    With exact=True, all batches are full: batch_size is the largest divisor of count up to max_batch_size. This is for
+    img2img, where the init latent is made once for batch_size images and a shorter last batch would not match it."""
+
+    max_batch_size = max(int(max_batch_size), 1)
+    if count <= 0:
+        return max_batch_size, 1
+
+    if exact:
+        batch_size = max(x for x in range(1, min(count, max_batch_size) + 1) if count % x == 0)
+        return batch_size, count // batch_size
+
+    n_iter = math.ceil(count / max_batch_size)
+    return math.ceil(count / n_iter), n_iter
+
+
+def sampling_size(p):
+    """Returns (width, height) of the largest image sampled for p, which is the hires fix size if it is enabled."""
+
+    width, height = p.width, p.height
+
+    if getattr(p, 'enable_hr', False):
+        if p.hr_resize_x or p.hr_resize_y:
+            width, height = max(width, p.hr_resize_x or 0), max(height, p.hr_resize_y or 0)
+        else:
+            width, height = int(width * p.hr_scale), int(height * p.hr_scale)
+
+    return width // 8 * 8, height // 8 * 8
+
+
+def probe_key(width, height):
+    model = shared.sd_model
+    return f"{model.sd_checkpoint_info.name_for_extra} {model.sd_model_hash} {width}x{height} {devices.dtype_unet} {shared.opts.cross_attention_optimization}"
+
+
+def probe(width, height):
+    """Runs the UNet at batch sizes of one and two images (with cond and uncond, as CFG does) and returns
+    (memory used regardless of batch size, memory used for each image) in bytes."""
+
+    model = shared.sd_model
+    shape = (getattr(model, 'latent_channels', 4), height // 8, width // 8)
+
+    peaks = []
+    for batch_size in (1, 2):
+        devices.torch_gc()
+        torch.cuda.reset_peak_memory_stats()
+        allocated = torch.cuda.memory_allocated()
+
+        with torch.no_grad(), devices.autocast():
+            cond = model.get_learned_conditioning(prompt_parser.SdConditioning([""] * batch_size * 2, width=width, height=height))
+            x = torch.zeros((batch_size * 2, *shape), device=shared.device, dtype=devices.dtype_unet)
+            t = torch.full((batch_size * 2,), 999, device=shared.device, dtype=torch.long)
+            model.apply_model(x, t, cond)
+
+        peaks.append(torch.cuda.max_memory_allocated() - allocated)
+        del cond, x, t
+
+    devices.torch_gc()
+
+    per_image = max(peaks[1] - peaks[0], 1)
+    return max(peaks[0] - per_image, 0), per_image
+
+
+def fitting_batch_size(p, limit):
+    """Returns the largest batch size up to limit that is expected to fit in the device's free memory when sampling p,
+    or None if that cannot be told (not a CUDA device, or the probe failed).
+
+    The memory a batch takes at a resolution is probed once per model and resolution, and kept in the disk cache.
+    """
+
+    if shared.device.type != "cuda":
+        return None
+
+    width, height = sampling_size(p)
+    key = probe_key(width, height)
+
+    measured = probes.get(key)
+    if measured is None:
+        measured = cache.cache("batch-size-probes").get(key)
+
+    if measured is None:
+        try:
+            measured = probe(width, height)
+        except Exception:
+            errors.report(f"Error probing memory use for batches of {width}x{height} images", exc_info=True)
+            return None
+
+        cache.cache("batch-size-probes")[key] = measured
+
+    probes[key] = measured
+    base, per_image = measured
+
+    free, _ = torch.cuda.mem_get_info()
+    free += torch.cuda.memory_reserved() - torch.cuda.memory_allocated()
+
+    return min(max(int((free * memory_fraction - base) // per_image), 1), limit)
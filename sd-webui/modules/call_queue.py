@@ -3,9 +3,9 @@ from functools import wraps
 import html
 import time
 
-from modules import shared, progress, errors, devices, fifo_lock, profiling
+from modules import shared, progress, errors, devices, priority_lock, profiling
 
-queue_lock = fifo_lock.FIFOLock()
+queue_lock = priority_lock.PriorityLock()
 
 
 def wrap_queued_call(func):
@@ -29,7 +29,13 @@ def wrap_gradio_gpu_call(func, extra_outputs=None):
         else:
             id_task = None
 
-        with queue_lock:
+        try:
+            queue_lock.acquire(id_task=id_task, priority=shared.opts.queue_ui_priority, client="webui")
+        except (priority_lock.TaskCancelled, priority_lock.TaskExpired):
+            progress.remove_task_from_queue(id_task)
+            raise
+
+        try:
             shared.state.begin(job=id_task)
             progress.start_task(id_task)
 
@@ -40,6 +46,8 @@ def wrap_gradio_gpu_call(func, extra_outputs=None):
                 progress.finish_task(id_task)
 
             shared.state.end()
+        finally:
+            queue_lock.release()
 
         return res
 
@@ -102,6 +102,8 @@ parser.add_argument("--api", action='store_true', help="use api=True to launch t
 parser.add_argument("--api-auth", type=str, help='Set authentication for API like "username:password"; or comma-delimit multiple like "u1:p1,u2:p2,u3:p3"', default=None)
 parser.add_argument("--api-log", action='store_true', help="use api-log=True to enable logging of all API requests")
 parser.add_argument("--nowebui", action='store_true', help="use api=True to launch the API instead of the webui")
+parser.add_argument("--api-workers", type=str, nargs='+', help='run txt2img/img2img API requests on a pool of workers; each entry is the URL of another webui started with --nowebui (e.g. on its own --device-id), or "local" for this process', default=None)
+parser.add_argument("--api-stub-workers", type=int, help="add this many CPU-only stub workers with a tiny stand-in model to the API worker pool; for testing scheduling without a GPU", default=0)
 parser.add_argument("--ui-debug-mode", action='store_true', help="Don't load model to quickly launch UI")
 parser.add_argument("--device-id", type=str, help="Select the default CUDA device to use (export CUDA_VISIBLE_DEVICES=0,1,etc might be needed before)", default=None)
 parser.add_argument("--administrator", action='store_true', help="Administrator rights", default=False)
@@ -123,6 +125,8 @@ parser.add_argument('--timeout-keep-alive', type=int, default=30, help='set time
 parser.add_argument("--disable-all-extensions", action='store_true', help="prevent all extensions from running regardless of any other settings", default=False)
 parser.add_argument("--disable-extra-extensions", action='store_true', help="prevent all extensions except built-in from running regardless of any other settings", default=False)
 parser.add_argument("--skip-load-model-at-start", action='store_true', help="if load a model at web start, only take effect when --nowebui")
+parser.add_argument("--api-fast-startup", action='store_true', help="with --nowebui, do not build the UI and set up face restoration, upscalers, localizations and textual inversion templates in the background after the API is up")
+parser.add_argument("--startup-benchmark", type=normalized_filepath, help="append the time taken by each startup phase to this JSON lines file and report phases that got slower than in previous runs", default=None)
 parser.add_argument("--unix-filenames-sanitization", action='store_true', help="allow any symbols except '/' in filenames. May conflict with your browser and file system")
 parser.add_argument("--filenames-max-length", type=int, default=128, help='maximal length of filenames of saved images. If you override it, it can conflict with your file system')
 parser.add_argument("--no-prompt-history", action='store_true', help="disable read prompt from last generation feature; settings this argument will not create '--data_path/params.txt' file")
@@ -1,10 +1,12 @@
+import contextlib
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 import torch
 import numpy as np
 
-from modules import modelloader, paths, deepbooru_model, devices, images, shared
+from modules import modelloader, paths, deepbooru_model, devices, images, shared, lowvram
 
 re_special = re.compile(r'([\\()])')
 
@@ -12,6 +14,7 @@ re_special = re.compile(r'([\\()])')
 class DeepDanbooru:
     def __init__(self):
         self.model = None
+        self.resident = False
 
     def load(self):
         if self.model is not None:
@@ -35,10 +38,26 @@ class DeepDanbooru:
         self.model.to(devices.device)
 
     def stop(self):
-        if not shared.opts.interrogate_keep_models_in_memory:
+        if not shared.opts.interrogate_keep_models_in_memory and not self.resident:
             self.model.to(devices.cpu)
             devices.torch_gc()
 
+    @contextlib.contextmanager
+    def session(self):
+        """Keeps the model on the device for all tagging done inside this, unless lowvram/medvram optimizations are enabled."""
+
+        if lowvram.is_enabled(shared.sd_model):
+            yield self
+            return
+
+        self.start()
+        self.resident = True
+        try:
+            yield self
+        finally:
+            self.resident = False
+            self.stop()
+
     def tag(self, pil_image):
         self.start()
         res = self.tag_multi(pil_image)
@@ -46,20 +65,74 @@ class DeepDanbooru:
 
         return res
 
+    def tag_batch(self, items, load=None, batch_size=None):
+        """Tags many images, keeping the model on the device until all are done.
+
+        Items are loaded with load (if given; e.g. a decoder for base64 strings) and resized in a pool of worker
+        threads, ahead of the model, which runs on batches of batch_size images (deepbooru_batch_size setting by
+        default). Yields (index, tags) for each item as soon as its batch is done; items that fail to load are yielded
+        with None for tags.
+        """
+
+        batch_size = max(int(batch_size or shared.opts.deepbooru_batch_size), 1)
+
+        def prepare(item):
+            try:
+                pil_image = load(item) if load is not None else item
+                return self.preprocess(pil_image)
+            except Exception:
+                return None
+
+        self.start()
+        try:
+            with ThreadPoolExecutor(max_workers=min(batch_size, os.cpu_count() or 1)) as executor:
+                # executor.map queues all items at once, so only submit the next couple of batches to bound memory use
+                pending = []
+                items = enumerate(items)
+
+                def submit(count):
+                    for index, item in items:
+                        pending.append((index, executor.submit(prepare, item)))
+                        count -= 1
+                        if count == 0:
+                            break
+
+                submit(batch_size * 2)
+                while pending:
+                    batch, pending = pending[:batch_size], pending[batch_size:]
+                    submit(batch_size)
+
+                    prepared = [(index, future.result()) for index, future in batch]
+                    arrays = [a for _, a in prepared if a is not None]
+                    results = iter(self.forward(np.stack(arrays)) if arrays else [])
+
+                    for index, a in prepared:
+                        yield index, self.format_tags(next(results)) if a is not None else None
+        finally:
+            self.stop()
+
+    def preprocess(self, pil_image):
+        pic = images.resize_image(2, pil_image.convert("RGB"), 512, 512)
+        return np.array(pic, dtype=np.float32) / 255
+
+    def forward(self, a):
+        with torch.no_grad(), devices.autocast():
+            x = torch.from_numpy(a).to(devices.device, devices.dtype)
+            return self.model(x).detach().cpu().numpy()
+
     def tag_multi(self, pil_image, force_disable_ranks=False):
+        a = np.expand_dims(self.preprocess(pil_image), 0)
+        y = self.forward(a)[0]
+
+        return self.format_tags(y, force_disable_ranks)
+
+    def format_tags(self, y, force_disable_ranks=False):
         threshold = shared.opts.interrogate_deepbooru_score_threshold
         use_spaces = shared.opts.deepbooru_use_spaces
         use_escape = shared.opts.deepbooru_escape
         alpha_sort = shared.opts.deepbooru_sort_alpha
         include_ranks = shared.opts.interrogate_return_ranks and not force_disable_ranks
 
-        pic = images.resize_image(2, pil_image.convert("RGB"), 512, 512)
-        a = np.expand_dims(np.array(pic, dtype=np.float32), 0) / 255
-
-        with torch.no_grad(), devices.autocast():
-            x = torch.from_numpy(a).to(devices.device, devices.dtype)
-            y = self.model(x)[0].detach().cpu().numpy()
-
         probability_dict = {}
 
         for tag, probability in zip(self.model.tags, y):
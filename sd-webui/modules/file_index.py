@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+from modules import cache, shared
+from modules.util import natural_sort_key
+
+FileEntry = namedtuple("FileEntry", ["path", "size", "mtime"])
+
+# a directory modified this recently may still change within the same tick of its mtime, so its listing is not kept
+mtime_granularity_ns = 2 * 10**9
+
+
+class FileIndex:
+    """Directory listings for walking model directories without listing every directory on every refresh.
+
+    A directory's list of subdirectories and files is kept in memory and in the on-disk cache together with the
+    directory's modification time, which changes whenever an entry is added, removed or renamed in it, so an unchanged
+    directory costs one stat instead of a listdir and a sort. Metadata and hashes of the files themselves are cached by
+    modification time elsewhere (see cache.cached_data_for_file and hashes.sha256_from_cache), and FileObjects keeps
+    the objects built from files.
+    """
+
+    def __init__(self, subsection="file-index"):
+        self.subsection = subsection
+        self.listings = {}
+        self.lock = threading.Lock()
+
+    def listing(self, dirpath):
+        """Returns (subdirectory names, file names) of a directory, both in natural sort order."""
+
+        try:
+            mtime = os.stat(dirpath).st_mtime_ns
+        except OSError:
+            return [], []
+
+        listing = self.listings.get(dirpath)
+        if listing is None:
+            listing = cache.cache(self.subsection).get(dirpath)
+
+        if listing is not None and listing[0] == mtime:
+            self.listings[dirpath] = listing
+            return listing[1], listing[2]
+
+        dirs = []
+        files = []
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+
+                    (dirs if is_dir else files).append(entry.name)
+        except OSError:
+            return [], []
+
+        dirs.sort(key=natural_sort_key)
+        files.sort(key=natural_sort_key)
+
+        if time.time_ns() - mtime > mtime_granularity_ns:
+            listing = (mtime, dirs, files)
+            with self.lock:
+                self.listings[dirpath] = listing
+                cache.cache(self.subsection)[dirpath] = listing
+
+        return dirs, files
+
+    def walk_files(self, path, allowed_extensions=None, stat=True):
+        """Yields a FileEntry for every file under path, in the same order as util.walk_files.
+
+        With stat=False, size and mtime are not read and are None; they are also None for files that cannot be stat'ed,
+        like broken symlinks.
+        """
+
+        if not os.path.exists(path):
+            return
+
+        if allowed_extensions is not None:
+            allowed_extensions = set(allowed_extensions)
+
+        directories = []
+        stack = [path]
+        while stack:
+            dirpath = stack.pop()
+            directories.append(dirpath)
+
+            dirs, _ = self.listing(dirpath)
+            stack += [os.path.join(dirpath, x) for x in dirs]
+
+        directories.sort(key=natural_sort_key)
+
+        for root in directories:
+            if not shared.opts.list_hidden_files and ("/." in root or "\\." in root):
+                continue
+
+            for filename in self.listing(root)[1]:
+                if allowed_extensions is not None:
+                    _, ext = os.path.splitext(filename)
+                    if ext.lower() not in allowed_extensions:
+                        continue
+
+                filepath = os.path.join(root, filename)
+
+                size = mtime = None
+                if stat:
+                    try:
+                        st = os.stat(filepath)
+                        size, mtime = st.st_size, st.st_mtime
+                    except OSError:
+                        pass
+
+                yield FileEntry(filepath, size, mtime)
+
+
+class FileObjects:
+    """Objects built from files (like CheckpointInfo or NetworkOnDisk), kept while the file's size and mtime stay the same, so a refresh only builds them for new and changed files."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def get(self, entry, create):
+        """Returns the object for a FileEntry, calling create() to build it if the file is new or has changed."""
+
+        existing = self.objects.get(entry.path)
+        if existing is not None and existing[0] == (entry.size, entry.mtime) and entry.mtime is not None:
+            return existing[1]
+
+        obj = create()
+        self.objects[entry.path] = ((entry.size, entry.mtime), obj)
+        return obj
+
+    def retain(self, paths):
+        """Forgets objects for files that are not in paths anymore."""
+
+        paths = set(paths)
+        for path in [x for x in self.objects if x not in paths]:
+            del self.objects[path]
+
+
+index = FileIndex()
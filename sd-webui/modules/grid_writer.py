@@ -0,0 +1,170 @@
+import os
+import struct
+import zlib
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
+
+from modules import images, script_callbacks
+from modules.shared import opts
+
+
+def copy_texts(texts):
+    return [[images.GridAnnotation(x.text, x.is_active) for x in lines] for lines in texts]
+
+
+class LazyGrid:
+    """A grid of images like images.image_grid() makes, optionally with texts around it like images.draw_grid_annotations()
+    adds, that is only drawn one strip of rows at a time when crop() is called.
+
+    Items of imgs can be PIL images or other LazyGrids, so a grid of grids (like the X/Y/Z plot's grid of sub-grids) never
+    has to be in memory as a whole either; write_png() writes one to a file strip by strip.
+    """
+
+    def __init__(self, imgs, cols, rows, hor_texts=None, ver_texts=None, margin=0):
+        params = script_callbacks.ImageGridLoopParams(imgs, cols, rows)
+        script_callbacks.image_grid_callback(params)
+
+        self.imgs = params.imgs
+        self.cols = params.cols
+        self.rows = params.rows
+        self.hor_texts = hor_texts
+        self.ver_texts = ver_texts
+        self.margin = margin
+
+        self.cell_w, self.cell_h = map(max, zip(*(img.size for img in self.imgs)))
+        self.background = ImageColor.getcolor(opts.grid_background_color, 'RGB')
+
+        self.layout = None
+        if hor_texts is not None and ver_texts is not None:
+            self.layout = images.GridAnnotationLayout(self.cell_w, self.cell_h, hor_texts, ver_texts, margin)
+            self.width = self.cols * self.cell_w + self.layout.pad_left + margin * (self.cols - 1)
+            self.height = self.rows * self.cell_h + self.layout.pad_top + margin * (self.rows - 1)
+        else:
+            self.width = self.cols * self.cell_w
+            self.height = self.rows * self.cell_h
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def cell_position(self, col, row):
+        if self.layout is not None:
+            return self.layout.cell_position(col, row)
+
+        return col * self.cell_w, row * self.cell_h
+
+    def crop(self, box):
+        """Draws the part of the grid inside box, like Image.crop(); only the cells that overlap its rows are looked at."""
+
+        x0, y0, x1, y1 = box
+        strip = Image.new("RGB", (self.width, y1 - y0), self.background)
+
+        _, top_y = self.cell_position(0, 0)
+        _, pitch = self.cell_position(0, 1)
+        pitch -= top_y
+
+        for row in range(max(0, (y0 - top_y) // pitch), self.rows):
+            _, row_y = self.cell_position(0, row)
+            if row_y >= y1:
+                break
+
+            for col in range(self.cols):
+                i = row * self.cols + col
+                if i >= len(self.imgs):
+                    break
+
+                img = self.imgs[i]
+                img_w, img_h = img.size
+                cell_x, cell_y = self.cell_position(col, row)
+                cell_x += (self.cell_w - img_w) // 2
+                cell_y += (self.cell_h - img_h) // 2
+
+                top = max(y0, cell_y)
+                bottom = min(y1, cell_y + img_h)
+                if top >= bottom:
+                    continue
+
+                strip.paste(img.crop((0, top - cell_y, img_w, bottom - cell_y)), (cell_x, top - y0))
+
+        if self.layout is not None:
+            drawing = ImageDraw.Draw(strip)
+
+            if y0 < self.layout.pad_top:
+                self.layout.draw_hor_texts(drawing, offset_y=y0)
+
+            # texts can be taller than their row, so all are drawn; the parts outside of the strip are clipped
+            for row in range(self.rows):
+                self.layout.draw_ver_texts(drawing, row, offset_y=y0)
+
+        if x0 != 0 or x1 != self.width:
+            strip = strip.crop((x0, 0, x1, y1 - y0))
+
+        return strip
+
+    def scaled(self, factor):
+        """Returns the same grid with every image resized by factor, and texts sized for the smaller cells."""
+
+        imgs = []
+        for img in self.imgs:
+            if isinstance(img, LazyGrid):
+                imgs.append(img.scaled(factor))
+            else:
+                imgs.append(img.resize((max(1, round(img.width * factor)), max(1, round(img.height * factor))), images.LANCZOS))
+
+        if self.layout is None:
+            return LazyGrid(imgs, self.cols, self.rows)
+
+        return LazyGrid(imgs, self.cols, self.rows, copy_texts(self.hor_texts), copy_texts(self.ver_texts), max(0, round(self.margin * factor)))
+
+    def preview(self, max_side):
+        """Draws the whole grid scaled down to at most max_side pixels on its longer side."""
+
+        factor = min(1.0, max_side / max(self.width, self.height))
+        grid = self.scaled(factor) if factor < 1.0 else self
+        return grid.crop((0, 0, grid.width, grid.height))
+
+
+def write_chunk(file, chunk_type, data):
+    file.write(struct.pack(">I", len(data)))
+    file.write(chunk_type)
+    file.write(data)
+    file.write(struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff))
+
+
+def write_png(image, filename, info=None, pnginfo_section_name='parameters', strip_height=256, compress_level=6):
+    """Writes an image to a PNG file a strip of rows at a time; image can be anything with size and crop(), like a LazyGrid,
+    so that at most strip_height rows of it are in memory.
+
+    info is saved in an iTXt chunk, the same way images.save_image() saves it.
+    """
+
+    width, height = image.size
+
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        write_chunk(file, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+        if info is not None:
+            write_chunk(file, b"iTXt", pnginfo_section_name.encode("latin-1") + b"\0\0\0\0\0" + info.encode("utf8"))
+
+        compressor = zlib.compressobj(compress_level)
+        for y in range(0, height, strip_height):
+            strip = image.crop((0, y, width, min(height, y + strip_height)))
+            pixels = np.asarray(strip.convert("RGB"), dtype=np.uint8).reshape(strip.height, width * 3)
+
+            # filter type 1 (Sub): every byte minus the same byte of the pixel to its left
+            filtered = np.empty((strip.height, width * 3 + 1), dtype=np.uint8)
+            filtered[:, 0] = 1
+            filtered[:, 1:4] = pixels[:, :3]
+            filtered[:, 4:] = pixels[:, 3:] - pixels[:, :-3]
+
+            data = compressor.compress(filtered.tobytes())
+            if data:
+                write_chunk(file, b"IDAT", data)
+
+        write_chunk(file, b"IDAT", compressor.flush())
+        write_chunk(file, b"IEND", b"")
+
+    os.replace(temp_filename, filename)
@@ -87,6 +87,9 @@ def split_grid(image: Image.Image, tile_w: int = 512, tile_h: int = 512, overlap
     dx = (w - tile_w) / (cols - 1) if cols > 1 else 0
     dy = (h - tile_h) / (rows - 1) if rows > 1 else 0
 
+    # tiles are cut from one array; an image smaller than a tile is cropped with PIL, which pads the tile
+    pixels = np.asarray(image) if image.mode in ("L", "RGB", "RGBA") and w >= tile_w and h >= tile_h else None
+
     grid = Grid([], tile_w, tile_h, w, h, overlap)
     for row in range(rows):
         row_images = []
@@ -102,7 +105,10 @@ def split_grid(image: Image.Image, tile_w: int = 512, tile_h: int = 512, overlap
             if x + tile_w >= w:
                 x = w - tile_w
 
-            tile = image.crop((x, y, x + tile_w, y + tile_h))
+            if pixels is not None:
+                tile = Image.fromarray(pixels[y:y + tile_h, x:x + tile_w], image.mode)
+            else:
+                tile = image.crop((x, y, x + tile_w, y + tile_h))
 
             row_images.append([x, tile_w, tile])
 
@@ -111,34 +117,76 @@ def split_grid(image: Image.Image, tile_w: int = 512, tile_h: int = 512, overlap
     return grid
 
 
+def edge_overlaps(spans):
+    """For a list of (start, length) of tiles along one axis, returns (head, tail) for each: how many of its first and last pixels the previous and next tile cover."""
+
+    res = []
+    for i, (start, length) in enumerate(spans):
+        head = spans[i - 1][0] + spans[i - 1][1] - start if i > 0 else 0
+        tail = start + length - spans[i + 1][0] if i + 1 < len(spans) else 0
+        res.append((max(head, 0), max(tail, 0)))
+
+    return res
+
+
+def feather_weights(length, head, tail):
+    """Blending weights along one axis of a tile: a linear ramp up over the first head pixels and down over the last
+    tail pixels, so that the ramps of two tiles overlapping by the same amount add up to 1."""
+
+    weights = np.ones(length, dtype=np.float32)
+
+    head = min(head, length)
+    if head > 0:
+        weights[:head] = (np.arange(head, dtype=np.float32) + 0.5) / head
+
+    tail = min(tail, length)
+    if tail > 0:
+        weights[length - tail:] = np.minimum(weights[length - tail:], (np.arange(tail, 0, -1, dtype=np.float32) - 0.5) / tail)
+
+    return weights
+
+
 def combine_grid(grid):
-    def make_mask_image(r):
-        r = r * 255 / grid.overlap
-        r = r.astype(np.uint8)
-        return Image.fromarray(r, 'L')
-
-    mask_w = make_mask_image(np.arange(grid.overlap, dtype=np.float32).reshape((1, grid.overlap)).repeat(grid.tile_h, axis=0))
-    mask_h = make_mask_image(np.arange(grid.overlap, dtype=np.float32).reshape((grid.overlap, 1)).repeat(grid.image_w, axis=1))
-
-    combined_image = Image.new("RGB", (grid.image_w, grid.image_h))
-    for y, h, row in grid.tiles:
-        combined_row = Image.new("RGB", (grid.image_w, h))
-        for x, w, tile in row:
-            if x == 0:
-                combined_row.paste(tile, (0, 0))
-                continue
+    """Puts tiles of a grid made by split_grid back together, blending them where they overlap with 2-D feather weights.
+
+    The result is computed in horizontal bands between the tiles' top and bottom edges, so only one band is ever held as floats.
+    """
 
-            combined_row.paste(tile.crop((0, 0, grid.overlap, h)), (x, 0), mask=mask_w)
-            combined_row.paste(tile.crop((grid.overlap, 0, w, h)), (x + grid.overlap, 0))
+    weight_maps = {}
+    placed = []
+    for (y, h, row), (top, bottom) in zip(grid.tiles, edge_overlaps([(y, h) for y, h, _ in grid.tiles])):
+        for (x, w, tile), (left, right) in zip(row, edge_overlaps([(x, w) for x, w, _ in row])):
+            key = (w, h, left, right, top, bottom)
+            weights = weight_maps.get(key)
+            if weights is None:
+                weights = feather_weights(h, top, bottom)[:, None] * feather_weights(w, left, right)[None, :]
+                weight_maps[key] = weights
+
+            pixels = np.asarray(tile.convert("RGB"))[:h, :w]
+            placed.append((x, y, pixels, weights[:pixels.shape[0], :pixels.shape[1], None]))
+
+    combined = np.zeros((grid.image_h, grid.image_w, 3), dtype=np.uint8)
+
+    edges = sorted({0, grid.image_h} | {min(max(v, 0), grid.image_h) for y, h, _ in grid.tiles for v in (y, y + h)})
+    for band_top, band_bottom in zip(edges, edges[1:]):
+        values = np.zeros((band_bottom - band_top, grid.image_w, 3), dtype=np.float32)
+        total = np.zeros((band_bottom - band_top, grid.image_w, 1), dtype=np.float32)
+
+        for x, y, pixels, weights in placed:
+            top, bottom = max(y, band_top), min(y + pixels.shape[0], band_bottom)
+            left, right = max(x, 0), min(x + pixels.shape[1], grid.image_w)
+            if top >= bottom or left >= right:
+                continue
 
-        if y == 0:
-            combined_image.paste(combined_row, (0, 0))
-            continue
+            tile_weights = weights[top - y:bottom - y, left - x:right - x]
+            values[top - band_top:bottom - band_top, left:right] += pixels[top - y:bottom - y, left - x:right - x] * tile_weights
+            total[top - band_top:bottom - band_top, left:right] += tile_weights
 
-        combined_image.paste(combined_row.crop((0, 0, combined_row.width, grid.overlap)), (0, y), mask=mask_h)
-        combined_image.paste(combined_row.crop((0, grid.overlap, combined_row.width, h)), (0, y + grid.overlap))
+        # parts not covered by any tile stay black
+        values /= np.maximum(total, 1e-6)
+        combined[band_top:band_bottom] = np.clip(np.rint(values), 0, 255).astype(np.uint8)
 
-    return combined_image
+    return Image.fromarray(combined, "RGB")
 
 
 class GridAnnotation:
@@ -148,90 +196,118 @@ class GridAnnotation:
         self.size = None
 
 
-def draw_grid_annotations(im, width, height, hor_texts, ver_texts, margin=0):
+class GridAnnotationLayout:
+    """Fonts, sizes and positions of the texts around a grid of width x height cells; wraps the texts in place.
 
-    color_active = ImageColor.getcolor(opts.grid_text_active_color, 'RGB')
-    color_inactive = ImageColor.getcolor(opts.grid_text_inactive_color, 'RGB')
-    color_background = ImageColor.getcolor(opts.grid_background_color, 'RGB')
+    Used by draw_grid_annotations(), and by grid_writer to draw the same texts one strip of the grid at a time.
+    """
 
-    def wrap(drawing, text, font, line_length):
-        lines = ['']
-        for word in text.split():
-            line = f'{lines[-1]} {word}'.strip()
-            if drawing.textlength(line, font=font) <= line_length:
-                lines[-1] = line
-            else:
-                lines.append(word)
-        return lines
+    def __init__(self, width, height, hor_texts, ver_texts, margin=0):
+        self.width = width
+        self.height = height
+        self.hor_texts = hor_texts
+        self.ver_texts = ver_texts
+        self.margin = margin
+
+        self.color_active = ImageColor.getcolor(opts.grid_text_active_color, 'RGB')
+        self.color_inactive = ImageColor.getcolor(opts.grid_text_inactive_color, 'RGB')
+        self.color_background = ImageColor.getcolor(opts.grid_background_color, 'RGB')
+
+        self.fontsize = (width + height) // 25
+        self.line_spacing = self.fontsize // 2
+
+        self.fnt = get_font(self.fontsize)
 
-    def draw_texts(drawing, draw_x, draw_y, lines, initial_fnt, initial_fontsize):
+        self.pad_left = 0 if sum([sum([len(line.text) for line in lines]) for lines in ver_texts]) == 0 else width * 3 // 4
+
+        calc_img = Image.new("RGB", (1, 1), self.color_background)
+        calc_d = ImageDraw.Draw(calc_img)
+
+        def wrap(drawing, text, font, line_length):
+            lines = ['']
+            for word in text.split():
+                line = f'{lines[-1]} {word}'.strip()
+                if drawing.textlength(line, font=font) <= line_length:
+                    lines[-1] = line
+                else:
+                    lines.append(word)
+            return lines
+
+        for texts, allowed_width in zip(hor_texts + ver_texts, [width] * len(hor_texts) + [self.pad_left] * len(ver_texts)):
+            items = [] + texts
+            texts.clear()
+
+            for line in items:
+                wrapped = wrap(calc_d, line.text, self.fnt, allowed_width)
+                texts += [GridAnnotation(x, line.is_active) for x in wrapped]
+
+            for line in texts:
+                bbox = calc_d.multiline_textbbox((0, 0), line.text, font=self.fnt)
+                line.size = (bbox[2] - bbox[0], bbox[3] - bbox[1])
+                line.allowed_width = allowed_width
+
+        self.hor_text_heights = [sum([line.size[1] + self.line_spacing for line in lines]) - self.line_spacing for lines in hor_texts]
+        self.ver_text_heights = [sum([line.size[1] + self.line_spacing for line in lines]) - self.line_spacing * len(lines) for lines in ver_texts]
+
+        self.pad_top = 0 if sum(self.hor_text_heights) == 0 else max(self.hor_text_heights) + self.line_spacing * 2
+
+    def cell_position(self, col, row):
+        return self.pad_left + (self.width + self.margin) * col, self.pad_top + (self.height + self.margin) * row
+
+    def draw_texts(self, drawing, draw_x, draw_y, lines):
         for line in lines:
-            fnt = initial_fnt
-            fontsize = initial_fontsize
+            fnt = self.fnt
+            fontsize = self.fontsize
             while drawing.multiline_textsize(line.text, font=fnt)[0] > line.allowed_width and fontsize > 0:
                 fontsize -= 1
                 fnt = get_font(fontsize)
-            drawing.multiline_text((draw_x, draw_y + line.size[1] / 2), line.text, font=fnt, fill=color_active if line.is_active else color_inactive, anchor="mm", align="center")
+            drawing.multiline_text((draw_x, draw_y + line.size[1] / 2), line.text, font=fnt, fill=self.color_active if line.is_active else self.color_inactive, anchor="mm", align="center")
 
             if not line.is_active:
-                drawing.line((draw_x - line.size[0] // 2, draw_y + line.size[1] // 2, draw_x + line.size[0] // 2, draw_y + line.size[1] // 2), fill=color_inactive, width=4)
+                drawing.line((draw_x - line.size[0] // 2, draw_y + line.size[1] // 2, draw_x + line.size[0] // 2, draw_y + line.size[1] // 2), fill=self.color_inactive, width=4)
 
-            draw_y += line.size[1] + line_spacing
+            draw_y += line.size[1] + self.line_spacing
 
-    fontsize = (width + height) // 25
-    line_spacing = fontsize // 2
+    def draw_hor_texts(self, drawing, offset_y=0):
+        """Draws the texts above the columns; offset_y is the position of the drawing's top edge in the grid."""
 
-    fnt = get_font(fontsize)
+        for col in range(len(self.hor_texts)):
+            x = self.pad_left + (self.width + self.margin) * col + self.width / 2
+            y = self.pad_top / 2 - self.hor_text_heights[col] / 2
 
-    pad_left = 0 if sum([sum([len(line.text) for line in lines]) for lines in ver_texts]) == 0 else width * 3 // 4
+            self.draw_texts(drawing, x, y - offset_y, self.hor_texts[col])
 
-    cols = im.width // width
-    rows = im.height // height
+    def draw_ver_texts(self, drawing, row, offset_y=0):
+        """Draws the texts left of a row; offset_y is the position of the drawing's top edge in the grid."""
 
-    assert cols == len(hor_texts), f'bad number of horizontal texts: {len(hor_texts)}; must be {cols}'
-    assert rows == len(ver_texts), f'bad number of vertical texts: {len(ver_texts)}; must be {rows}'
-
-    calc_img = Image.new("RGB", (1, 1), color_background)
-    calc_d = ImageDraw.Draw(calc_img)
+        x = self.pad_left / 2
+        y = self.pad_top + (self.height + self.margin) * row + self.height / 2 - self.ver_text_heights[row] / 2
 
-    for texts, allowed_width in zip(hor_texts + ver_texts, [width] * len(hor_texts) + [pad_left] * len(ver_texts)):
-        items = [] + texts
-        texts.clear()
+        self.draw_texts(drawing, x, y - offset_y, self.ver_texts[row])
 
-        for line in items:
-            wrapped = wrap(calc_d, line.text, fnt, allowed_width)
-            texts += [GridAnnotation(x, line.is_active) for x in wrapped]
 
-        for line in texts:
-            bbox = calc_d.multiline_textbbox((0, 0), line.text, font=fnt)
-            line.size = (bbox[2] - bbox[0], bbox[3] - bbox[1])
-            line.allowed_width = allowed_width
+def draw_grid_annotations(im, width, height, hor_texts, ver_texts, margin=0):
+    cols = im.width // width
+    rows = im.height // height
 
-    hor_text_heights = [sum([line.size[1] + line_spacing for line in lines]) - line_spacing for lines in hor_texts]
-    ver_text_heights = [sum([line.size[1] + line_spacing for line in lines]) - line_spacing * len(lines) for lines in ver_texts]
+    assert cols == len(hor_texts), f'bad number of horizontal texts: {len(hor_texts)}; must be {cols}'
+    assert rows == len(ver_texts), f'bad number of vertical texts: {len(ver_texts)}; must be {rows}'
 
-    pad_top = 0 if sum(hor_text_heights) == 0 else max(hor_text_heights) + line_spacing * 2
+    layout = GridAnnotationLayout(width, height, hor_texts, ver_texts, margin)
 
-    result = Image.new("RGB", (im.width + pad_left + margin * (cols-1), im.height + pad_top + margin * (rows-1)), color_background)
+    result = Image.new("RGB", (im.width + layout.pad_left + margin * (cols-1), im.height + layout.pad_top + margin * (rows-1)), layout.color_background)
 
     for row in range(rows):
         for col in range(cols):
             cell = im.crop((width * col, height * row, width * (col+1), height * (row+1)))
-            result.paste(cell, (pad_left + (width + margin) * col, pad_top + (height + margin) * row))
+            result.paste(cell, layout.cell_position(col, row))
 
     d = ImageDraw.Draw(result)
 
-    for col in range(cols):
-        x = pad_left + (width + margin) * col + width / 2
-        y = pad_top / 2 - hor_text_heights[col] / 2
-
-        draw_texts(d, x, y, hor_texts[col], fnt, fontsize)
+    layout.draw_hor_texts(d)
 
     for row in range(rows):
-        x = pad_left / 2
-        y = pad_top + (height + margin) * row + height / 2 - ver_text_heights[row] / 2
-
-        draw_texts(d, x, y, ver_texts[row], fnt, fontsize)
+        layout.draw_ver_texts(d, row)
 
     return result
 
@@ -724,6 +800,7 @@ def save_image(image, path, basename, seed=None, prompt=None, extension='png', i
                 n += 1
                 filename = f"{filename_without_extension}-{n}{extension}"
         os.replace(temp_file_path, filename)
+        return filename
 
     fullfn_without_extension, extension = os.path.splitext(params.filename)
     if hasattr(os, 'statvfs'):
@@ -731,9 +808,8 @@ def save_image(image, path, basename, seed=None, prompt=None, extension='png', i
         fullfn_without_extension = fullfn_without_extension[:max_name_len - max(4, len(extension))]
         params.filename = fullfn_without_extension + extension
         fullfn = params.filename
-    _atomically_save_image(image, fullfn_without_extension, extension)
-
-    image.already_saved_as = fullfn
+    # the file may have been given a number to not replace an existing one
+    image.already_saved_as = _atomically_save_image(image, fullfn_without_extension, extension)
 
     oversize = image.width > opts.target_side_length or image.height > opts.target_side_length
     if opts.export_for_4chan and (oversize or os.stat(fullfn).st_size > opts.img_downscale_threshold * 1024 * 1024):
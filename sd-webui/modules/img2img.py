@@ -1,3 +1,4 @@
+import functools
 import os
 from contextlib import closing
 from pathlib import Path
@@ -6,7 +7,7 @@ import numpy as np
 from PIL import Image, ImageOps, ImageFilter, ImageEnhance, UnidentifiedImageError
 import gradio as gr
 
-from modules import images
+from modules import images, prefetch
 from modules.infotext_utils import create_override_settings_dict, parse_generation_parameters
 from modules.processing import Processed, StableDiffusionProcessingImg2Img, process_images
 from modules.shared import opts, state
@@ -17,6 +18,34 @@ from modules.ui import plaintext_to_html
 import modules.scripts
 
 
+@functools.lru_cache(maxsize=4096)
+def read_batch_png_info(path, mtime):
+    """Parses generation parameters from the PNG info of an image file; cached by path and modification time, so rerunning a batch does not parse them again."""
+
+    geninfo, _ = images.read_info_from_image(images.read(path))
+    return parse_generation_parameters(geninfo)
+
+
+def load_batch_image(image, mask_image_path, use_png_info, png_info_dir):
+    """Reads an input image of a batch along with its mask and generation parameters; runs in a background thread."""
+
+    img = images.read(image)
+    # Use the EXIF orientation of photos taken by smartphones.
+    img = ImageOps.exif_transpose(img)
+
+    mask_image = images.read(mask_image_path) if mask_image_path is not None else None
+
+    parsed_parameters = None
+    if use_png_info:
+        try:
+            info_img_path = os.path.join(png_info_dir, os.path.basename(image)) if png_info_dir else image
+            parsed_parameters = read_batch_png_info(info_img_path, os.path.getmtime(info_img_path))
+        except Exception:
+            parsed_parameters = {}
+
+    return img, mask_image, parsed_parameters
+
+
 def process_batch(p, input, output_dir, inpaint_mask_dir, args, to_scale=False, scale_by=1.0, use_png_info=False, png_info_props=None, png_info_dir=None):
     output_dir = output_dir.strip()
     processing.fix_seed(p)
@@ -34,6 +63,32 @@ def process_batch(p, input, output_dir, inpaint_mask_dir, args, to_scale=False,
         if is_inpaint_batch:
             print(f"\nInpaint batch is enabled. {len(inpaint_masks)} masks found.")
 
+    # index masks by filename stem once, rather than searching the directory for each image
+    masks_by_stem = {}
+    if is_inpaint_batch and len(inpaint_masks) > 1:
+        for mask_path in reversed(inpaint_masks):
+            masks_by_stem[Path(mask_path).stem] = mask_path
+
+    def find_mask(image):
+        if not is_inpaint_batch:
+            return None
+
+        if len(inpaint_masks) == 1:
+            return inpaint_masks[0]
+
+        return masks_by_stem.get(Path(image).stem)
+
+    def load(image):
+        mask_image_path = find_mask(image)
+        if is_inpaint_batch and mask_image_path is None:
+            return None
+
+        return load_batch_image(image, mask_image_path, use_png_info, png_info_dir)
+
+    # images and masks for the next few iterations are read in background threads while the current one is generated
+    io_workers = max(int(shared.opts.img2img_batch_io_workers), 1)
+    reader = prefetch.prefetch(load, batch_images, workers=io_workers, ahead=io_workers * 2)
+
     print(f"Will process {len(batch_images)} images, creating {p.n_iter * p.batch_size} new images for each.")
 
     state.job_count = len(batch_images) * p.n_iter
@@ -49,21 +104,28 @@ def process_batch(p, input, output_dir, inpaint_mask_dir, args, to_scale=False,
     sd_model_checkpoint_override = get_closet_checkpoint_match(override_settings.get("sd_model_checkpoint", None))
     batch_results = None
     discard_further_results = False
-    for i, image in enumerate(batch_images):
+    for i, (image, loaded, error) in enumerate(reader):
         state.job = f"{i+1} out of {len(batch_images)}"
         if state.skipped:
             state.skipped = False
 
         if state.interrupted or state.stopping_generation:
+            reader.close()
             break
 
-        try:
-            img = images.read(image)
-        except UnidentifiedImageError as e:
-            print(e)
+        if isinstance(error, UnidentifiedImageError):
+            print(error)
+            continue
+        elif error is not None:
+            reader.close()
+            raise error
+
+        image_path = Path(image)
+        if loaded is None:
+            print(f"Warning: mask is not found for {image_path} in {inpaint_mask_dir}. Skipping it.")
             continue
-        # Use the EXIF orientation of photos taken by smartphones.
-        img = ImageOps.exif_transpose(img)
+
+        img, mask_image, parsed_parameters = loaded
 
         if to_scale:
             p.width = int(img.width * scale_by)
@@ -71,38 +133,11 @@ def process_batch(p, input, output_dir, inpaint_mask_dir, args, to_scale=False,
 
         p.init_images = [img] * p.batch_size
 
-        image_path = Path(image)
         if is_inpaint_batch:
-            # try to find corresponding mask for an image using simple filename matching
-            if len(inpaint_masks) == 1:
-                mask_image_path = inpaint_masks[0]
-            else:
-                # try to find corresponding mask for an image using simple filename matching
-                mask_image_dir = Path(inpaint_mask_dir)
-                masks_found = list(mask_image_dir.glob(f"{image_path.stem}.*"))
-
-                if len(masks_found) == 0:
-                    print(f"Warning: mask is not found for {image_path} in {mask_image_dir}. Skipping it.")
-                    continue
-
-                # it should contain only 1 matching mask
-                # otherwise user has many masks with the same name but different extensions
-                mask_image_path = masks_found[0]
-
-            mask_image = images.read(mask_image_path)
             p.image_mask = mask_image
 
         if use_png_info:
-            try:
-                info_img = img
-                if png_info_dir:
-                    info_img_path = os.path.join(png_info_dir, os.path.basename(image))
-                    info_img = images.read(info_img_path)
-                geninfo, _ = images.read_info_from_image(info_img)
-                parsed_parameters = parse_generation_parameters(geninfo)
-                parsed_parameters = {k: v for k, v in parsed_parameters.items() if k in (png_info_props or {})}
-            except Exception:
-                parsed_parameters = {}
+            parsed_parameters = {k: v for k, v in parsed_parameters.items() if k in (png_info_props or {})}
 
             p.prompt = prompt + (" " + parsed_parameters["Prompt"] if "Prompt" in parsed_parameters else "")
             p.negative_prompt = negative_prompt + (" " + parsed_parameters["Negative prompt"] if "Negative prompt" in parsed_parameters else "")
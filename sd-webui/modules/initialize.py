@@ -5,7 +5,18 @@ import sys
 import warnings
 from threading import Thread
 
-from modules.timer import startup_timer
+from modules.timer import Timer, startup_timer
+
+deferred_thread = None
+deferred_timer = None
+
+
+def api_fast_startup():
+    """Whether the API-only startup profile is used, which skips the UI and defers setup not needed for generation."""
+
+    from modules.shared_cmd_options import cmd_opts
+
+    return cmd_opts.nowebui and cmd_opts.api_fast_startup
 
 
 def imports():
@@ -36,7 +47,9 @@ def imports():
     shared_init.initialize()
     startup_timer.record("initialize shared")
 
-    from modules import processing, gradio_extensons, ui  # noqa: F401
+    from modules import processing, gradio_extensons  # noqa: F401
+    if not api_fast_startup():
+        from modules import ui  # noqa: F401
     startup_timer.record("other imports")
 
 
@@ -61,18 +74,72 @@ def initialize():
     sd_models.setup_model()
     startup_timer.record("setup SD model")
 
+    if not api_fast_startup():
+        setup_face_restoration(startup_timer)
+
+    initialize_rest(reload_script_modules=False)
+
+
+def setup_face_restoration(timer):
     from modules.shared_cmd_options import cmd_opts
 
     from modules import codeformer_model
     warnings.filterwarnings(action="ignore", category=UserWarning, module="torchvision.transforms.functional_tensor")
     codeformer_model.setup_model(cmd_opts.codeformer_models_path)
-    startup_timer.record("setup codeformer")
+    timer.record("setup codeformer")
 
     from modules import gfpgan_model
     gfpgan_model.setup_model(cmd_opts.gfpgan_models_path)
-    startup_timer.record("setup gfpgan")
+    timer.record("setup gfpgan")
 
-    initialize_rest(reload_script_modules=False)
+
+def list_localizations(timer):
+    from modules.shared_cmd_options import cmd_opts
+
+    from modules import localization
+    localization.list_localizations(cmd_opts.localizations_dir)
+    timer.record("list localizations")
+
+
+def load_upscalers(timer):
+    from modules import modelloader
+    modelloader.load_upscalers()
+    timer.record("load upscalers")
+
+
+def list_textual_inversion_templates(timer):
+    from modules import textual_inversion
+    textual_inversion.textual_inversion.list_textual_inversion_templates()
+    timer.record("refresh textual inversion templates")
+
+
+def start_deferred(tasks):
+    """Runs startup tasks that generation does not need in a background thread, timed by their own deferred_timer."""
+
+    global deferred_thread, deferred_timer
+
+    deferred_timer = Timer(print_log=startup_timer.print_log)
+
+    def run():
+        from modules import errors
+
+        for task in tasks:
+            try:
+                task(deferred_timer)
+            except Exception:
+                errors.report(f"Error running deferred startup task {task.__name__}", exc_info=True)
+
+        print(f"Deferred startup time: {deferred_timer.summary()}.")
+
+    deferred_thread = Thread(target=run, name="deferred startup", daemon=True)
+    deferred_thread.start()
+
+
+def wait_for_deferred_startup():
+    """Blocks until the tasks deferred by the API-only startup profile are done; returns immediately otherwise."""
+
+    if deferred_thread is not None:
+        deferred_thread.join()
 
 
 def initialize_rest(*, reload_script_modules=False):
@@ -103,9 +170,12 @@ def initialize_rest(*, reload_script_modules=False):
     sd_models.list_models()
     startup_timer.record("list SD models")
 
-    from modules import localization
-    localization.list_localizations(cmd_opts.localizations_dir)
-    startup_timer.record("list localizations")
+    deferred = []
+
+    if api_fast_startup():
+        deferred += [setup_face_restoration, list_localizations]
+    else:
+        list_localizations(startup_timer)
 
     with startup_timer.subcategory("load scripts"):
         scripts.load_scripts()
@@ -115,17 +185,19 @@ def initialize_rest(*, reload_script_modules=False):
             importlib.reload(module)
         startup_timer.record("reload script modules")
 
-    from modules import modelloader
-    modelloader.load_upscalers()
-    startup_timer.record("load upscalers")
+    if api_fast_startup():
+        deferred.append(load_upscalers)
+    else:
+        load_upscalers(startup_timer)
 
     from modules import sd_vae
     sd_vae.refresh_vae_list()
     startup_timer.record("refresh VAE")
 
-    from modules import textual_inversion
-    textual_inversion.textual_inversion.list_textual_inversion_templates()
-    startup_timer.record("refresh textual inversion templates")
+    if api_fast_startup():
+        deferred.append(list_textual_inversion_templates)
+    else:
+        list_textual_inversion_templates(startup_timer)
 
     from modules import script_callbacks, sd_hijack_optimizations, sd_hijack
     script_callbacks.on_list_optimizers(sd_hijack_optimizations.list_optimizers)
@@ -167,3 +239,6 @@ def initialize_rest(*, reload_script_modules=False):
     extra_networks.initialize()
     extra_networks.register_default_extra_networks()
     startup_timer.record("initialize extra networks")
+
+    if deferred:
+        start_deferred(deferred)
@@ -92,6 +92,33 @@ def restore_config_state_file():
         print(f"!!! Config state backup not found: {config_state_file}")
 
 
+def write_startup_benchmark(profile):
+    """Appends the time taken by each startup phase to the --startup-benchmark file, if one is set, and reports phases that got slower than in previous runs with the same profile.
+
+    Waits for startup tasks deferred by the API-only profile and includes them under "deferred/".
+    """
+
+    from modules import initialize, timer
+    from modules.shared_cmd_options import cmd_opts
+
+    if not cmd_opts.startup_benchmark:
+        return
+
+    initialize.wait_for_deferred_startup()
+
+    record = startup_timer.dump()
+    if initialize.deferred_timer is not None:
+        record["records"] = {
+            **record["records"],
+            **{f"deferred/{category}": seconds for category, seconds in initialize.deferred_timer.records.items()},
+            "deferred": initialize.deferred_timer.total,
+        }
+
+    slower = timer.write_benchmark(cmd_opts.startup_benchmark, profile, record)
+    for category, seconds, median in slower:
+        print(f"Startup benchmark: {category} took {seconds:.1f}s, up from {median:.1f}s in previous {profile} runs.")
+
+
 def validate_tls_options():
     from modules.shared_cmd_options import cmd_opts
 
@@ -1,3 +1,5 @@
+import contextlib
+import hashlib
 import os
 import sys
 from collections import namedtuple
@@ -10,12 +12,12 @@ import torch.hub
 from torchvision import transforms
 from torchvision.transforms.functional import InterpolationMode
 
-from modules import devices, paths, shared, lowvram, modelloader, errors, torch_utils
+from modules import devices, paths, shared, lowvram, modelloader, errors, torch_utils, cache
 
 blip_image_eval_size = 384
 clip_model_name = 'ViT-L/14'
 
-Category = namedtuple("Category", ["name", "topn", "items"])
+Category = namedtuple("Category", ["name", "topn", "items", "hash"])
 
 re_topn = re.compile(r"\.top(\d+)$")
 
@@ -48,10 +50,13 @@ class InterrogateModels:
     clip_preprocess = None
     dtype = None
     running_on_cpu = None
+    in_session = False
+    resident = False
 
     def __init__(self, content_dir):
         self.loaded_categories = None
         self.skip_categories = []
+        self.text_features_banks = {}
         self.content_dir = content_dir
         self.running_on_cpu = devices.device_interrogate == torch.device("cpu")
 
@@ -73,10 +78,12 @@ class InterrogateModels:
                     continue
                 m = re_topn.search(filename.stem)
                 topn = 1 if m is None else int(m.group(1))
-                with open(filename, "r", encoding="utf8") as file:
-                    lines = [x.strip() for x in file.readlines()]
+                with open(filename, "rb") as file:
+                    data = file.read()
 
-                self.loaded_categories.append(Category(name=filename.stem, topn=topn, items=lines))
+                lines = [x.strip() for x in data.decode("utf8").splitlines()]
+
+                self.loaded_categories.append(Category(name=filename.stem, topn=topn, items=lines, hash=hashlib.sha256(data).hexdigest()))
 
         return self.loaded_categories
 
@@ -147,28 +154,75 @@ class InterrogateModels:
         self.send_clip_to_ram()
         self.send_blip_to_ram()
 
+        if not shared.opts.interrogate_keep_models_in_memory:
+            self.text_features_banks.clear()
+
         devices.torch_gc()
 
-    def rank(self, image_features, text_array, top_count=1):
+    @contextlib.contextmanager
+    def session(self):
+        """Interrogations inside this are part of the caller's job, like a loopback run, and do not begin a job of their own.
+
+        Unless lowvram/medvram optimizations are enabled, the models also stay on the device between interrogations,
+        next to the SD model, rather than the SD model being sent to CPU and the interrogation models back to RAM every time.
+        """
+
+        self.in_session = True
+        self.resident = not lowvram.is_enabled(shared.sd_model)
+        try:
+            yield self
+        finally:
+            self.in_session = False
+            self.resident = False
+
+            self.unload()
+
+    def encode_texts(self, text_array, batch_size=256):
         import clip
 
-        devices.torch_gc()
+        features = []
+        for i in range(0, len(text_array), batch_size):
+            text_tokens = clip.tokenize(list(text_array[i:i + batch_size]), truncate=True).to(devices.device_interrogate)
+            text_features = self.clip_model.encode_text(text_tokens).type(self.dtype)
+            text_features /= text_features.norm(dim=-1, keepdim=True)
+            features.append(text_features)
+
+        return torch.cat(features)
+
+    def text_features(self, category):
+        """Returns normalized CLIP text features for the lines of a category; they are kept on the interrogation device until unload() and in the on-disk cache, keyed by CLIP model and the contents of the category's file."""
 
+        limit = int(shared.opts.interrogate_clip_dict_limit)
+        key = f"{clip_model_name}-{self.dtype}-{category.hash}-{limit}"
+
+        text_features = self.text_features_banks.get(key)
+        if text_features is None:
+            disk_cache = cache.cache("interrogate-clip-text-features")
+            text_features = disk_cache.get(key)
+
+            if text_features is None:
+                devices.torch_gc()
+                text_features = self.encode_texts(category.items[0:limit] if limit != 0 else category.items).to(devices.cpu)
+                disk_cache[key] = text_features
+
+            text_features = text_features.to(devices.device_interrogate)
+            self.text_features_banks[key] = text_features
+
+        return text_features
+
+    def rank_batch(self, image_features, category):
+        """Ranks the lines of a category for each of the images with one matrix multiplication; returns a list of (text, score) lists, one per image."""
+
+        text_array = category.items
         if shared.opts.interrogate_clip_dict_limit != 0:
             text_array = text_array[0:int(shared.opts.interrogate_clip_dict_limit)]
 
-        top_count = min(top_count, len(text_array))
-        text_tokens = clip.tokenize(list(text_array), truncate=True).to(devices.device_interrogate)
-        text_features = self.clip_model.encode_text(text_tokens).type(self.dtype)
-        text_features /= text_features.norm(dim=-1, keepdim=True)
+        top_count = min(category.topn, len(text_array))
 
-        similarity = torch.zeros((1, len(text_array))).to(devices.device_interrogate)
-        for i in range(image_features.shape[0]):
-            similarity += (100.0 * image_features[i].unsqueeze(0) @ text_features.T).softmax(dim=-1)
-        similarity /= image_features.shape[0]
+        similarity = (100.0 * image_features @ self.text_features(category).T).softmax(dim=-1)
 
-        top_probs, top_labels = similarity.cpu().topk(top_count, dim=-1)
-        return [(text_array[top_labels[0][i].numpy()], (top_probs[0][i].numpy()*100)) for i in range(top_count)]
+        top_probs, top_labels = similarity.float().cpu().topk(top_count, dim=-1)
+        return [[(text_array[labels[i].item()], probs[i].item() * 100) for i in range(top_count)] for probs, labels in zip(top_probs, top_labels)]
 
     def generate_caption(self, pil_image):
         gpu_image = transforms.Compose([
@@ -183,40 +237,53 @@ class InterrogateModels:
         return caption[0]
 
     def interrogate(self, pil_image):
-        res = ""
-        shared.state.begin(job="interrogate")
+        return self.interrogate_batch([pil_image])[0]
+
+    def interrogate_batch(self, pil_images, batch_size=16):
+        """Interrogates many images with a single load of the models; returns a caption for each image."""
+
+        res = [""] * len(pil_images)
+        if not self.in_session:
+            shared.state.begin(job="interrogate")
         try:
-            lowvram.send_everything_to_cpu()
-            devices.torch_gc()
+            if not self.resident:
+                lowvram.send_everything_to_cpu()
+                devices.torch_gc()
 
             self.load()
 
-            caption = self.generate_caption(pil_image)
-            self.send_blip_to_ram()
-            devices.torch_gc()
-
-            res = caption
+            for i, pil_image in enumerate(pil_images):
+                res[i] = self.generate_caption(pil_image)
 
-            clip_image = self.clip_preprocess(pil_image).unsqueeze(0).type(self.dtype).to(devices.device_interrogate)
+            if not self.resident:
+                self.send_blip_to_ram()
+                devices.torch_gc()
 
             with torch.no_grad(), devices.autocast():
-                image_features = self.clip_model.encode_image(clip_image).type(self.dtype)
+                categories = self.categories()
 
-                image_features /= image_features.norm(dim=-1, keepdim=True)
+                for start in range(0, len(pil_images), batch_size):
+                    clip_images = torch.stack([self.clip_preprocess(x) for x in pil_images[start:start + batch_size]]).type(self.dtype).to(devices.device_interrogate)
+                    image_features = self.clip_model.encode_image(clip_images).type(self.dtype)
 
-                for cat in self.categories():
-                    matches = self.rank(image_features, cat.items, top_count=cat.topn)
-                    for match, score in matches:
-                        if shared.opts.interrogate_return_ranks:
-                            res += f", ({match}:{score/100:.3f})"
-                        else:
-                            res += f", {match}"
+                    image_features /= image_features.norm(dim=-1, keepdim=True)
+
+                    for cat in categories:
+                        for i, matches in enumerate(self.rank_batch(image_features, cat), start=start):
+                            for match, score in matches:
+                                if shared.opts.interrogate_return_ranks:
+                                    res[i] += f", ({match}:{score/100:.3f})"
+                                else:
+                                    res[i] += f", {match}"
 
         except Exception:
             errors.report("Error interrogating", exc_info=True)
-            res += "<error>"
+            res = [x + "<error>" for x in res]
+
+        if not self.resident:
+            self.unload()
 
-        self.unload()
-        shared.state.end()
+        if not self.in_session:
+            shared.state.end()
 
         return res
@@ -0,0 +1,215 @@
+import contextlib
+import contextvars
+import threading
+import time
+
+metrics = []
+lock = threading.Lock()
+timeline = None
+timeline_trace_id = None
+
+# the trace the code running in a context belongs to; threads that work for it get a copy of the context (see prefetch)
+current_trace_id = contextvars.ContextVar("current_trace_id", default=None)
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+
+    return "{" + ",".join(f'{k}="{escape_label_value(v)}"' for k, v in labels) + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+
+        metrics.append(self)
+
+    def samples(self):
+        """Yields (suffix, labels, value) tuples for the text exposition format."""
+
+        for labels, value in self.values.items():
+            yield "", labels, value
+
+    def collect(self):
+        with lock:
+            return list(self.samples())
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+        for suffix, labels, value in self.collect():
+            lines.append(f"{self.name}{suffix}{format_labels(labels)} {value}")
+
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A gauge whose value is either set directly or, if a function is given, read from it every time metrics are collected."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, function=None):
+        super().__init__(name, documentation)
+        self.function = function
+
+    def set(self, value, **labels):
+        with lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def collect(self):
+        if self.function is None:
+            return super().collect()
+
+        # the function is called without holding the lock because it may take other locks that are held while observing metrics
+        try:
+            values = self.function()
+        except Exception:
+            return []
+
+        if not isinstance(values, dict):
+            values = {(): values}
+
+        return [("", labels, value) for labels, value in values.items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets):
+        super().__init__(name, documentation)
+        self.buckets = sorted(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with lock:
+            counts, total, count = self.values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+
+            self.values[key] = (counts, total + value, count + 1)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observes the time spent inside; yields a Timing whose elapsed is set on exit. Also adds the stage to the timeline if one is being recorded."""
+
+        timing = Timing()
+        try:
+            yield timing
+        finally:
+            timing.stop()
+            self.observe(timing.elapsed, **labels)
+
+            if timeline is not None and current_trace_id.get() == timeline_trace_id:
+                timeline.append({**labels, "start": timing.start_time, "duration": timing.elapsed})
+
+    def samples(self):
+        for labels, (counts, total, count) in self.values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield "_bucket", labels + (("le", bound),), bucket_count
+
+            yield "_bucket", labels + (("le", "+Inf"),), count
+            yield "_sum", labels, total
+            yield "_count", labels, count
+
+
+class Timing:
+    def __init__(self):
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        self.elapsed = None
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def start_timeline(trace_id=None):
+    """Starts recording every stage timed with Histogram.time() for trace_id into a list, which is returned; generation runs one job at a time, so the timeline is global.
+
+    Stages count as part of the trace if they are timed in the context that started the timeline or in a copy of it,
+    so that stages of other requests running at the same time, like encoding their images, are left out.
+    """
+
+    global timeline, timeline_trace_id
+
+    timeline = []
+    timeline_trace_id = trace_id
+    current_trace_id.set(trace_id)
+    return timeline
+
+
+def stop_timeline():
+    global timeline, timeline_trace_id
+
+    timeline = None
+    timeline_trace_id = None
+    current_trace_id.set(None)
+
+
+def queue_depth():
+    from modules import call_queue
+
+    return call_queue.queue_lock.stats()["queue_depth"]
+
+
+def loaded_models():
+    from modules import sd_models
+
+    return len(sd_models.model_data.loaded_sd_models)
+
+
+def memory_bytes():
+    import torch
+
+    res = {}
+
+    try:
+        import os
+        import psutil
+
+        res[(("kind", "ram_rss"),)] = psutil.Process(os.getpid()).memory_info().rss
+    except Exception:
+        pass
+
+    if torch.cuda.is_available():
+        res[(("kind", "cuda_allocated"),)] = torch.cuda.memory_allocated()
+        res[(("kind", "cuda_reserved"),)] = torch.cuda.memory_reserved()
+
+    return res
+
+
+stage_seconds = Histogram(
+    "sd_webui_stage_seconds",
+    "Time spent in a stage of the generation pipeline; sampling_step is the mean time of one sampling step in a batch.",
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300],
+)
+cache_requests = Counter("sd_webui_cache_requests_total", "Lookups in the generation caches, by cache and result (hit or miss).")
+nan_retries = Counter("sd_webui_nan_retries_total", "Times a VAE decode produced NaNs and was retried in another precision.")
+api_requests = Counter("sd_webui_api_requests_total", "Requests to /sdapi endpoints, by endpoint and status code.")
+queue_depth_gauge = Gauge("sd_webui_queue_depth", "Tasks waiting for the queue lock.", queue_depth)
+loaded_models_gauge = Gauge("sd_webui_loaded_models", "Stable Diffusion checkpoints currently loaded.", loaded_models)
+memory_gauge = Gauge("sd_webui_memory_bytes", "Memory used by this process.", memory_bytes)
+
+
+def exposition():
+    """Returns all metrics in the Prometheus text exposition format."""
+
+    return "\n".join(metric.exposition() for metric in metrics) + "\n"
@@ -54,6 +54,7 @@ def load_models(model_path: str, model_url: str = None, command_path: str = None
     @return: A list of paths containing the desired model(s)
     """
     output = []
+    seen = set()
 
     try:
         places = []
@@ -75,7 +76,8 @@ def load_models(model_path: str, model_url: str = None, command_path: str = None
                     continue
                 if ext_blacklist is not None and any(full_path.endswith(x) for x in ext_blacklist):
                     continue
-                if full_path not in output:
+                if full_path not in seen:
+                    seen.add(full_path)
                     output.append(full_path)
 
         if model_url is not None and len(output) == 0:
@@ -2,7 +2,7 @@ import os
 
 from PIL import Image
 
-from modules import shared, images, devices, scripts, scripts_postprocessing, ui_common, infotext_utils
+from modules import shared, images, devices, scripts, scripts_postprocessing, ui_common, infotext_utils, prefetch
 from modules.shared import opts
 
 
@@ -44,91 +44,121 @@ def run_postprocessing(extras_mode, image, image_folder, input_dir, output_dir,
     data_to_process = list(get_images(extras_mode, image, image_folder, input_dir))
     shared.state.job_count = len(data_to_process)
 
-    for image_placeholder, name in data_to_process:
-        image_data: Image.Image
+    io_workers = max(int(opts.postprocessing_io_workers), 1)
+    read_stats = prefetch.StageStats("extras_read", workers=io_workers)
+    process_stats = prefetch.StageStats("extras_process")
 
-        shared.state.nextjob()
-        shared.state.textinfo = name
-        shared.state.skipped = False
+    # with numbered filenames, save_image picks the next free number, so saving is done in order on a single thread
+    forced_filenames = opts.use_original_name_batch and extras_mode != 0
+    write_stats = prefetch.StageStats("extras_write", workers=io_workers if forced_filenames else 1)
 
-        if shared.state.interrupted or shared.state.stopping_generation:
-            break
+    reader = prefetch.prefetch(lambda x: read_image(x[0]), data_to_process, workers=io_workers, ahead=io_workers * 2, stats=read_stats)
 
-        if isinstance(image_placeholder, str):
-            try:
-                image_data = images.read(image_placeholder)
-            except Exception:
-                continue
-        else:
-            image_data = image_placeholder
+    with prefetch.WriterPool(workers=write_stats.workers, max_pending=io_workers * 2, stats=write_stats) as writer:
+        for (_, name), image_info, error in reader:
+            shared.state.nextjob()
+            shared.state.textinfo = name
+            shared.state.skipped = False
 
-        image_data = image_data if image_data.mode in ("RGBA", "RGB") else image_data.convert("RGB")
+            if shared.state.interrupted or shared.state.stopping_generation:
+                reader.close()
+                break
 
-        parameters, existing_pnginfo = images.read_info_from_image(image_data)
-        if parameters:
-            existing_pnginfo["parameters"] = parameters
+            if error is not None:
+                continue
 
-        initial_pp = scripts_postprocessing.PostprocessedImage(image_data)
+            image_data, existing_pnginfo = image_info
 
-        scripts.scripts_postproc.run(initial_pp, args)
+            with process_stats.time():
+                initial_pp = scripts_postprocessing.PostprocessedImage(image_data)
 
-        if shared.state.skipped:
-            continue
+                scripts.scripts_postproc.run(initial_pp, args)
 
-        used_suffixes = {}
-        for pp in [initial_pp, *initial_pp.extra_images]:
-            suffix = pp.get_suffix(used_suffixes)
+            if shared.state.skipped:
+                continue
 
-            if opts.use_original_name_batch and name is not None:
-                basename = os.path.splitext(os.path.basename(name))[0]
-                forced_filename = basename + suffix
-            else:
-                basename = ''
-                forced_filename = None
+            used_suffixes = {}
+            for pp in [initial_pp, *initial_pp.extra_images]:
+                suffix = pp.get_suffix(used_suffixes)
 
-            infotext = ", ".join([k if k == v else f'{k}: {infotext_utils.quote(v)}' for k, v in pp.info.items() if v is not None])
+                if opts.use_original_name_batch and name is not None:
+                    basename = os.path.splitext(os.path.basename(name))[0]
+                    forced_filename = basename + suffix
+                else:
+                    basename = ''
+                    forced_filename = None
 
-            if opts.enable_pnginfo:
-                pp.image.info = existing_pnginfo
-                pp.image.info["postprocessing"] = infotext
+                infotext = ", ".join([k if k == v else f'{k}: {infotext_utils.quote(v)}' for k, v in pp.info.items() if v is not None])
 
-            shared.state.assign_current_image(pp.image)
+                # each image gets its own copy, since saving it on a writer thread adds to it while later images are processed
+                pnginfo = dict(existing_pnginfo)
 
-            if save_output:
-                fullfn, _ = images.save_image(pp.image, path=outpath, basename=basename, extension=opts.samples_format, info=infotext, short_filename=True, no_prompt=True, grid=False, pnginfo_section_name="extras", existing_info=existing_pnginfo, forced_filename=forced_filename, suffix=suffix)
+                if opts.enable_pnginfo:
+                    pp.image.info = pnginfo
+                    pp.image.info["postprocessing"] = infotext
 
-                if pp.caption:
-                    caption_filename = os.path.splitext(fullfn)[0] + ".txt"
-                    existing_caption = ""
-                    try:
-                        with open(caption_filename, encoding="utf8") as file:
-                            existing_caption = file.read().strip()
-                    except FileNotFoundError:
-                        pass
+                shared.state.assign_current_image(pp.image)
 
-                    action = shared.opts.postprocessing_existing_caption_action
-                    if action == 'Prepend' and existing_caption:
-                        caption = f"{existing_caption} {pp.caption}"
-                    elif action == 'Append' and existing_caption:
-                        caption = f"{pp.caption} {existing_caption}"
-                    elif action == 'Keep' and existing_caption:
-                        caption = existing_caption
-                    else:
-                        caption = pp.caption
+                if save_output:
+                    writer.submit(save_postprocessed_image, pp, outpath, basename, infotext, pnginfo, forced_filename, suffix)
 
-                    caption = caption.strip()
-                    if caption:
-                        with open(caption_filename, "w", encoding="utf8") as file:
-                            file.write(caption)
+                if extras_mode != 2 or show_extras_results:
+                    outputs.append(pp.image)
 
-            if extras_mode != 2 or show_extras_results:
-                outputs.append(pp.image)
+    if extras_mode == 2:
+        print(f"Extras batch: {read_stats}; {process_stats}; {write_stats}")
 
     devices.torch_gc()
     shared.state.end()
     return outputs, ui_common.plaintext_to_html(infotext), ''
 
 
+def read_image(image_placeholder):
+    """Reads an image for postprocessing, in a reader thread; returns the image and its existing PNG info."""
+
+    if isinstance(image_placeholder, str):
+        image_data = images.read(image_placeholder)
+    else:
+        image_data = image_placeholder
+
+    image_data = image_data if image_data.mode in ("RGBA", "RGB") else image_data.convert("RGB")
+
+    parameters, existing_pnginfo = images.read_info_from_image(image_data)
+    if parameters:
+        existing_pnginfo["parameters"] = parameters
+
+    return image_data, existing_pnginfo
+
+
+def save_postprocessed_image(pp, outpath, basename, infotext, existing_pnginfo, forced_filename, suffix):
+    """Saves a postprocessed image and its caption, in a writer thread."""
+
+    fullfn, _ = images.save_image(pp.image, path=outpath, basename=basename, extension=opts.samples_format, info=infotext, short_filename=True, no_prompt=True, grid=False, pnginfo_section_name="extras", existing_info=existing_pnginfo, forced_filename=forced_filename, suffix=suffix)
+
+    if pp.caption:
+        caption_filename = os.path.splitext(fullfn)[0] + ".txt"
+        existing_caption = ""
+        try:
+            with open(caption_filename, encoding="utf8") as file:
+                existing_caption = file.read().strip()
+        except FileNotFoundError:
+            pass
+
+        action = shared.opts.postprocessing_existing_caption_action
+        if action == 'Prepend' and existing_caption:
+            caption = f"{existing_caption} {pp.caption}"
+        elif action == 'Append' and existing_caption:
+            caption = f"{pp.caption} {existing_caption}"
+        elif action == 'Keep' and existing_caption:
+            caption = existing_caption
+        else:
+            caption = pp.caption
+
+        caption = caption.strip()
+        if caption:
+            with open(caption_filename, "w", encoding="utf8") as file:
+                file.write(caption)
+
 def run_postprocessing_webui(id_task, *args, **kwargs):
     return run_postprocessing(*args, **kwargs)
 
@@ -0,0 +1,126 @@
+import collections
+import contextlib
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from modules import metrics
+
+
+def timed(stats):
+    return stats.time() if stats is not None else contextlib.nullcontext()
+
+
+class StageStats:
+    """Counts items passing through a stage of a pipeline and the time spent on them, for reporting throughput."""
+
+    def __init__(self, name, workers=1):
+        self.name = name
+        self.workers = workers
+        self.count = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def time(self):
+        try:
+            with metrics.stage_seconds.time(stage=self.name) as timing:
+                yield
+        finally:
+            with self.lock:
+                self.count += 1
+                self.busy += timing.elapsed
+
+    def throughput(self):
+        """Items per second the stage can handle with all its workers busy."""
+
+        return self.count * self.workers / self.busy if self.busy else 0.0
+
+    def __str__(self):
+        return f"{self.name}: {self.count} in {self.busy:.2f}s, {self.throughput():.2f}/s with {self.workers} worker{'s' if self.workers != 1 else ''}"
+
+
+def prefetch(function, items, workers=4, ahead=8, stats=None):
+    """Calls function on items in a pool of threads, at most ahead items ahead of the consumer.
+
+    Yields (item, result, error) in the order of items; error is the exception raised by function, if any, and result is
+    None then. Closing the generator early (e.g. on interrupt) cancels items that have not started yet.
+
+    function runs in a copy of the caller's context, so stages it times count towards the caller's trace (see metrics).
+    """
+
+    def call(item):
+        with timed(stats):
+            return function(item)
+
+    items = iter(items)
+    pending = collections.deque()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit():
+            for item in items:
+                pending.append((item, executor.submit(contextvars.copy_context().run, call, item)))
+                return
+
+        try:
+            for _ in range(max(ahead, 1)):
+                submit()
+
+            while pending:
+                item, future = pending.popleft()
+                submit()
+
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = None, e
+
+                yield item, result, error
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+class WriterPool:
+    """Runs write jobs in a pool of threads behind the producer; submit() blocks while max_pending jobs are not finished yet.
+
+    close() waits for all jobs and raises the first error any of them had. With one worker, jobs run in the order they
+    were submitted.
+    """
+
+    def __init__(self, workers=2, max_pending=8, stats=None):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.stats = stats
+        self.errors = []
+
+    def run(self, function, args, kwargs):
+        try:
+            with timed(self.stats):
+                function(*args, **kwargs)
+        except Exception as e:
+            self.errors.append(e)
+        finally:
+            self.slots.release()
+
+    def submit(self, function, *args, **kwargs):
+        if self.errors:
+            raise self.errors[0]
+
+        self.slots.acquire()
+        self.executor.submit(contextvars.copy_context().run, self.run, function, args, kwargs)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+        if self.errors:
+            raise self.errors[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,176 @@
+import collections
+import contextlib
+import itertools
+import threading
+import time
+
+from modules import metrics
+
+priorities = {
+    "interactive": 0,
+    "normal": 1,
+    "batch": 2,
+}
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class TaskExpired(Exception):
+    pass
+
+
+def priority_index(priority):
+    if isinstance(priority, int):
+        return priority
+
+    if priority not in priorities:
+        raise ValueError(f"unknown priority {priority!r}; must be one of: {', '.join(priorities)}")
+
+    return priorities[priority]
+
+
+class Waiter:
+    def __init__(self, id_task, priority, client, deadline, seq):
+        self.id_task = id_task
+        self.priority = priority
+        self.client = client
+        self.deadline = deadline
+        self.seq = seq
+        self.time_queued = time.time()
+        self.event = threading.Event()
+        self.error = None
+
+    def expired(self, now):
+        return self.deadline is not None and now >= self.deadline
+
+
+class PriorityLock:
+    """A drop-in replacement for FIFOLock that lets waiting tasks in by priority rather than by arrival.
+
+    Among waiters of the same priority, the client that has been let in the fewest times since the queue was last empty
+    goes first, so one client submitting many jobs does not starve the others; ties are broken by arrival order.
+    Waiters whose deadline passes before they get the lock are dropped with TaskExpired, and queued waiters can be
+    removed by task id with cancel(), which makes them raise TaskCancelled. A running task is never preempted.
+    """
+
+    def __init__(self, history_size=256):
+        self._inner_lock = threading.Lock()
+        self._locked = False
+        self._waiters = []
+        self._seq = itertools.count()
+        self._served = collections.Counter()
+        self.wait_times = collections.deque(maxlen=history_size)
+        self.expired_count = 0
+        self.cancelled_count = 0
+
+    def _grant(self, waiter):
+        wait_time = time.time() - waiter.time_queued
+
+        self._served[waiter.client] += 1
+        self.wait_times.append((waiter.priority, wait_time))
+        metrics.stage_seconds.observe(wait_time, stage="queue_wait")
+
+    def _drop(self, waiter, error):
+        self._waiters.remove(waiter)
+        waiter.error = error
+        waiter.event.set()
+
+    def _drop_expired(self):
+        now = time.time()
+        for waiter in [x for x in self._waiters if x.expired(now)]:
+            self.expired_count += 1
+            self._drop(waiter, TaskExpired(f"task {waiter.id_task} has not started before its deadline"))
+
+    def acquire(self, blocking=True, *, id_task=None, priority="normal", client=None, timeout=None):
+        """Acquires the lock; timeout is how long the caller is willing to wait in the queue, after which TaskExpired is raised."""
+
+        waiter = Waiter(id_task, priority_index(priority), client, time.time() + timeout if timeout is not None else None, next(self._seq))
+
+        with self._inner_lock:
+            self._drop_expired()
+
+            if not self._locked and not self._waiters:
+                self._locked = True
+                self._grant(waiter)
+                return True
+
+            if not blocking:
+                return False
+
+            self._waiters.append(waiter)
+
+        while not waiter.event.wait(None if waiter.deadline is None else max(waiter.deadline - time.time(), 0)):
+            with self._inner_lock:
+                if waiter in self._waiters and waiter.expired(time.time()):
+                    self.expired_count += 1
+                    self._drop(waiter, TaskExpired(f"task {waiter.id_task} has not started before its deadline"))
+
+        if waiter.error is not None:
+            raise waiter.error
+
+        return True
+
+    def release(self):
+        with self._inner_lock:
+            self._drop_expired()
+
+            if not self._waiters:
+                self._locked = False
+                self._served.clear()
+                return
+
+            # ownership is handed to the chosen waiter directly so that no newcomer can barge in between
+            waiter = min(self._waiters, key=lambda x: (x.priority, self._served[x.client], x.seq))
+            self._waiters.remove(waiter)
+            self._grant(waiter)
+            waiter.event.set()
+
+    __enter__ = acquire
+
+    def __exit__(self, t, v, tb):
+        self.release()
+
+    @contextlib.contextmanager
+    def task(self, id_task=None, *, priority="normal", client=None, timeout=None):
+        self.acquire(id_task=id_task, priority=priority, client=client, timeout=timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def cancel(self, id_task):
+        """Removes a queued task; returns False if there is no such task waiting (it may be running already)."""
+
+        with self._inner_lock:
+            waiter = next((x for x in self._waiters if x.id_task == id_task), None)
+            if waiter is None:
+                return False
+
+            self.cancelled_count += 1
+            self._drop(waiter, TaskCancelled(f"task {id_task} was cancelled"))
+            return True
+
+    def stats(self):
+        with self._inner_lock:
+            now = time.time()
+            queued = sorted(self._waiters, key=lambda x: (x.priority, self._served[x.client], x.seq))
+
+            wait_time = {}
+            for name, index in priorities.items():
+                waits = [seconds for priority, seconds in self.wait_times if priority == index]
+                wait_time[name] = {
+                    "count": len(waits),
+                    "mean": sum(waits) / len(waits) if waits else 0,
+                    "max": max(waits, default=0),
+                }
+
+            return {
+                "locked": self._locked,
+                "queue_depth": len(queued),
+                "queued": [{"id_task": x.id_task, "priority": x.priority, "client": x.client, "waiting": now - x.time_queued} for x in queued],
+                "wait_time": wait_time,
+                "expired": self.expired_count,
+                "cancelled": self.cancelled_count,
+            }
@@ -5,6 +5,7 @@ import math
 import os
 import sys
 import hashlib
+from contextlib import nullcontext
 from dataclasses import dataclass, field
 
 import torch
@@ -16,7 +17,7 @@ from skimage import exposure
 from typing import Any
 
 import modules.sd_hijack
-from modules import devices, prompt_parser, masking, sd_samplers, lowvram, infotext_utils, extra_networks, sd_vae_approx, scripts, sd_samplers_common, sd_unet, errors, rng, profiling
+from modules import devices, prompt_parser, masking, sd_samplers, lowvram, infotext_utils, extra_networks, sd_vae_approx, scripts, sd_samplers_common, sd_unet, errors, rng, profiling, metrics, batch_sizing
 from modules.rng import slerp # noqa: F401
 from modules.sd_hijack import model_hijack
 from modules.sd_samplers_common import images_tensor_to_samples, decode_first_stage, approximation_indexes
@@ -152,6 +153,7 @@ class StableDiffusionProcessing:
     scheduler: str = None
     batch_size: int = 1
     n_iter: int = 1
+    auto_batch_size: bool = False
     steps: int = 50
     cfg_scale: float = 7.0
     width: int = 512
@@ -224,6 +226,7 @@ class StableDiffusionProcessing:
     sd_vae_hash: str = field(default=None, init=False)
 
     is_api: bool = field(default=False, init=False)
+    trace_id: str = field(default=None, init=False)  # set when this request is recorded as a trace of its own; see profiling.new_trace_id()
 
     def __post_init__(self):
         if self.sampler_index is not None:
@@ -401,6 +404,11 @@ class StableDiffusionProcessing:
     def sample(self, conditioning, unconditional_conditioning, seeds, subseeds, subseed_strength, prompts):
         raise NotImplementedError()
 
+    def sampled_steps(self):
+        """Number of sampling steps sample() runs for a batch, over all of its passes."""
+
+        return self.steps
+
     def close(self):
         self.sampler = None
         self.c = None
@@ -480,11 +488,14 @@ class StableDiffusionProcessing:
 
         for cache in caches:
             if cache[0] is not None and cached_params == cache[0]:
+                metrics.cache_requests.inc(cache="conds", result="hit")
                 return cache[1]
 
+        metrics.cache_requests.inc(cache="conds", result="miss")
+
         cache = caches[0]
 
-        with devices.autocast():
+        with devices.autocast(), metrics.stage_seconds.time(stage="text_encoding"):
             cache[1] = function(shared.sd_model, required_prompts, steps, hires_steps, shared.opts.use_old_scheduling)
 
         cache[0] = cached_params
@@ -658,6 +669,8 @@ def decode_latent_batch(model, batch, target_device=None, check_for_nans=False):
                     f"To disable this behavior, disable the '{autofix_dtype_setting}' setting.{autofix_dtype_comment}"
                 )
 
+                metrics.nan_retries.inc()
+
                 devices.dtype_vae = autofix_dtype
                 model.first_stage_model.to(devices.dtype_vae)
                 batch = batch.to(devices.dtype_vae)
@@ -843,7 +856,8 @@ def process_images(p: StableDiffusionProcessing) -> Processed:
         # backwards compatibility, fix sampler and scheduler if invalid
         sd_samplers.fix_p_invalid_sampler_and_scheduler(p)
 
-        with profiling.Profiler():
+        # requests with their own trace are profiled as a whole by the caller
+        with profiling.Profiler() if p.trace_id is None else nullcontext(), metrics.stage_seconds.time(stage="total"):
             res = process_images_inner(p)
 
     finally:
@@ -908,8 +922,13 @@ def process_images_inner(p: StableDiffusionProcessing) -> Processed:
     else:
         p.all_subseeds = [int(subseed) + x for x in range(len(p.all_prompts))]
 
+    if p.auto_batch_size and len(getattr(p, 'init_images', None) or []) <= 1:
+        # the same images in the largest batches that fit in memory, spread evenly over as few batches as possible
+        max_batch_size = batch_sizing.fitting_batch_size(p, min(len(p.all_prompts), opts.auto_batch_size_max)) or p.batch_size
+        p.batch_size, p.n_iter = batch_sizing.even_batches(len(p.all_prompts), max_batch_size, exact=isinstance(p, StableDiffusionProcessingImg2Img))
+
     if os.path.exists(cmd_opts.embeddings_dir) and not p.do_not_reload_embeddings:
-        model_hijack.embedding_db.load_textual_inversion_embeddings()
+        model_hijack.embedding_db.update_for_generation()
 
     if p.scripts is not None:
         p.scripts.process(p)
@@ -984,8 +1003,11 @@ def process_images_inner(p: StableDiffusionProcessing) -> Processed:
 
             sd_models.apply_alpha_schedule_override(p.sd_model, p)
 
-            with devices.without_autocast() if devices.unet_needs_upcast else devices.autocast():
-                samples_ddim = p.sample(conditioning=p.c, unconditional_conditioning=p.uc, seeds=p.seeds, subseeds=p.subseeds, subseed_strength=p.subseed_strength, prompts=p.prompts)
+            with metrics.stage_seconds.time(stage="sampling") as sampling_timing:
+                with devices.without_autocast() if devices.unet_needs_upcast else devices.autocast():
+                    samples_ddim = p.sample(conditioning=p.c, unconditional_conditioning=p.uc, seeds=p.seeds, subseeds=p.subseeds, subseed_strength=p.subseed_strength, prompts=p.prompts)
+
+            metrics.stage_seconds.observe(sampling_timing.elapsed / max(p.sampled_steps(), 1), stage="sampling_step")
 
             if p.scripts is not None:
                 ps = scripts.PostSampleArgs(samples_ddim)
@@ -999,7 +1021,8 @@ def process_images_inner(p: StableDiffusionProcessing) -> Processed:
 
                 if opts.sd_vae_decode_method != 'Full':
                     p.extra_generation_params['VAE Decoder'] = opts.sd_vae_decode_method
-                x_samples_ddim = decode_latent_batch(p.sd_model, samples_ddim, target_device=devices.cpu, check_for_nans=True)
+                with metrics.stage_seconds.time(stage="vae_decode"):
+                    x_samples_ddim = decode_latent_batch(p.sd_model, samples_ddim, target_device=devices.cpu, check_for_nans=True)
 
             x_samples_ddim = torch.stack(x_samples_ddim).float()
             x_samples_ddim = torch.clamp((x_samples_ddim + 1.0) / 2.0, min=0.0, max=1.0)
@@ -1082,7 +1105,8 @@ def process_images_inner(p: StableDiffusionProcessing) -> Processed:
                     image = pp.image
 
                 if save_samples:
-                    images.save_image(image, p.outpath_samples, "", p.seeds[i], p.prompts[i], opts.samples_format, info=infotext(i), p=p)
+                    with metrics.stage_seconds.time(stage="image_save"):
+                        images.save_image(image, p.outpath_samples, "", p.seeds[i], p.prompts[i], opts.samples_format, info=infotext(i), p=p)
 
                 text = infotext(i)
                 infotexts.append(text)
@@ -1304,6 +1328,13 @@ class StableDiffusionProcessingTxt2Img(StableDiffusionProcessing):
             if self.hr_upscaler is not None:
                 self.extra_generation_params["Hires upscaler"] = self.hr_upscaler
 
+    def sampled_steps(self):
+        steps = 0 if self.firstpass_image is not None and self.enable_hr else self.steps
+        if self.enable_hr:
+            steps += self.hr_second_pass_steps or self.steps
+
+        return steps
+
     def sample(self, conditioning, unconditional_conditioning, seeds, subseeds, subseed_strength, prompts):
         self.sampler = sd_samplers.create_sampler(self.sampler_name, self.sd_model)
 
@@ -1756,6 +1787,11 @@ class StableDiffusionProcessingImg2Img(StableDiffusionProcessing):
 
         self.image_conditioning = self.img2img_image_conditioning(image * 2 - 1, self.init_latent, image_mask, self.mask_round)
 
+    def sampled_steps(self):
+        # only the part of the schedule after denoising_strength of the noise is added is sampled
+        _, t_enc = sd_samplers_common.setup_img2img_steps(self)
+        return t_enc + 1
+
     def sample(self, conditioning, unconditional_conditioning, seeds, subseeds, subseed_strength, prompts):
         x = self.rng.next()
 
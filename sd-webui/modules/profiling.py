@@ -1,11 +1,37 @@
+import collections
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
 import torch
 
-from modules import shared, ui_gradio_extensions
+from modules import shared, ui_gradio_extensions, metrics
+from modules.paths_internal import data_path
+
+traces_dir = os.environ.get('SD_WEBUI_TRACES_DIR', os.path.join(data_path, "traces"))
+re_trace_id = re.compile(r"^[0-9a-f]{32}$")
+
+recent_traces = collections.deque()
+recent_traces_lock = threading.Lock()
 
 
 class Profiler:
-    def __init__(self):
-        if not shared.opts.profiling_enable:
+    """Records a torch profiler trace of the code inside it.
+
+    Without trace_id, this is controlled by the profiling_enable setting and writes to profiling_filename. With
+    trace_id (see new_trace_id()), it always records, and export() writes the trace to traces_dir under that id
+    together with the timeline of pipeline stages recorded by metrics for the trace while it was active; export() is
+    left to the caller so that it can be done after the queue lock is released.
+    """
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id
+        self.timeline = None
+
+        if not shared.opts.profiling_enable and trace_id is None:
             self.profiler = None
             return
 
@@ -27,20 +53,88 @@ class Profiler:
         )
 
     def __enter__(self):
+        if self.trace_id is not None:
+            self.timeline = metrics.start_timeline(self.trace_id)
+
         if self.profiler:
             self.profiler.__enter__()
 
         return self
 
     def __exit__(self, exc_type, exc, exc_tb):
+        if self.trace_id is not None:
+            metrics.stop_timeline()
+
         if self.profiler:
             shared.state.textinfo = "Finishing profile..."
 
             self.profiler.__exit__(exc_type, exc, exc_tb)
 
-            self.profiler.export_chrome_trace(shared.opts.profiling_filename)
+            if self.trace_id is None:
+                self.profiler.export_chrome_trace(shared.opts.profiling_filename)
+
+    def export(self):
+        """Writes the trace and the timeline recorded for trace_id."""
+
+        if self.trace_id is None:
+            return
+
+        os.makedirs(traces_dir, exist_ok=True)
+
+        if self.profiler:
+            self.profiler.export_chrome_trace(trace_filename(self.trace_id))
+
+        with open(timeline_filename(self.trace_id), "w", encoding="utf8") as file:
+            json.dump(self.timeline, file, indent=2)
+
+        remove_old_traces()
 
 
 def webpath():
     return ui_gradio_extensions.webpath(shared.opts.profiling_filename)
 
+
+def new_trace_id():
+    """Returns an id for a per-request trace, or None if profiling_api_traces_per_hour traces have already been recorded in the last hour."""
+
+    now = time.time()
+
+    with recent_traces_lock:
+        while recent_traces and recent_traces[0] < now - 3600:
+            recent_traces.popleft()
+
+        if len(recent_traces) >= shared.opts.profiling_api_traces_per_hour:
+            return None
+
+        recent_traces.append(now)
+
+    return uuid.uuid4().hex
+
+
+def trace_filename(trace_id):
+    return os.path.join(traces_dir, f"{trace_id}.json")
+
+
+def timeline_filename(trace_id):
+    return os.path.join(traces_dir, f"{trace_id}.timeline.json")
+
+
+def is_valid_trace_id(trace_id):
+    return re_trace_id.match(trace_id) is not None
+
+
+def list_traces():
+    if not os.path.isdir(traces_dir):
+        return []
+
+    filenames = [x for x in os.listdir(traces_dir) if x.endswith(".timeline.json")]
+    filenames.sort(key=lambda x: os.path.getmtime(os.path.join(traces_dir, x)), reverse=True)
+
+    return [x[:-len(".timeline.json")] for x in filenames]
+
+
+def remove_old_traces():
+    for trace_id in list_traces()[int(shared.opts.profiling_api_traces_keep):]:
+        for filename in (trace_filename(trace_id), timeline_filename(trace_id)):
+            if os.path.exists(filename):
+                os.remove(filename)
@@ -1,5 +1,3 @@
-import base64
-import io
 import time
 
 import gradio as gr
@@ -52,6 +50,10 @@ def record_results(id_task, res):
 def add_task_to_queue(id_job):
     pending_tasks[id_job] = time.time()
 
+
+def remove_task_from_queue(id_job):
+    pending_tasks.pop(id_job, None)
+
 class PendingTasksResponse(BaseModel):
     size: int = Field(title="Pending task size")
     tasks: List[str] = Field(title="Pending task ids")
@@ -119,24 +121,10 @@ def progressapi(req: ProgressRequest):
     if opts.live_previews_enable and req.live_preview:
         shared.state.set_current_image()
         if shared.state.id_live_preview != req.id_live_preview:
-            image = shared.state.current_image
-            if image is not None:
-                buffered = io.BytesIO()
-
-                if opts.live_previews_image_format == "png":
-                    # using optimize for large images takes an enormous amount of time
-                    if max(*image.size) <= 256:
-                        save_kwargs = {"optimize": True}
-                    else:
-                        save_kwargs = {"optimize": False, "compress_level": 1}
-
-                else:
-                    save_kwargs = {}
-
-                image.save(buffered, format=opts.live_previews_image_format, **save_kwargs)
-                base64_image = base64.b64encode(buffered.getvalue()).decode('ascii')
-                live_preview = f"data:image/{opts.live_previews_image_format};base64,{base64_image}"
-                id_live_preview = shared.state.id_live_preview
+            data_url, id_live_preview_available = shared.state.current_image_data_url()
+            if data_url is not None:
+                live_preview = data_url
+                id_live_preview = id_live_preview_available
 
     return ProgressResponse(active=active, queued=queued, completed=completed, progress=progress, eta=eta, live_preview=live_preview, id_live_preview=id_live_preview, textinfo=shared.state.textinfo)
 
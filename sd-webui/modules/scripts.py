@@ -705,6 +705,19 @@ class ScriptRunner:
     def prepare_ui(self):
         self.inputs = [None]
 
+    def setup_ui_without_layout(self):
+        """Creates the controls of all scripts outside of the webui's layout, for the API when the UI is not built; sets up args_from/args_to and api_info like setup_ui() does."""
+
+        self.prepare_ui()
+
+        all_titles = [wrap_call(script.title, script.filename, "title") or script.filename for script in self.scripts]
+        self.title_map = {title.lower(): script for title, script in zip(all_titles, self.scripts)}
+        self.titles = [wrap_call(script.title, script.filename, "title") or f"{script.filename} [error]" for script in self.selectable_scripts]
+
+        with gr.Blocks():
+            for script in self.alwayson_scripts + self.selectable_scripts:
+                self.create_script_ui(script)
+
     def setup_ui(self):
         all_titles = [wrap_call(script.title, script.filename, "title") or script.filename for script in self.scripts]
         self.title_map = {title.lower(): script for title, script in zip(all_titles, self.scripts)}
@@ -12,7 +12,7 @@ from omegaconf import OmegaConf, ListConfig
 from urllib import request
 import ldm.modules.midas as midas
 
-from modules import paths, shared, modelloader, devices, script_callbacks, sd_vae, sd_disable_initialization, errors, hashes, sd_models_config, sd_unet, sd_models_xl, cache, extra_networks, processing, lowvram, sd_hijack, patches
+from modules import paths, shared, modelloader, devices, script_callbacks, sd_vae, sd_disable_initialization, errors, hashes, sd_models_config, sd_unet, sd_models_xl, cache, extra_networks, processing, lowvram, sd_hijack, patches, file_index
 from modules.timer import Timer
 from modules.shared import opts
 import tomesd
@@ -25,6 +25,7 @@ checkpoints_list = {}
 checkpoint_aliases = {}
 checkpoint_alisases = checkpoint_aliases  # for compatibility with old name
 checkpoints_loaded = collections.OrderedDict()
+checkpoint_infos = file_index.FileObjects()
 
 
 class ModelType(enum.Enum):
@@ -173,9 +174,19 @@ def list_models():
         print(f"Checkpoint in --ckpt argument not found (Possible it was moved to {model_path}: {cmd_ckpt}", file=sys.stderr)
 
     for filename in model_list:
-        checkpoint_info = CheckpointInfo(filename)
+        checkpoint_info = checkpoint_infos.get(file_entry(filename), lambda filename=filename: CheckpointInfo(filename))
         checkpoint_info.register()
 
+    checkpoint_infos.retain(model_list)
+
+
+def file_entry(filename):
+    try:
+        st = os.stat(filename)
+        return file_index.FileEntry(filename, st.st_size, st.st_mtime)
+    except OSError:
+        return file_index.FileEntry(filename, None, None)
+
 
 re_strip_checksum = re.compile(r"\s*\[[^]]+]\s*$")
 
@@ -48,6 +48,10 @@ options_templates.update(options_section(('saving-images', "Saving images/grids"
     "grid_text_active_color": OptionInfo("#000000", "Text color for image grids", ui_components.FormColorPicker, {}),
     "grid_text_inactive_color": OptionInfo("#999999", "Inactive text color for image grids", ui_components.FormColorPicker, {}),
     "grid_background_color": OptionInfo("#ffffff", "Background color for image grids", ui_components.FormColorPicker, {}),
+    "grid_stream_threshold_mp": OptionInfo(64, "Save X/Y/Z plot grids larger than this in strips", gr.Number).info("megapixels; the UI shows a preview of the grid, and the full size grid is saved as a separate PNG without ever being in memory as a whole; 0 = disable"),
+    "grid_preview_max_side": OptionInfo(4096, "Maximum size of a grid preview", gr.Slider, {"minimum": 512, "maximum": 16384, "step": 64}).info("pixels on the longer side"),
+    "xyz_grid_resume": OptionInfo(False, "Resume interrupted X/Y/Z plots").info("keep cells of an X/Y/Z plot that did not finish, and reuse them when the same plot is run again"),
+    "xyz_grid_resume_keep": OptionInfo(5, "Number of interrupted X/Y/Z plots to keep", gr.Slider, {"minimum": 0, "maximum": 50, "step": 1}).info("cells of older ones are deleted when a new plot is started"),
 
     "save_images_before_face_restoration": OptionInfo(False, "Save a copy of image before doing face restoration."),
     "save_images_before_highres_fix": OptionInfo(False, "Save a copy of image before applying highres fix."),
@@ -128,6 +132,7 @@ options_templates.update(options_section(('system', "System", "system"), {
     "disable_mmap_load_safetensors": OptionInfo(False, "Disable memmapping for loading .safetensors files.").info("fixes very slow loading speed in some cases"),
     "hide_ldm_prints": OptionInfo(True, "Prevent Stability-AI's ldm/sgm modules from printing noise to console."),
     "dump_stacks_on_signal": OptionInfo(False, "Print stack traces before exiting the program with ctrl+c."),
+    "queue_ui_priority": OptionInfo("normal", "Queue priority of generation requests made from the web UI", gr.Radio, {"choices": ["interactive", "normal", "batch"]}).info("API requests set their own with the priority field"),
 }))
 
 options_templates.update(options_section(('profiler', "Profiler", "system"), {
@@ -135,6 +140,7 @@ options_templates.update(options_section(('profiler', "Profiler", "system"), {
 Those settings allow you to enable torch profiler when generating pictures.
 Profiling allows you to see which code uses how much of computer's resources during generation.
 Each generation writes its own profile to one file, overwriting previous.
+API requests with <code>"profile": true</code> are profiled even when profiling is disabled here, and get a trace of their own, listed at /sdapi/v1/traces.
 The file can be viewed in <a href="chrome:tracing">Chrome</a>, or on a <a href="https://ui.perfetto.dev/">Perfetto</a> web site.
 Warning: writing profile can take a lot of time, up to 30 seconds, and the file itelf can be around 500MB in size.
 """),
@@ -144,17 +150,24 @@ Warning: writing profile can take a lot of time, up to 30 seconds, and the file
     "profiling_profile_memory": OptionInfo(True, "Profile memory"),
     "profiling_with_stack": OptionInfo(True, "Include python stack"),
     "profiling_filename": OptionInfo("trace.json", "Profile filename"),
+    "profiling_api_traces_per_hour": OptionInfo(6, "Maximum number of per-request traces recorded per hour", gr.Number, {"minimum": 0, "precision": 0}).info("for API requests with profile: true; requests over the limit run without a trace"),
+    "profiling_api_traces_keep": OptionInfo(20, "Number of per-request traces to keep on disk", gr.Number, {"minimum": 1, "precision": 0}),
 }))
 
 options_templates.update(options_section(('API', "API", "system"), {
     "api_enable_requests": OptionInfo(True, "Allow http:// and https:// URLs for input images in API", restrict_api=True),
     "api_forbid_local_requests": OptionInfo(True, "Forbid URLs to local resources", restrict_api=True),
     "api_useragent": OptionInfo("", "User agent for requests", restrict_api=True),
+    "api_jobs_result_ttl": OptionInfo(24, "Hours to keep results of background jobs submitted to /sdapi/v1/jobs", gr.Number, {"minimum": 0.1}).needs_restart(),
+    "api_jobs_store_size": OptionInfo(1024, "Maximum size of the on-disk store for background job results (MB)", gr.Number, {"minimum": 16}).info("oldest results are dropped first").needs_restart(),
+    "api_encode_workers": OptionInfo(4, "Number of threads encoding the images of an API response", gr.Slider, {"minimum": 1, "maximum": 16, "step": 1}),
 }))
 
 options_templates.update(options_section(('training', "Training", "training"), {
     "unload_models_when_training": OptionInfo(False, "Move VAE and CLIP to RAM when training if possible. Saves VRAM."),
     "pin_memory": OptionInfo(False, "Turn on pin_memory for DataLoader. Makes training slightly faster but can increase memory usage."),
+    "training_cache_latents": OptionInfo(True, "Cache VAE latents and caption conds of dataset images on disk").info("a dataset is prepared almost instantly when training on it again with the same model, VAE and image size"),
+    "training_vae_encode_batch_size": OptionInfo(4, "Number of dataset images to encode with VAE at once when preparing a dataset", gr.Slider, {"minimum": 1, "maximum": 32, "step": 1}),
     "save_optimizer_state": OptionInfo(False, "Saves Optimizer state as separate *.optim file. Training of embedding or HN can be resumed with the matching optim file."),
     "save_training_settings_to_txt": OptionInfo(True, "Save textual inversion and hypernet settings to a text file whenever training starts."),
     "dataset_filename_word_regex": OptionInfo("", "Filename word regex"),
@@ -226,6 +239,7 @@ options_templates.update(options_section(('img2img', "img2img", "sd"), {
     "return_mask": OptionInfo(False, "For inpainting, include the greyscale mask in results for web"),
     "return_mask_composite": OptionInfo(False, "For inpainting, include masked composite in results for web"),
     "img2img_batch_show_results_limit": OptionInfo(32, "Show the first N batch img2img results in UI", gr.Slider, {"minimum": -1, "maximum": 1000, "step": 1}).info('0: disable, -1: show all images. Too many images can cause lag'),
+    "img2img_batch_io_workers": OptionInfo(2, "Threads reading upcoming images and masks during batch img2img", gr.Slider, {"minimum": 1, "maximum": 16, "step": 1}),
     "overlay_inpaint": OptionInfo(True, "Overlay original for inpaint").info("when inpainting, overlay the original image over the areas that weren't inpainted."),
 }))
 
@@ -242,6 +256,8 @@ options_templates.update(options_section(('optimizations', "Optimizations", "sd"
     "batch_cond_uncond": OptionInfo(True, "Batch cond/uncond").info("do both conditional and unconditional denoising in one batch; uses a bit more VRAM during sampling, but improves speed; previously this was controlled by --always-batch-cond-uncond commandline argument"),
     "fp8_storage": OptionInfo("Disable", "FP8 weight", gr.Radio, {"choices": ["Disable", "Enable for SDXL", "Enable"]}).info("Use FP8 to store Linear/Conv layers' weight. Require pytorch>=2.1.0."),
     "cache_fp16_weight": OptionInfo(False, "Cache FP16 weight for LoRA").info("Cache fp16 weight when enabling FP8, will increase the quality of LoRA. Use more system ram."),
+    "xyz_grid_batch_size": OptionInfo(1, "X/Y/Z plot batch size", gr.Slider, {"minimum": 1, "maximum": 64, "step": 1}).info("render up to this many cells that differ only in prompt or seed in one batch; only for single image cells; 1=disable"),
+    "auto_batch_size_max": OptionInfo(16, "Maximum automatic batch size", gr.Slider, {"minimum": 1, "maximum": 64, "step": 1}).info("for generations with automatic batch size, which use the largest batch that is expected to fit in free VRAM at the image size"),
 }))
 
 options_templates.update(options_section(('compatibility', "Compatibility", "sd"), {
@@ -269,6 +285,7 @@ options_templates.update(options_section(('interrogate', "Interrogate"), {
     "deepbooru_use_spaces": OptionInfo(True, "deepbooru: use spaces in tags").info("if not: use underscores"),
     "deepbooru_escape": OptionInfo(True, "deepbooru: escape (\\) brackets").info("so they are used as literal brackets and not for emphasis"),
     "deepbooru_filter_tags": OptionInfo("", "deepbooru: filter out those tags").info("separate by comma"),
+    "deepbooru_batch_size": OptionInfo(8, "deepbooru: batch size when tagging many images", gr.Slider, {"minimum": 1, "maximum": 64, "step": 1}),
 }))
 
 options_templates.update(options_section(('extra_networks', "Extra Networks", "sd"), {
@@ -415,6 +432,7 @@ options_templates.update(options_section(('postprocessing', "Postprocessing", "p
     'postprocessing_operation_order': OptionInfo([], "Postprocessing operation order", ui_components.DropdownMulti, lambda: {"choices": [x.name for x in shared_items.postprocessing_scripts()]}),
     'upscaling_max_images_in_cache': OptionInfo(5, "Maximum number of images in upscaling cache", gr.Slider, {"minimum": 0, "maximum": 10, "step": 1}),
     'postprocessing_existing_caption_action': OptionInfo("Ignore", "Action for existing captions", gr.Radio, {"choices": ["Ignore", "Keep", "Prepend", "Append"]}).info("when generating captions using postprocessing; Ignore = use generated; Keep = use original; Prepend/Append = combine both"),
+    'postprocessing_io_workers': OptionInfo(4, "Threads for reading and saving images in batch postprocessing", gr.Slider, {"minimum": 1, "maximum": 16, "step": 1}).info("saving uses a single thread unless original filenames are used for batch output"),
 }))
 
 options_templates.update(options_section((None, "Hidden options"), {
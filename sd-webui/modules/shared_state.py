@@ -1,4 +1,6 @@
+import base64
 import datetime
+import io
 import logging
 import threading
 import time
@@ -9,6 +11,53 @@ from typing import Optional
 log = logging.getLogger(__name__)
 
 
+class LivePreviewWorker:
+    """Decodes live previews on a thread of its own, so that neither the sampling loop nor progress requests wait for
+    the VAE or its approximation.
+
+    submit() only stores the latent; if several are submitted while the thread is busy, only the latest is decoded.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.condition = threading.Condition()
+        self.pending = None
+        self.thread = None
+
+    def submit(self, latent):
+        with self.condition:
+            self.pending = (latent, self.state.sampling_step, self.state.time_start)
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="live preview", daemon=True)
+                self.thread.start()
+
+            self.condition.notify()
+
+    def cancel(self):
+        with self.condition:
+            self.pending = None
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+
+                latent, sampling_step, time_start = self.pending
+                self.pending = None
+
+            image = self.state.decode_preview(latent)
+
+            # a preview of a job that has already ended is dropped
+            if image is None or time_start != self.state.time_start:
+                continue
+
+            self.state.assign_current_image(image)
+            self.state.current_image_sampling_step = sampling_step
+            self.state.current_image_data_url()
+
+
 class State:
     skipped = False
     interrupted = False
@@ -23,6 +72,7 @@ class State:
     current_latent = None
     current_image = None
     current_image_sampling_step = 0
+    current_image_encoded = None
     id_live_preview = 0
     textinfo = None
     time_start = None
@@ -32,6 +82,7 @@ class State:
 
     def __init__(self):
         self.server_start = time.time()
+        self.preview_worker = LivePreviewWorker(self)
 
     @property
     def need_restart(self) -> bool:
@@ -86,7 +137,10 @@ class State:
 
     def nextjob(self):
         if shared.opts.live_previews_enable and shared.opts.show_progress_every_n_steps == -1:
-            self.do_set_current_image()
+            if shared.parallel_processing_allowed and self.current_latent is not None:
+                self.preview_worker.submit(self.current_latent)
+            else:
+                self.do_set_current_image()
 
         self.job_no += 1
         self.sampling_step = 0
@@ -117,7 +171,9 @@ class State:
         self.current_latent = None
         self.current_image = None
         self.current_image_sampling_step = 0
+        self.current_image_encoded = None
         self.id_live_preview = 0
+        self.preview_worker.cancel()
         self.skipped = False
         self.interrupted = False
         self.stopping_generation = False
@@ -135,34 +191,72 @@ class State:
         devices.torch_gc()
 
     def set_current_image(self):
-        """if enough sampling steps have been made after the last call to this, sets self.current_image from self.current_latent, and modifies self.id_live_preview accordingly"""
+        """if enough sampling steps have been made after the last call to this, has the preview worker set self.current_image from self.current_latent, which modifies self.id_live_preview; returns without waiting for it"""
         if not shared.parallel_processing_allowed:
             return
 
         if self.sampling_step - self.current_image_sampling_step >= shared.opts.show_progress_every_n_steps and shared.opts.live_previews_enable and shared.opts.show_progress_every_n_steps != -1:
-            self.do_set_current_image()
+            if self.current_latent is None:
+                return
+
+            # set here rather than by the worker so that other progress requests made meanwhile do not submit the same step again
+            self.current_image_sampling_step = self.sampling_step
+            self.preview_worker.submit(self.current_latent)
 
     def do_set_current_image(self):
         if self.current_latent is None:
             return
 
+        image = self.decode_preview(self.current_latent)
+        if image is not None:
+            self.assign_current_image(image)
+            self.current_image_sampling_step = self.sampling_step
+
+    def decode_preview(self, latent):
         import modules.sd_samplers
 
         try:
             if shared.opts.show_progress_grid:
-                self.assign_current_image(modules.sd_samplers.samples_to_image_grid(self.current_latent))
+                return modules.sd_samplers.samples_to_image_grid(latent)
             else:
-                self.assign_current_image(modules.sd_samplers.sample_to_image(self.current_latent))
-
-            self.current_image_sampling_step = self.sampling_step
+                return modules.sd_samplers.sample_to_image(latent)
 
         except Exception:
             # when switching models during generation, VAE would be on CPU, so creating an image will fail.
             # we silently ignore this error
             errors.record_exception()
+            return None
 
     def assign_current_image(self, image):
         if shared.opts.live_previews_image_format == 'jpeg' and image.mode in ('RGBA', 'P'):
             image = image.convert('RGB')
         self.current_image = image
         self.id_live_preview += 1
+
+    def current_image_data_url(self):
+        """returns (data URL of self.current_image in live_previews_image_format, self.id_live_preview); the image is only encoded once for all progress requests"""
+        image, id_live_preview = self.current_image, self.id_live_preview
+        if image is None:
+            return None, id_live_preview
+
+        encoded = self.current_image_encoded
+        if encoded is not None and encoded[0] is image:
+            return encoded[1], encoded[2]
+
+        image_format = shared.opts.live_previews_image_format
+        if image_format == "png":
+            # using optimize for large images takes an enormous amount of time
+            if max(*image.size) <= 256:
+                save_kwargs = {"optimize": True}
+            else:
+                save_kwargs = {"optimize": False, "compress_level": 1}
+
+        else:
+            save_kwargs = {}
+
+        buffered = io.BytesIO()
+        image.save(buffered, format=image_format, **save_kwargs)
+        data_url = f"data:image/{image_format};base64,{base64.b64encode(buffered.getvalue()).decode('ascii')}"
+
+        self.current_image_encoded = (image, data_url, id_live_preview)
+        return data_url, id_live_preview
@@ -1,3 +1,5 @@
+import hashlib
+import io
 import os
 import numpy as np
 import PIL
@@ -5,11 +7,13 @@ import torch
 from torch.utils.data import Dataset, DataLoader, Sampler
 from torchvision import transforms
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from random import shuffle, choices
 
 import random
 import tqdm
-from modules import devices, shared, images
+from modules import devices, shared, images, cache, sd_vae
 import re
 
 from ldm.modules.distributions.distributions import DiagonalGaussianDistribution
@@ -17,6 +21,19 @@ from ldm.modules.distributions.distributions import DiagonalGaussianDistribution
 re_numbers_at_start = re.compile(r"^[-\d]+\s*")
 
 
+def cond_cache_prefix(model):
+    """Part of the key of cached conds that is not the caption: besides the checkpoint, conds depend on CLIP skip, emphasis,
+    and the textual inversion embeddings that the caption's words resolve to."""
+
+    from modules import sd_hijack
+
+    embeddings = sd_hijack.model_hijack.embedding_db.word_embeddings
+    embeddings_hash = hashlib.sha256("\n".join(f"{name}:{embedding.hash or embedding.checksum()}" for name, embedding in sorted(embeddings.items())).encode("utf8")).hexdigest()[:16]
+    emphasis = "old" if shared.opts.use_old_emphasis_implementation else shared.opts.emphasis
+
+    return f"{getattr(model, 'sd_model_hash', None)}-{shared.opts.CLIP_stop_at_last_layers}-{emphasis}-{embeddings_hash}"
+
+
 class DatasetEntry:
     def __init__(self, filename=None, filename_text=None, latent_dist=None, latent_sample=None, cond=None, cond_text=None, pixel_values=None, weight=None):
         self.filename = filename
@@ -29,6 +46,87 @@ class DatasetEntry:
         self.pixel_values = pixel_values
 
 
+class DatasetImage:
+    """An image of the dataset as read from disk, before it is encoded by the VAE."""
+
+    def __init__(self, path, filename_text, size, cache_key, image=None, alpha_channel=None):
+        self.path = path
+        self.filename_text = filename_text
+        self.size = size
+        self.cache_key = cache_key
+        self.image = image
+        self.alpha_channel = alpha_channel
+
+
+def read_filename_text(path, re_word):
+    text_filename = f"{os.path.splitext(path)[0]}.txt"
+    filename = os.path.basename(path)
+
+    if os.path.exists(text_filename):
+        with open(text_filename, "r", encoding="utf8") as file:
+            return file.read()
+
+    filename_text = os.path.splitext(filename)[0]
+    filename_text = re.sub(re_numbers_at_start, '', filename_text)
+    if re_word:
+        tokens = re_word.findall(filename_text)
+        filename_text = (shared.opts.dataset_filename_join_string or "").join(tokens)
+
+    return filename_text
+
+
+def read_dataset_image(path, width, height, varsize, use_weight, re_word, model_key, latent_cache):
+    """Reads and resizes an image, runs in a worker thread; if its latent is already cached, the pixels are not kept. Returns None for files that are not images."""
+
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+
+        image = images.read(io.BytesIO(data))
+        size = image.size if varsize else (width, height)
+        cache_key = f"{hashlib.sha256(data).hexdigest()}-{size[0]}x{size[1]}-{model_key}"
+
+        #Currently does not work for single color transparency
+        #We would need to read image.info['transparency'] for that
+        alpha_channel = image.getchannel('A') if use_weight and 'A' in image.getbands() else None
+
+        if latent_cache is not None and cache_key in latent_cache:
+            image = None
+        else:
+            image = image.convert('RGB')
+            if not varsize:
+                image = image.resize((width, height), PIL.Image.BICUBIC)
+    except Exception:
+        return None
+
+    return DatasetImage(path, read_filename_text(path, re_word), size, cache_key, image=image, alpha_channel=alpha_channel)
+
+
+def encode_dataset_images(model, items, device, batch_size):
+    """VAE-encodes images of the same size in batches; returns the first stage output for each, on CPU, as (True, DiagonalGaussianDistribution parameters) or (False, latent)."""
+
+    res = []
+    for i in range(0, len(items), batch_size):
+        batch = items[i:i + batch_size]
+
+        npimages = np.stack([np.array(item.image).astype(np.uint8) for item in batch])
+        npimages = (npimages / 127.5 - 1.0).astype(np.float32)
+        torchdata = torch.from_numpy(npimages).permute(0, 3, 1, 2).to(device=device, dtype=torch.float32)
+
+        with devices.autocast():
+            latent_dist = model.encode_first_stage(torchdata)
+
+        is_distribution = isinstance(latent_dist, DiagonalGaussianDistribution)
+        output = latent_dist.parameters if is_distribution else latent_dist
+        # clones, so that each image's latent does not keep (and pickle into the cache) the whole batch's storage
+        res += [(is_distribution, x.clone()) for x in output.to(devices.cpu).chunk(len(batch))]
+
+        del torchdata
+        del latent_dist
+
+    return res
+
+
 class PersonalizedBase(Dataset):
     def __init__(self, data_root, width, height, repeats, flip_p=0.5, placeholder_token="*", model=None, cond_model=None, device=None, template_file=None, include_cond=False, batch_size=1, gradient_step=1, shuffle_tags=False, tag_drop_out=0, latent_sampling_method='once', varsize=False, use_weight=False):
         re_word = re.compile(shared.opts.dataset_filename_word_regex) if shared.opts.dataset_filename_word_regex else None
@@ -54,87 +152,42 @@ class PersonalizedBase(Dataset):
         self.tag_drop_out = tag_drop_out
         groups = defaultdict(list)
 
+        # latents are cached as the VAE's output before sampling, so the sampling method is applied after loading them
+        # and "once" still draws a new sample every time a dataset is prepared
+        model_key = f"{getattr(model, 'sd_model_hash', None)}-{sd_vae.get_loaded_vae_hash() or 'base'}"
+        latent_cache = cache.cache("textual-inversion-latents") if shared.opts.training_cache_latents else None
+        cond_cache = cache.cache("textual-inversion-conds") if shared.opts.training_cache_latents and include_cond else None
+        cond_prefix = cond_cache_prefix(model) if cond_cache is not None else None
+        encode_batch_size = max(int(shared.opts.training_vae_encode_batch_size), 1)
+        read_image = partial(read_dataset_image, width=width, height=height, varsize=varsize, use_weight=use_weight, re_word=re_word, model_key=model_key, latent_cache=latent_cache)
+
         print("Preparing dataset...")
-        for path in tqdm.tqdm(self.image_paths):
-            alpha_channel = None
-            if shared.state.interrupted:
-                raise Exception("interrupted")
-            try:
-                image = images.read(path)
-                #Currently does not work for single color transparency
-                #We would need to read image.info['transparency'] for that
-                if use_weight and 'A' in image.getbands():
-                    alpha_channel = image.getchannel('A')
-                image = image.convert('RGB')
-                if not varsize:
-                    image = image.resize((width, height), PIL.Image.BICUBIC)
-            except Exception:
-                continue
-
-            text_filename = f"{os.path.splitext(path)[0]}.txt"
-            filename = os.path.basename(path)
-
-            if os.path.exists(text_filename):
-                with open(text_filename, "r", encoding="utf8") as file:
-                    filename_text = file.read()
-            else:
-                filename_text = os.path.splitext(filename)[0]
-                filename_text = re.sub(re_numbers_at_start, '', filename_text)
-                if re_word:
-                    tokens = re_word.findall(filename_text)
-                    filename_text = (shared.opts.dataset_filename_join_string or "").join(tokens)
-
-            npimage = np.array(image).astype(np.uint8)
-            npimage = (npimage / 127.5 - 1.0).astype(np.float32)
-
-            torchdata = torch.from_numpy(npimage).permute(2, 0, 1).to(device=device, dtype=torch.float32)
-            latent_sample = None
-
-            with devices.autocast():
-                latent_dist = model.encode_first_stage(torchdata.unsqueeze(dim=0))
-
-            #Perform latent sampling, even for random sampling.
-            #We need the sample dimensions for the weights
-            if latent_sampling_method == "deterministic":
-                if isinstance(latent_dist, DiagonalGaussianDistribution):
-                    # Works only for DiagonalGaussianDistribution
-                    latent_dist.std = 0
-                else:
-                    latent_sampling_method = "once"
-            latent_sample = model.get_first_stage_encoding(latent_dist).squeeze().to(devices.cpu)
-
-            if use_weight and alpha_channel is not None:
-                channels, *latent_size = latent_sample.shape
-                weight_img = alpha_channel.resize(latent_size)
-                npweight = np.array(weight_img).astype(np.float32)
-                #Repeat for every channel in the latent sample
-                weight = torch.tensor([npweight] * channels).reshape([channels] + latent_size)
-                #Normalize the weight to a minimum of 0 and a mean of 1, that way the loss will be comparable to default.
-                weight -= weight.min()
-                weight /= weight.mean()
-            elif use_weight:
-                #If an image does not have a alpha channel, add a ones weight map anyway so we can stack it later
-                weight = torch.ones(latent_sample.shape)
-            else:
-                weight = None
+        with tqdm.tqdm(total=len(self.image_paths)) as progress, ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+            for chunk_start in range(0, len(self.image_paths), 64):
+                if shared.state.interrupted:
+                    raise Exception("interrupted")
 
-            if latent_sampling_method == "random":
-                entry = DatasetEntry(filename=path, filename_text=filename_text, latent_dist=latent_dist, weight=weight)
-            else:
-                entry = DatasetEntry(filename=path, filename_text=filename_text, latent_sample=latent_sample, weight=weight)
+                chunk = self.image_paths[chunk_start:chunk_start + 64]
+                items = [x for x in executor.map(read_image, chunk) if x is not None]
 
-            if not (self.tag_drop_out != 0 or self.shuffle_tags):
-                entry.cond_text = self.create_text(filename_text)
+                by_size = defaultdict(list)
+                for item in items:
+                    if item.image is not None:
+                        by_size[item.size].append(item)
 
-            if include_cond and not (self.tag_drop_out != 0 or self.shuffle_tags):
-                with devices.autocast():
-                    entry.cond = cond_model([entry.cond_text]).to(devices.cpu).squeeze(0)
-            groups[image.size].append(len(self.dataset))
-            self.dataset.append(entry)
-            del torchdata
-            del latent_dist
-            del latent_sample
-            del weight
+                outputs = {}
+                for same_size in by_size.values():
+                    for item, output in zip(same_size, encode_dataset_images(model, same_size, device, encode_batch_size)):
+                        outputs[item.cache_key] = output
+                        if latent_cache is not None:
+                            latent_cache[item.cache_key] = output
+
+                for item in items:
+                    output = outputs[item.cache_key] if item.cache_key in outputs else latent_cache[item.cache_key]
+                    latent_sampling_method = self.add_entry(item, output, model, cond_model, device, include_cond, latent_sampling_method, use_weight, cond_prefix, cond_cache)
+                    groups[item.size].append(len(self.dataset) - 1)
+
+                progress.update(len(chunk))
 
         self.length = len(self.dataset)
         self.groups = list(groups.values())
@@ -149,6 +202,60 @@ class PersonalizedBase(Dataset):
                 print(f"  {w}x{h}: {len(ids)}")
             print()
 
+    def add_entry(self, item, output, model, cond_model, device, include_cond, latent_sampling_method, use_weight, cond_prefix, cond_cache):
+        """Creates the dataset entry for an image from the VAE's output for it; returns the latent sampling method, which changes to "once" if "deterministic" is not possible with this VAE."""
+
+        is_distribution, output = output
+        latent_dist = DiagonalGaussianDistribution(output.to(device)) if is_distribution else output.to(device)
+
+        #Perform latent sampling, even for random sampling.
+        #We need the sample dimensions for the weights
+        if latent_sampling_method == "deterministic":
+            if isinstance(latent_dist, DiagonalGaussianDistribution):
+                # Works only for DiagonalGaussianDistribution
+                latent_dist.std = 0
+            else:
+                latent_sampling_method = "once"
+        latent_sample = model.get_first_stage_encoding(latent_dist).squeeze().to(devices.cpu)
+
+        if use_weight and item.alpha_channel is not None:
+            channels, *latent_size = latent_sample.shape
+            weight_img = item.alpha_channel.resize(latent_size)
+            npweight = np.array(weight_img).astype(np.float32)
+            #Repeat for every channel in the latent sample
+            weight = torch.tensor([npweight] * channels).reshape([channels] + latent_size)
+            #Normalize the weight to a minimum of 0 and a mean of 1, that way the loss will be comparable to default.
+            weight -= weight.min()
+            weight /= weight.mean()
+        elif use_weight:
+            #If an image does not have a alpha channel, add a ones weight map anyway so we can stack it later
+            weight = torch.ones(latent_sample.shape)
+        else:
+            weight = None
+
+        if latent_sampling_method == "random":
+            entry = DatasetEntry(filename=item.path, filename_text=item.filename_text, latent_dist=latent_dist, weight=weight)
+        else:
+            entry = DatasetEntry(filename=item.path, filename_text=item.filename_text, latent_sample=latent_sample, weight=weight)
+
+        if not (self.tag_drop_out != 0 or self.shuffle_tags):
+            entry.cond_text = self.create_text(item.filename_text)
+
+        if include_cond and not (self.tag_drop_out != 0 or self.shuffle_tags):
+            cond_key = f"{cond_prefix}-{entry.cond_text}"
+            entry.cond = cond_cache.get(cond_key) if cond_cache is not None else None
+
+            if entry.cond is None:
+                with devices.autocast():
+                    entry.cond = cond_model([entry.cond_text]).to(devices.cpu).squeeze(0)
+
+                if cond_cache is not None:
+                    cond_cache[cond_key] = entry.cond
+
+        self.dataset.append(entry)
+
+        return latent_sampling_method
+
     def create_text(self, filename_text):
         text = random.choice(self.lines)
         tags = filename_text.split(',')
@@ -1,4 +1,5 @@
 import os
+import threading
 from collections import namedtuple
 from contextlib import closing
 
@@ -12,7 +13,7 @@ import safetensors.torch
 import numpy as np
 from PIL import Image, PngImagePlugin
 
-from modules import shared, devices, sd_hijack, sd_models, images, sd_samplers, sd_hijack_checkpoint, errors, hashes
+from modules import shared, devices, sd_hijack, sd_models, images, sd_samplers, sd_hijack_checkpoint, errors, hashes, file_index
 import modules.textual_inversion.dataset
 from modules.textual_inversion.learn_schedule import LearnRateScheduler
 
@@ -91,21 +92,16 @@ class Embedding:
 class DirWithTextualInversionEmbeddings:
     def __init__(self, path):
         self.path = path
-        self.mtime = None
 
-    def has_changed(self):
-        if not os.path.isdir(self.path):
-            return False
 
-        mt = os.path.getmtime(self.path)
-        if self.mtime is None or mt > self.mtime:
-            return True
-
-    def update(self):
-        if not os.path.isdir(self.path):
-            return
+class EmbeddingFile:
+    """A file in an embeddings directory as last seen on disk, with the embedding read from it, or None if it is not an embedding."""
 
-        self.mtime = os.path.getmtime(self.path)
+    def __init__(self, path, size, mtime, embedding):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.embedding = embedding
 
 
 class EmbeddingDatabase:
@@ -116,6 +112,12 @@ class EmbeddingDatabase:
         self.expected_shape = -1
         self.embedding_dirs = {}
         self.previously_displayed_embeddings = ()
+        self.files = {}
+        self.dir_mtimes = {}
+        self.version = 0
+        self.lock = threading.Lock()
+        self.background_scan = None
+        self.pending_changes = None
 
     def add_embedding_dir(self, path):
         self.embedding_dirs[path] = DirWithTextualInversionEmbeddings(path)
@@ -154,14 +156,16 @@ class EmbeddingDatabase:
         vec = shared.sd_model.cond_stage_model.encode_embedding_init_text(",", 1)
         return vec.shape[1]
 
-    def load_from_file(self, path, filename):
+    def read_from_file(self, path, filename):
+        """Reads an embedding from a file without registering it; returns None if the file is not an embedding."""
+
         name, ext = os.path.splitext(filename)
         ext = ext.upper()
 
         if ext in ['.PNG', '.WEBP', '.JXL', '.AVIF']:
             _, second_ext = os.path.splitext(name)
             if second_ext.upper() == '.PREVIEW':
-                return
+                return None
 
             embed_image = Image.open(path)
             if hasattr(embed_image, 'text') and 'sd-ti-embedding' in embed_image.text:
@@ -173,67 +177,130 @@ class EmbeddingDatabase:
                     name = data.get('name', name)
                 else:
                     # if data is None, means this is not an embedding, just a preview image
-                    return
+                    return None
         elif ext in ['.BIN', '.PT']:
             data = torch.load(path, map_location="cpu")
         elif ext in ['.SAFETENSORS']:
             data = safetensors.torch.load_file(path, device="cpu")
         else:
-            return
+            return None
 
-        if data is not None:
-            embedding = create_embedding_from_data(data, name, filename=filename, filepath=path)
+        if data is None:
+            print(f"Unable to load Textual inversion embedding due to data issue: '{name}'.")
+            return None
 
-            if self.expected_shape == -1 or self.expected_shape == embedding.shape:
-                self.register_embedding(embedding, shared.sd_model)
-            else:
-                self.skipped_embeddings[name] = embedding
+        return create_embedding_from_data(data, name, filename=filename, filepath=path)
+
+    def add_embedding(self, embedding):
+        if self.expected_shape == -1 or self.expected_shape == embedding.shape:
+            self.register_embedding(embedding, shared.sd_model)
         else:
-            print(f"Unable to load Textual inversion embedding due to data issue: '{name}'.")
+            self.skipped_embeddings[embedding.name] = embedding
+
+    def load_from_file(self, path, filename):
+        embedding = self.read_from_file(path, filename)
+        if embedding is not None:
+            self.add_embedding(embedding)
 
+    def scan_files(self):
+        """Lists the files in all embedding directories; returns {path: (size, mtime)} in the order they are loaded, and {directory: mtime} for all directories."""
 
-    def load_from_dir(self, embdir):
-        if not os.path.isdir(embdir.path):
-            return
+        files = {}
+        dirs = {}
 
-        for root, _, fns in os.walk(embdir.path, followlinks=True):
-            for fn in fns:
+        for embdir in self.embedding_dirs.values():
+            stack = [embdir.path]
+            while stack:
+                dirpath = stack.pop()
                 try:
-                    fullfn = os.path.join(root, fn)
+                    dirs[dirpath] = os.stat(dirpath).st_mtime_ns
+                except OSError:
+                    continue
 
-                    if os.stat(fullfn).st_size == 0:
+                subdirs, filenames = file_index.index.listing(dirpath)
+                for fn in filenames:
+                    fullfn = os.path.join(dirpath, fn)
+                    try:
+                        st = os.stat(fullfn)
+                    except OSError:
                         continue
 
-                    self.load_from_file(fullfn, fn)
-                except Exception:
-                    errors.report(f"Error loading embedding {fn}", exc_info=True)
-                    continue
+                    if st.st_size == 0:
+                        continue
 
-    def load_textual_inversion_embeddings(self, force_reload=False):
-        if not force_reload:
-            need_reload = False
-            for embdir in self.embedding_dirs.values():
-                if embdir.has_changed():
-                    need_reload = True
-                    break
+                    files[fullfn] = (st.st_size, st.st_mtime)
 
-            if not need_reload:
-                return
+                stack += [os.path.join(dirpath, x) for x in reversed(subdirs)]
 
-        self.ids_lookup.clear()
-        self.word_embeddings.clear()
-        self.skipped_embeddings.clear()
-        self.expected_shape = self.get_expected_shape()
+        return files, dirs
 
-        for embdir in self.embedding_dirs.values():
-            self.load_from_dir(embdir)
-            embdir.update()
+    def read_changed_files(self, files, known_files=None):
+        """Reads embeddings from files that are new or have changed since they were loaded (or compared to known_files,
+        if given); returns {path: EmbeddingFile} for them."""
+
+        if known_files is None:
+            known_files = self.files
+
+        changed = {}
+        for path, (size, mtime) in files.items():
+            known = known_files.get(path)
+            if known is not None and (known.size, known.mtime) == (size, mtime):
+                continue
+
+            try:
+                embedding = self.read_from_file(path, os.path.basename(path))
+            except Exception:
+                errors.report(f"Error loading embedding {os.path.basename(path)}", exc_info=True)
+                embedding = None
+
+            changed[path] = EmbeddingFile(path, size, mtime, embedding)
+
+        return changed
+
+    def apply_changes(self, files, dirs, changed, rebuild=False):
+        """Brings the database in line with files, with changed holding the embeddings read from new and changed files.
 
-        # re-sort word_embeddings because load_from_dir may not load in alphabetic order.
-        # using a temporary copy so we don't reinitialize self.word_embeddings in case other objects have a reference to it.
-        sorted_word_embeddings = {e.name: e for e in sorted(self.word_embeddings.values(), key=lambda e: e.name.lower())}
-        self.word_embeddings.clear()
-        self.word_embeddings.update(sorted_word_embeddings)
+        Only the names of embeddings from added, changed or removed files are registered or unregistered again, unless
+        rebuild is set, which re-registers everything (without reading unchanged files again).
+        """
+
+        with self.lock:
+            affected = set()
+            for path, known in self.files.items():
+                if known.embedding is not None and (path not in files or path in changed):
+                    affected.add(known.embedding.name)
+
+            self.files = {path: changed.get(path) or self.files[path] for path in files if path in changed or path in self.files}
+            self.dir_mtimes = dirs
+            self.version += 1
+
+            affected.update(x.embedding.name for x in changed.values() if x.embedding is not None)
+
+            if rebuild:
+                self.ids_lookup.clear()
+                self.word_embeddings.clear()
+                self.skipped_embeddings.clear()
+                affected = {x.embedding.name for x in self.files.values() if x.embedding is not None}
+
+            # when several files have embeddings with the same name, the one loaded last is used, as with a full reload
+            latest = {x.embedding.name: x.embedding for x in self.files.values() if x.embedding is not None and x.embedding.name in affected}
+
+            for name in affected:
+                self.skipped_embeddings.pop(name, None)
+                if name in self.word_embeddings:
+                    self.register_embedding_by_name(None, shared.sd_model, name)
+
+                if name in latest:
+                    self.add_embedding(latest[name])
+
+            if not affected:
+                return
+
+            # re-sort word_embeddings because embeddings are not added in alphabetic order.
+            # using a temporary copy so we don't reinitialize self.word_embeddings in case other objects have a reference to it.
+            sorted_word_embeddings = {e.name: e for e in sorted(self.word_embeddings.values(), key=lambda e: e.name.lower())}
+            self.word_embeddings.clear()
+            self.word_embeddings.update(sorted_word_embeddings)
 
         displayed_embeddings = (tuple(self.word_embeddings.keys()), tuple(self.skipped_embeddings.keys()))
         if shared.opts.textual_inversion_print_at_load and self.previously_displayed_embeddings != displayed_embeddings:
@@ -242,6 +309,72 @@ class EmbeddingDatabase:
             if self.skipped_embeddings:
                 print(f"Textual inversion embeddings skipped({len(self.skipped_embeddings)}): {', '.join(self.skipped_embeddings.keys())}")
 
+    def load_textual_inversion_embeddings(self, force_reload=False):
+        """Loads embeddings from new and changed files and drops those whose files were removed.
+
+        With force_reload (done after a model is loaded), the expected shape is determined again and all embeddings are
+        registered anew; files that have not changed are still not read again.
+        """
+
+        rebuild = force_reload or self.expected_shape == -1
+        if rebuild:
+            self.expected_shape = self.get_expected_shape()
+
+        files, dirs = self.scan_files()
+        changed = self.read_changed_files(files)
+
+        if rebuild or changed or files.keys() != self.files.keys():
+            self.apply_changes(files, dirs, changed, rebuild=rebuild)
+        else:
+            self.dir_mtimes = dirs
+
+    def directories_changed(self):
+        if any(x.path not in self.dir_mtimes for x in self.embedding_dirs.values() if os.path.isdir(x.path)):
+            return True
+
+        for dirpath, mtime in self.dir_mtimes.items():
+            try:
+                if os.stat(dirpath).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+
+        return False
+
+    def scan_in_background(self):
+        # apply_changes() replaces self.files rather than changing it, so this is a consistent snapshot for the version
+        with self.lock:
+            version = self.version
+            known_files = self.files
+
+        files, dirs = self.scan_files()
+        changed = self.read_changed_files(files, known_files)
+
+        if changed or files.keys() != known_files.keys():
+            self.pending_changes = (version, files, dirs, changed)
+
+    def update_for_generation(self):
+        """Keeps embeddings up to date without scanning every file on the generation path.
+
+        Files that were added, removed or renamed change their directory's mtime, so they are picked up right away by
+        checking just the directories. Files edited in place are found by a scan in a background thread, started here
+        for the next generation, whose changes are applied here once it has finished.
+        """
+
+        if self.expected_shape == -1 or self.directories_changed():
+            self.load_textual_inversion_embeddings()
+        elif self.pending_changes is not None:
+            version, files, dirs, changed = self.pending_changes
+            self.pending_changes = None
+
+            # changes from a scan that started before the database was last updated may be outdated
+            if version == self.version:
+                self.apply_changes(files, dirs, changed)
+
+        if self.background_scan is None or not self.background_scan.is_alive():
+            self.background_scan = threading.Thread(target=self.scan_in_background, name="embeddings scan", daemon=True)
+            self.background_scan.start()
+
     def find_embedding_at_position(self, tokens, offset):
         token = tokens[offset]
         possible_matches = self.ids_lookup.get(token, None)
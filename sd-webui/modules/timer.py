@@ -1,3 +1,6 @@
+import json
+import os
+import statistics
 import time
 import argparse
 
@@ -82,6 +85,44 @@ class Timer:
         self.__init__()
 
 
+def write_benchmark(filename, profile, record, history=5, tolerance=0.25, min_difference=0.5):
+    """Appends a startup record (see Timer.dump()) for the given startup profile to a JSON lines file.
+
+    Returns phases that took noticeably longer than the median of the last history runs with the same profile, as a
+    list of (category, seconds, median seconds); the total is compared as the "total" category.
+    """
+
+    previous = []
+    if os.path.exists(filename):
+        with open(filename, "r", encoding="utf8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+                if entry.get("profile") == profile:
+                    previous.append({"total": entry.get("total"), **entry.get("records", {})})
+
+    previous = previous[-history:]
+
+    slower = []
+    for category, seconds in {"total": record["total"], **record["records"]}.items():
+        past = [x[category] for x in previous if x.get(category) is not None]
+        if not past:
+            continue
+
+        median = statistics.median(past)
+        if seconds > median * (1 + tolerance) and seconds - median >= min_difference:
+            slower.append((category, seconds, median))
+
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    with open(filename, "a", encoding="utf8") as file:
+        file.write(json.dumps({"time": time.time(), "profile": profile, **record}) + "\n")
+
+    return slower
+
+
 parser = argparse.ArgumentParser(add_help=False)
 parser.add_argument("--log-startup", action='store_true', help="print a detailed log of what's happening at startup")
 args = parser.parse_known_args()[0]
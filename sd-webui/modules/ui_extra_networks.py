@@ -165,16 +165,53 @@ def get_single_card(page: str = "", tabname: str = "", name: str = ""):
         item = page.items.get(name)
 
     page.read_user_metadata(item, use_cache=False)
-    item_html = page.create_item_html(tabname, item, shared.html("extra-networks-card.html"))
+    item_html = page.card_html(tabname, item)
 
     return JSONResponse({"html": item_html})
 
 
+def list_page_items(page: str = "", tabname: str = "txt2img", search: str = "", sort: str = "default", order: str = "ascending", offset: int = 0, limit: int = 100, include_html: bool = True, refresh: bool = False):
+    """Returns one page of a page's items as JSON, searched and sorted on the server; card HTML is included for just the returned items."""
+
+    from starlette.responses import JSONResponse
+
+    page = next(iter([x for x in extra_pages if x.name == page]), None)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Page not found")
+
+    if refresh:
+        page.refresh()
+
+    if refresh or not page.items:
+        page.refresh_items()
+
+    total, items = page.query_items(search=search, sort=sort, reverse=order == "descending", offset=max(offset, 0), limit=max(limit, 0))
+
+    res = []
+    for item in items:
+        entry = {
+            "name": item["name"],
+            "filename": item.get("filename"),
+            "preview": item.get("preview"),
+            "description": item.get("description"),
+            "search_terms": item.get("search_terms", []),
+            "sort_keys": item.get("sort_keys", {}),
+        }
+
+        if include_html:
+            entry["html"] = page.card_html(tabname, item)
+
+        res.append(entry)
+
+    return JSONResponse({"total": total, "offset": offset, "limit": limit, "items": res})
+
+
 def add_pages_to_demo(app):
     app.add_api_route("/sd_extra_networks/thumb", fetch_file, methods=["GET"])
     app.add_api_route("/sd_extra_networks/cover-images", fetch_cover_images, methods=["GET"])
     app.add_api_route("/sd_extra_networks/metadata", get_metadata, methods=["GET"])
     app.add_api_route("/sd_extra_networks/get-single-card", get_single_card, methods=["GET"])
+    app.add_api_route("/sd_extra_networks/items", list_page_items, methods=["GET"])
 
 
 def quote_js(s):
@@ -193,6 +230,7 @@ class ExtraNetworksPage:
         self.allow_negative_prompt = False
         self.metadata = {}
         self.items = {}
+        self.cards_html = {}
         self.lister = util.MassFileLister()
         # HTML Templates
         self.pane_tpl = shared.html("extra-networks-pane.html")
@@ -286,22 +324,8 @@ class ExtraNetworksPage:
             }
         )
 
-        local_path = ""
-        filename = item.get("filename", "")
-        for reldir in self.allowed_directories_for_previews():
-            absdir = os.path.abspath(reldir)
-
-            if filename.startswith(absdir):
-                local_path = filename[len(absdir):]
-
-        # if this is true, the item must not be shown in the default view, and must instead only be
-        # shown when searching for it
-        if shared.opts.extra_networks_hidden_models == "Always":
-            search_only = False
-        else:
-            search_only = "/." in local_path or "\\." in local_path
-
-        if search_only and shared.opts.extra_networks_hidden_models == "Never":
+        search_only = self.is_search_only(item)
+        if search_only is None:
             return ""
 
         sort_keys = " ".join(
@@ -350,6 +374,103 @@ class ExtraNetworksPage:
         else:
             return args
 
+    def is_search_only(self, item):
+        """Returns True if the item must not be shown in the default view, and must instead only be shown when searching for it, and None if it must not be shown at all."""
+
+        local_path = ""
+        filename = item.get("filename", "")
+        for reldir in self.allowed_directories_for_previews():
+            absdir = os.path.abspath(reldir)
+
+            if filename.startswith(absdir):
+                local_path = filename[len(absdir):]
+
+        if shared.opts.extra_networks_hidden_models == "Always":
+            search_only = False
+        else:
+            search_only = "/." in local_path or "\\." in local_path
+
+        if search_only and shared.opts.extra_networks_hidden_models == "Never":
+            return None
+
+        return search_only
+
+    def card_html(self, tabname, item):
+        """Returns the card HTML for an item; it is cached and only created again when the item's file, preview, texts, or the card settings change."""
+
+        signature = (
+            shared.opts.extra_networks_card_height,
+            shared.opts.extra_networks_card_width,
+            shared.opts.extra_networks_card_text_scale,
+            shared.opts.extra_networks_card_show_desc,
+            shared.opts.extra_networks_card_description_is_html,
+            shared.opts.extra_networks_hidden_models,
+            item.get("filename"),
+            item.get("sort_keys", {}).get("date_modified"),
+            item.get("preview"),
+            item.get("description"),
+            item.get("prompt"),
+            item.get("negative_prompt"),
+            item.get("onclick"),
+            bool(item.get("metadata")),
+        )
+
+        key = (tabname, item["name"])
+        cached = self.cards_html.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        card = self.create_item_html(tabname, item, self.card_tpl)
+        self.cards_html[key] = (signature, card)
+        return card
+
+    def refresh_items(self, empty=False):
+        """Lists items for the page, with their metadata and user metadata, into self.items."""
+
+        self.lister.reset()
+        self.metadata = {}
+
+        items_list = [] if empty else self.list_items()
+        self.items = {x["name"]: x for x in items_list}
+
+        # Populate the instance metadata for each item.
+        for item in self.items.values():
+            metadata = item.get("metadata")
+            if metadata:
+                self.metadata[item["name"]] = metadata
+
+            if "user_metadata" not in item:
+                self.read_user_metadata(item)
+
+        for key in [x for x in self.cards_html if x[1] not in self.items]:
+            del self.cards_html[key]
+
+    def query_items(self, search="", sort="default", reverse=False, offset=0, limit=None):
+        """Searches and sorts items of the page like the UI does; returns the total number of matching items and the requested slice of them."""
+
+        search = search.lower()
+
+        res = []
+        for item in self.items.values():
+            search_only = self.is_search_only(item)
+            if search_only is None or search_only and len(search) < 4:
+                continue
+
+            if search:
+                text = " ".join([*item.get("search_terms", []), item.get("description", "") or ""]).lower()
+                if search not in text:
+                    continue
+
+            res.append(item)
+
+        def sort_key(item):
+            value = item.get("sort_keys", {}).get(sort)
+            return (value is None, util.natural_sort_key(value) if isinstance(value, str) else value if value is not None else 0)
+
+        res.sort(key=sort_key, reverse=reverse)
+
+        return len(res), res[offset:offset + limit if limit is not None else None]
+
     def create_tree_dir_item_html(
         self,
         tabname: str,
@@ -564,7 +685,7 @@ class ExtraNetworksPage:
         """
         res = []
         for item in self.items.values():
-            res.append(self.create_item_html(tabname, item, self.card_tpl))
+            res.append(self.card_html(tabname, item))
 
         if not res:
             dirs = "".join([f"<li>{x}</li>" for x in self.allowed_directories_for_previews()])
@@ -584,20 +705,7 @@ class ExtraNetworksPage:
         Returns:
             HTML formatted string.
         """
-        self.lister.reset()
-        self.metadata = {}
-
-        items_list = [] if empty else self.list_items()
-        self.items = {x["name"]: x for x in items_list}
-
-        # Populate the instance metadata for each item.
-        for item in self.items.values():
-            metadata = item.get("metadata")
-            if metadata:
-                self.metadata[item["name"]] = metadata
-
-            if "user_metadata" not in item:
-                self.read_user_metadata(item)
+        self.refresh_items(empty=empty)
 
         show_tree = shared.opts.extra_networks_tree_view_default_enabled
 
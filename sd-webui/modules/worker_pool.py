@@ -0,0 +1,301 @@
+import concurrent.futures
+import json
+import threading
+import time
+
+from modules import errors, priority_lock
+
+
+class WorkerState:
+    """Progress of a single worker; has the same fields as shared_state.State reports via dict()."""
+
+    def __init__(self):
+        self.job = ""
+        self.job_no = 0
+        self.job_count = 0
+        self.job_timestamp = '0'
+        self.sampling_step = 0
+        self.sampling_steps = 0
+        self.time_start = None
+        self.skipped = False
+        self.interrupted = False
+        self.stopping_generation = False
+
+    def begin(self, job):
+        self.job = job
+        self.job_no = 0
+        self.job_count = 1
+        self.job_timestamp = time.strftime("%Y%m%d%H%M%S")
+        self.sampling_step = 0
+        self.sampling_steps = 0
+        self.time_start = time.time()
+        self.skipped = False
+        self.interrupted = False
+        self.stopping_generation = False
+
+    def end(self):
+        self.job = ""
+        self.job_count = 0
+
+    def dict(self):
+        return {
+            "skipped": self.skipped,
+            "interrupted": self.interrupted,
+            "stopping_generation": self.stopping_generation,
+            "job": self.job,
+            "job_count": self.job_count,
+            "job_timestamp": self.job_timestamp,
+            "job_no": self.job_no,
+            "sampling_step": self.sampling_step,
+            "sampling_steps": self.sampling_steps,
+        }
+
+
+class Job:
+    def __init__(self, id_task, kind, request, priority="normal", on_start=None):
+        self.id_task = id_task
+        self.kind = kind
+        self.request = request
+        self.priority = priority_lock.priority_index(priority)
+        self.time_queued = time.time()
+        self.future = concurrent.futures.Future()
+        self.on_start = on_start
+
+    def payload(self):
+        if isinstance(self.request, dict):
+            return self.request
+
+        return self.request.dict(exclude_unset=True)
+
+
+class Worker:
+    """A single model replica; runs one job at a time. Subclasses implement process() and state()."""
+
+    def __init__(self, name):
+        self.name = name
+        self.busy = False
+        self.current_task = None
+        self.jobs_done = 0
+
+    def process(self, job):
+        raise NotImplementedError
+
+    def state(self):
+        raise NotImplementedError
+
+    def interrupt(self):
+        pass
+
+    def progress(self):
+        return {
+            "name": self.name,
+            "busy": self.busy,
+            "current_task": self.current_task,
+            "jobs_done": self.jobs_done,
+            "state": self.state(),
+        }
+
+
+class LocalWorker(Worker):
+    """Runs jobs in this process against shared.sd_model, using the regular API handlers; progress comes from shared.state."""
+
+    def __init__(self, name, handlers):
+        super().__init__(name)
+        self.handlers = handlers
+
+    def process(self, job):
+        return self.handlers[job.kind](job.request)
+
+    def state(self):
+        from modules import shared
+
+        return shared.state.dict()
+
+    def interrupt(self):
+        from modules import shared
+
+        shared.state.interrupt()
+
+
+class RemoteWorker(Worker):
+    """Forwards jobs to another webui process started with --nowebui; that process owns its model (e.g. on its own --device-id) and its state."""
+
+    def __init__(self, name, url, timeout=None):
+        super().__init__(name)
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def process(self, job):
+        import requests
+
+        response = requests.post(f"{self.url}/sdapi/v1/{job.kind}", json=job.payload(), timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def state(self):
+        import requests
+
+        try:
+            response = requests.get(f"{self.url}/sdapi/v1/progress", params={"skip_current_image": True}, timeout=5)
+            return response.json().get("state", {})
+        except Exception as e:
+            return {"error": str(e)}
+
+    def interrupt(self):
+        import requests
+
+        # an unreachable worker must not keep the others from being interrupted
+        try:
+            requests.post(f"{self.url}/sdapi/v1/interrupt", timeout=5)
+        except requests.RequestException as e:
+            errors.report(f"Error interrupting worker {self.name} at {self.url}: {e}")
+
+
+class StubWorker(Worker):
+    """CPU-only worker with a tiny stand-in model that sleeps for every sampling step and returns no images; used to test scheduling without a GPU."""
+
+    def __init__(self, name, step_time=0.01):
+        super().__init__(name)
+        self.step_time = step_time
+        self.worker_state = WorkerState()
+
+    def process(self, job):
+        payload = job.payload()
+        state = self.worker_state
+
+        state.begin(job=job.id_task)
+        try:
+            state.job_count = payload.get("n_iter") or 1
+            state.sampling_steps = payload.get("steps") or 20
+            for job_no in range(state.job_count):
+                state.job_no = job_no
+                for step in range(state.sampling_steps):
+                    if state.interrupted:
+                        break
+
+                    state.sampling_step = step
+                    time.sleep(self.step_time)
+        finally:
+            state.end()
+
+        return {"images": [], "parameters": payload, "info": json.dumps({"worker": self.name, "id_task": job.id_task})}
+
+    def state(self):
+        return self.worker_state.dict()
+
+    def interrupt(self):
+        self.worker_state.interrupted = True
+
+
+class WorkerPool:
+    """Queue of jobs and a dispatcher thread that hands the oldest of the highest priority queued jobs to the first free worker."""
+
+    def __init__(self, workers):
+        self.workers = list(workers)
+        self.pending = []
+        self.condition = threading.Condition()
+        self.stopped = False
+
+        self.dispatcher = threading.Thread(target=self.dispatch_loop, name="worker pool dispatcher", daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, id_task, kind, request, priority="normal", on_start=None):
+        """Queues a job; on_start, if given, is called when a worker takes it."""
+
+        job = Job(id_task, kind, request, priority, on_start)
+
+        with self.condition:
+            self.pending.append(job)
+            self.condition.notify_all()
+
+        return job
+
+    def run(self, id_task, kind, request, priority="normal", on_start=None):
+        """Submits a job and blocks until a worker has finished it; returns the worker's result or raises its exception."""
+
+        return self.submit(id_task, kind, request, priority, on_start).future.result()
+
+    def cancel(self, id_task):
+        """Removes a job that has not been given to a worker yet; returns False if there is no such job."""
+
+        with self.condition:
+            job = next((x for x in self.pending if x.id_task == id_task), None)
+            if job is None:
+                return False
+
+            self.pending.remove(job)
+
+        job.future.set_exception(priority_lock.TaskCancelled(f"task {id_task} was cancelled"))
+        return True
+
+    def free_worker(self):
+        return next((worker for worker in self.workers if not worker.busy), None)
+
+    def dispatch_loop(self):
+        while True:
+            with self.condition:
+                while not self.stopped and (not self.pending or self.free_worker() is None):
+                    self.condition.wait()
+
+                if self.stopped:
+                    return
+
+                worker = self.free_worker()
+                job = min(self.pending, key=lambda x: (x.priority, x.time_queued))
+                self.pending.remove(job)
+                worker.busy = True
+                worker.current_task = job.id_task
+
+            threading.Thread(target=self.run_job, args=(worker, job), name=f"worker {worker.name}", daemon=True).start()
+
+    def run_job(self, worker, job):
+        try:
+            if job.future.set_running_or_notify_cancel():
+                if job.on_start is not None:
+                    job.on_start()
+
+                job.future.set_result(worker.process(job))
+        except Exception as e:
+            job.future.set_exception(e)
+        finally:
+            with self.condition:
+                worker.busy = False
+                worker.current_task = None
+                worker.jobs_done += 1
+                self.condition.notify_all()
+
+    def queued_tasks(self):
+        with self.condition:
+            return [job.id_task for job in sorted(self.pending, key=lambda x: (x.priority, x.time_queued))]
+
+    def progress(self):
+        return [worker.progress() for worker in self.workers]
+
+    def interrupt(self):
+        for worker in self.workers:
+            if worker.busy:
+                worker.interrupt()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+
+def create_pool(worker_urls, stub_workers=0, local_handlers=None):
+    """Creates a WorkerPool from --api-workers and --api-stub-workers; the special url "local" means a worker in this process."""
+
+    workers = []
+    for i, url in enumerate(worker_urls or []):
+        if url == "local":
+            workers.append(LocalWorker(f"local-{i}", local_handlers))
+        else:
+            workers.append(RemoteWorker(f"remote-{i}", url))
+
+    for i in range(stub_workers or 0):
+        workers.append(StubWorker(f"stub-{i}"))
+
+    if not workers:
+        return None
+
+    return WorkerPool(workers)
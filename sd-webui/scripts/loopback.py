@@ -1,3 +1,4 @@
+import contextlib
 import math
 
 import gradio as gr
@@ -30,6 +31,9 @@ class Script(scripts.Script):
             "Denoising curve": denoising_curve
         }
 
+        # each of the batch_count chains is a separate loopback; batch_size chains are advanced together in one batch
+        chains_per_batch = max(min(p.batch_size, batch_count), 1)
+
         p.batch_size = 1
         p.n_iter = 1
 
@@ -42,8 +46,10 @@ class Script(scripts.Script):
         all_images = []
         original_init_image = p.init_images
         original_prompt = p.prompt
+        original_seed = p.seed
+        original_subseed = p.subseed
         original_inpainting_fill = p.inpainting_fill
-        state.job_count = loops * batch_count
+        state.job_count = loops * math.ceil(batch_count / chains_per_batch)
 
         initial_color_corrections = [processing.setup_color_correction(p.init_images[0])]
 
@@ -64,66 +70,95 @@ class Script(scripts.Script):
             change = (final_denoising_strength - initial_denoising_strength) * strength
             return initial_denoising_strength + change
 
+        def interrogate(init_images):
+            prefix = f"{original_prompt}, " if original_prompt else ""
+
+            if append_interrogation == "CLIP":
+                return [prefix + caption for caption in shared.interrogator.interrogate_batch(init_images)]
+
+            tags = [""] * len(init_images)
+            for index, image_tags in deepbooru.model.tag_batch(init_images):
+                tags[index] = image_tags or ""
+
+            return [prefix + x for x in tags]
+
+        if append_interrogation == "CLIP":
+            interrogation_session = shared.interrogator.session()
+        elif append_interrogation == "DeepBooru":
+            interrogation_session = deepbooru.model.session()
+        else:
+            interrogation_session = contextlib.nullcontext()
+
         history = []
 
-        for n in range(batch_count):
-            # Reset to original init image at the start of each batch
-            p.init_images = original_init_image
+        with interrogation_session:
+            for first_chain in range(0, batch_count, chains_per_batch):
+                chains = range(first_chain, min(first_chain + chains_per_batch, batch_count))
 
-            # Reset to original denoising strength
-            p.denoising_strength = initial_denoising_strength
+                # Reset to original init image at the start of each batch
+                init_images = [original_init_image[0]] * len(chains)
 
-            last_image = None
+                # Reset to original denoising strength
+                p.denoising_strength = initial_denoising_strength
 
-            for i in range(loops):
-                p.n_iter = 1
-                p.batch_size = 1
-                p.do_not_save_grid = True
+                last_images = None
 
-                if opts.img2img_color_correction:
-                    p.color_corrections = initial_color_corrections
+                for i in range(loops):
+                    p.n_iter = 1
+                    p.batch_size = len(chains)
+                    p.do_not_save_grid = True
+                    p.init_images = init_images
 
-                if append_interrogation != "None":
-                    p.prompt = f"{original_prompt}, " if original_prompt else ""
-                    if append_interrogation == "CLIP":
-                        p.prompt += shared.interrogator.interrogate(p.init_images[0])
-                    elif append_interrogation == "DeepBooru":
-                        p.prompt += deepbooru.model.tag(p.init_images[0])
+                    # same seeds as when every chain ran on its own, one loop after another
+                    p.seed = [original_seed + n * loops + i for n in chains]
+                    p.subseed = [original_subseed] * len(chains)
 
-                state.job = f"Iteration {i + 1}/{loops}, batch {n + 1}/{batch_count}"
+                    if opts.img2img_color_correction:
+                        p.color_corrections = initial_color_corrections * len(chains)
 
-                processed = processing.process_images(p)
+                    if append_interrogation != "None":
+                        p.prompt = interrogate(init_images)
 
-                # Generation cancelled.
-                if state.interrupted or state.stopping_generation:
-                    break
+                    if len(chains) == 1:
+                        state.job = f"Iteration {i + 1}/{loops}, batch {chains[0] + 1}/{batch_count}"
+                    else:
+                        state.job = f"Iteration {i + 1}/{loops}, batches {chains[0] + 1}-{chains[-1] + 1}/{batch_count}"
 
-                if initial_seed is None:
-                    initial_seed = processed.seed
-                    initial_info = processed.info
+                    processed = processing.process_images(p)
 
-                p.seed = processed.seed + 1
-                p.denoising_strength = calculate_denoising_strength(i + 1)
+                    # Generation cancelled.
+                    if state.interrupted or state.stopping_generation:
+                        break
 
-                if state.skipped:
-                    break
+                    if initial_seed is None:
+                        initial_seed = processed.seed
+                        initial_info = processed.info
+
+                    p.denoising_strength = calculate_denoising_strength(i + 1)
+
+                    if state.skipped:
+                        break
 
-                last_image = processed.images[0]
-                p.init_images = [last_image]
-                p.inpainting_fill = 1 # Set "masked content" to "original" for next loop.
+                    last_images = processed.images[:len(chains)]
+                    init_images = last_images
+                    p.inpainting_fill = 1 # Set "masked content" to "original" for next loop.
 
-                if batch_count == 1:
-                    history.append(last_image)
-                    all_images.append(last_image)
+                    if batch_count == 1:
+                        history += last_images
+                        all_images += last_images
 
-            if batch_count > 1 and not state.skipped and not state.interrupted:
-                history.append(last_image)
-                all_images.append(last_image)
+                if batch_count > 1 and last_images and not state.skipped and not state.interrupted:
+                    history += last_images
+                    all_images += last_images
 
-            p.inpainting_fill = original_inpainting_fill
+                p.inpainting_fill = original_inpainting_fill
+
+                if state.interrupted or state.stopping_generation:
+                    break
 
-            if state.interrupted or state.stopping_generation:
-                break
+        p.prompt = original_prompt
+        p.seed = original_seed
+        p.subseed = original_subseed
 
         if len(history) > 1:
             grid = images.image_grid(history, rows=1)
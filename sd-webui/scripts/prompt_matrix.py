@@ -1,9 +1,7 @@
-import math
-
 import modules.scripts as scripts
 import gradio as gr
 
-from modules import images
+from modules import images, batch_sizing
 from modules.processing import process_images
 from modules.shared import opts, state
 import modules.sd_samplers
@@ -52,10 +50,11 @@ class Script(scripts.Script):
                 variations_delimiter = gr.Radio(["comma", "space"], label="Select joining char", elem_id=self.elem_id("variations_delimiter"), value="comma")
             with gr.Column():
                 margin_size = gr.Slider(label="Grid margins (px)", minimum=0, maximum=500, value=0, step=2, elem_id=self.elem_id("margin_size"))
+                auto_batch_size = gr.Checkbox(label='Automatic batch size', value=False, elem_id=self.elem_id("auto_batch_size"), tooltip="Use the largest batches that fit in VRAM instead of the batch size above")
 
-        return [put_at_start, different_seeds, prompt_type, variations_delimiter, margin_size]
+        return [put_at_start, different_seeds, prompt_type, variations_delimiter, margin_size, auto_batch_size]
 
-    def run(self, p, put_at_start, different_seeds, prompt_type, variations_delimiter, margin_size):
+    def run(self, p, put_at_start, different_seeds, prompt_type, variations_delimiter, margin_size, auto_batch_size=False):
         modules.processing.fix_seed(p)
         # Raise error if promp type is not positive or negative
         if prompt_type not in ["positive", "negative"]:
@@ -83,10 +82,14 @@ class Script(scripts.Script):
 
             all_prompts.append(delimiter.join(selected_prompts))
 
-        p.n_iter = math.ceil(len(all_prompts) / p.batch_size)
+        p.batch_size, p.n_iter = batch_sizing.even_batches(len(all_prompts), p.batch_size)
+        p.auto_batch_size = auto_batch_size
         p.do_not_save_grid = True
 
-        print(f"Prompt matrix will create {len(all_prompts)} images using a total of {p.n_iter} batches.")
+        if auto_batch_size:
+            print(f"Prompt matrix will create {len(all_prompts)} images in batches as large as fit in memory.")
+        else:
+            print(f"Prompt matrix will create {len(all_prompts)} images using a total of {p.n_iter} batches.")
 
         if prompt_type == "positive":
             p.prompt = all_prompts
@@ -6,7 +6,7 @@ import modules.scripts as scripts
 import gradio as gr
 
 from modules import sd_samplers, errors, sd_models
-from modules.processing import Processed, process_images
+from modules.processing import Processed, process_images, get_fixed_seed
 from modules.shared import state
 
 
@@ -99,6 +99,26 @@ def cmdargs(line):
     return res
 
 
+# overrides that can differ between lines run together in one job, as they can be given to it as lists
+per_image_tags = {"prompt", "negative_prompt", "seed"}
+
+
+def batch_key(args):
+    """Lines with the same key differ at most in per_image_tags and can run together as one job."""
+
+    return tuple(sorted((k, v) for k, v in args.items() if k not in per_image_tags))
+
+
+def plan_batches(jobs):
+    """Groups indexes of jobs into runs of compatible lines, in order of each run's first line."""
+
+    runs = {}
+    for i, args in enumerate(jobs):
+        runs.setdefault(batch_key(args), []).append(i)
+
+    return list(runs.values())
+
+
 def load_prompt_file(file):
     if file is None:
         return None, gr.update(), gr.update(lines=7)
@@ -155,37 +175,91 @@ class Script(scripts.Script):
 
         state.job_count = job_count
 
+        # seeds are fixed for every line up front, so that lines run together get the same seeds as they would on their own
+        line_ps = []
+        for args in jobs:
+            copy_p = self.line_processing(p, args, prompt_position)
+            copy_p.seed = get_fixed_seed(copy_p.seed)
+            copy_p.subseed = get_fixed_seed(copy_p.subseed)
+            line_ps.append(copy_p)
+
+            if checkbox_iterate:
+                p.seed = p.seed + (p.batch_size * p.n_iter)
+
+        results = [None] * len(jobs)
+        for indexes in plan_batches(jobs):
+            if state.interrupted or state.stopping_generation:
+                break
+
+            state.job = f"{state.job_no + 1} out of {state.job_count}"
+
+            if len(indexes) == 1:
+                proc = process_images(line_ps[indexes[0]])
+                results[indexes[0]] = (proc.images, proc.all_prompts, proc.infotexts)
+                continue
+
+            for i, result in zip(indexes, self.process_lines_together([line_ps[i] for i in indexes])):
+                results[i] = result
+
         images = []
         all_prompts = []
         infotexts = []
-        for args in jobs:
-            state.job = f"{state.job_no + 1} out of {state.job_count}"
+        for result in results:
+            if result is not None:
+                images += result[0]
+                all_prompts += result[1]
+                infotexts += result[2]
 
-            copy_p = copy.copy(p)
-            for k, v in args.items():
-                if k == "sd_model":
-                    copy_p.override_settings['sd_model_checkpoint'] = v
-                else:
-                    setattr(copy_p, k, v)
+        return Processed(p, images, p.seed, "", all_prompts=all_prompts, infotexts=infotexts)
 
-            if args.get("prompt") and p.prompt:
-                if prompt_position == "start":
-                    copy_p.prompt = args.get("prompt") + " " + p.prompt
-                else:
-                    copy_p.prompt = p.prompt + " " + args.get("prompt")
+    def line_processing(self, p, args, prompt_position):
+        copy_p = copy.copy(p)
+        for k, v in args.items():
+            if k == "sd_model":
+                copy_p.override_settings = {**copy_p.override_settings, 'sd_model_checkpoint': v}
+            else:
+                setattr(copy_p, k, v)
 
-            if args.get("negative_prompt") and p.negative_prompt:
-                if prompt_position == "start":
-                    copy_p.negative_prompt = args.get("negative_prompt") + " " + p.negative_prompt
-                else:
-                    copy_p.negative_prompt = p.negative_prompt + " " + args.get("negative_prompt")
+        if args.get("prompt") and p.prompt:
+            if prompt_position == "start":
+                copy_p.prompt = args.get("prompt") + " " + p.prompt
+            else:
+                copy_p.prompt = p.prompt + " " + args.get("prompt")
 
-            proc = process_images(copy_p)
-            images += proc.images
+        if args.get("negative_prompt") and p.negative_prompt:
+            if prompt_position == "start":
+                copy_p.negative_prompt = args.get("negative_prompt") + " " + p.negative_prompt
+            else:
+                copy_p.negative_prompt = p.negative_prompt + " " + args.get("negative_prompt")
 
-            if checkbox_iterate:
-                p.seed = p.seed + (p.batch_size * p.n_iter)
-            all_prompts += proc.all_prompts
-            infotexts += proc.infotexts
+        return copy_p
 
-        return Processed(p, images, p.seed, "", all_prompts=all_prompts, infotexts=infotexts)
+    def process_lines_together(self, line_ps):
+        """Runs lines that differ only in prompts and seeds as one job with list-valued prompt and seed, so that setup,
+        model loading and extra network activation happen once; returns (images, prompts, infotexts) for each line.
+
+        Batches keep the line's batch size, and each line's images get the seeds it would get when run on its own.
+        """
+
+        first = line_ps[0]
+        count = first.batch_size * first.n_iter
+
+        merged = copy.copy(first)
+        merged.n_iter = first.n_iter * len(line_ps)
+        merged.prompt = [x.prompt for x in line_ps for _ in range(count)]
+        merged.negative_prompt = [x.negative_prompt for x in line_ps for _ in range(count)]
+        merged.seed = [x.seed + (i if x.subseed_strength == 0 else 0) for x in line_ps for i in range(count)]
+        merged.subseed = [x.subseed + i for x in line_ps for i in range(count)]
+
+        proc = process_images(merged)
+
+        images = proc.images[proc.index_of_first_image:]
+        infotexts = proc.infotexts[proc.index_of_first_image:]
+        if len(images) != len(proc.all_prompts) or len(infotexts) != len(images):
+            # scripts added images of their own, so images cannot be told apart by line; keep them all in the first line's place
+            return [(proc.images, proc.all_prompts, proc.infotexts)] + [([], [], [])] * (len(line_ps) - 1)
+
+        return [
+            (images[i * count:(i + 1) * count], proc.all_prompts[i * count:(i + 1) * count], infotexts[i * count:(i + 1) * count])
+            for i in range(len(line_ps))
+        ]
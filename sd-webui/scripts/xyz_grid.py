@@ -1,9 +1,12 @@
 from collections import namedtuple
 from copy import copy
-from itertools import permutations, chain
+from itertools import permutations, chain, product
+import hashlib
+import json
 import random
 import csv
 import os.path
+import shutil
 from io import StringIO
 from PIL import Image
 import numpy as np
@@ -11,7 +14,8 @@ import numpy as np
 import modules.scripts as scripts
 import gradio as gr
 
-from modules import images, sd_samplers, processing, sd_models, sd_vae, sd_schedulers, errors
+from modules import images, sd_samplers, processing, sd_models, sd_vae, sd_schedulers, errors, extra_networks, prefetch, grid_writer
+from modules.paths_internal import data_path
 from modules.processing import process_images, Processed, StableDiffusionProcessingTxt2Img
 from modules.shared import opts, state
 import modules.shared as shared
@@ -26,6 +30,11 @@ fill_values_symbol = "\U0001f4d2"  # 📒
 
 AxisInfo = namedtuple('AxisInfo', ['axis', 'values'])
 
+# axes that only change prompts and seeds, so that cells differing only in them can be rendered in one batch
+batchable_axes = {"Nothing", "Seed", "Var. seed", "Prompt S/R", "Prompt order"}
+
+progress_dir = os.path.join(data_path, "xyz_grid_progress")
+
 
 def apply_field(field):
     def fun(p, x, xs):
@@ -284,7 +293,166 @@ axis_options = [
 ]
 
 
-def draw_xyz_grid(p, xs, ys, zs, x_labels, y_labels, z_labels, cell, draw_legend, include_lone_images, include_sub_grids, first_axes_processed, second_axes_processed, margin_size):
+def cell_switch_key(pc):
+    """What has to be loaded to render a cell: checkpoint, FP8 mode, VAE, refiner and extra networks (LoRA etc.) from the prompt."""
+
+    prompts = pc.prompt if isinstance(pc.prompt, list) else [pc.prompt]
+    _, network_data = extra_networks.parse_prompts(prompts)
+    networks = tuple(sorted((name, tuple(tuple(x.items) for x in params)) for name, params in network_data.items()))
+
+    return (
+        pc.override_settings.get('sd_model_checkpoint'),
+        pc.override_settings.get('fp8_storage'),
+        pc.override_settings.get('sd_vae'),
+        getattr(pc, 'refiner_checkpoint', None),
+        networks,
+    )
+
+
+def plan_runs(cells, switch_keys, batch_keys, batch_size):
+    """Orders cells so that each part of their switch keys changes as few times as possible, checkpoint first, keeping the
+    given order otherwise, and groups cells with the same batch key into runs of up to batch_size cells rendered together.
+
+    Cells whose batch key is None are rendered on their own. Returns a list of runs, each a list of cells.
+    """
+
+    ranks = [{} for _ in next(iter(switch_keys.values()), ())]
+    for cell in cells:
+        for rank, value in zip(ranks, switch_keys[cell]):
+            rank.setdefault(value, len(rank))
+
+    order = sorted(range(len(cells)), key=lambda i: (tuple(rank[value] for rank, value in zip(ranks, switch_keys[cells[i]])), i))
+
+    runs = []
+    open_runs = {}
+    for cell in (cells[i] for i in order):
+        key = batch_keys[cell]
+        if key is None or batch_size <= 1:
+            runs.append([cell])
+            continue
+
+        run = open_runs.get(key)
+        if run is None or len(run) >= batch_size:
+            run = open_runs[key] = []
+            runs.append(run)
+
+        run.append(cell)
+
+    return runs
+
+
+def grid_key(p, axes):
+    """Identifies a grid by everything that affects its images, except for seeds that are still -1."""
+
+    fields = [
+        "prompt", "negative_prompt", "styles", "seed", "subseed", "subseed_strength", "seed_resize_from_h", "seed_resize_from_w",
+        "sampler_name", "scheduler", "batch_size", "n_iter", "steps", "cfg_scale", "image_cfg_scale", "width", "height",
+        "restore_faces", "tiling", "denoising_strength", "override_settings", "refiner_checkpoint", "refiner_switch_at",
+        "enable_hr", "hr_scale", "hr_upscaler", "hr_second_pass_steps", "hr_resize_x", "hr_resize_y", "hr_checkpoint_name",
+        "hr_sampler_name", "hr_scheduler", "hr_prompt", "hr_negative_prompt", "resize_mode", "inpainting_fill", "mask_blur",
+        "inpaint_full_res", "inpaint_full_res_padding", "inpainting_mask_invert",
+    ]
+
+    params = {name: getattr(p, name, None) for name in fields}
+    params["type"] = type(p).__name__
+    params["axes"] = axes
+    params["sd_model_checkpoint"] = opts.sd_model_checkpoint
+    params["sd_vae"] = opts.sd_vae
+    params["images"] = [hashlib.sha256(x.tobytes()).hexdigest() for x in [*(getattr(p, "init_images", None) or []), getattr(p, "image_mask", None)] if isinstance(x, Image.Image)]
+    params["script_args"] = [x for x in p.script_args or [] if x is None or isinstance(x, (str, int, float, bool))]
+
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf8")).hexdigest()[:20]
+
+
+def prune_progress(keep, exclude=None):
+    """Deletes saved cells of all but the keep most recently changed unfinished grids; exclude is a grid's directory to leave alone."""
+
+    try:
+        entries = [entry for entry in os.scandir(progress_dir) if entry.is_dir() and entry.path != exclude]
+    except FileNotFoundError:
+        return
+
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[keep:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class GridProgress:
+    """Rendered cells of a grid, kept on disk until the grid is complete, so that running the same grid again after it was
+    interrupted only renders the remaining cells.
+
+    Seeds picked randomly for the first run are saved too, so that the cells rendered later match the saved ones.
+    """
+
+    def __init__(self, key):
+        self.path = os.path.join(progress_dir, key)
+        self.state = {"seed": None, "subseed": None, "axes": {}, "cells": {}, "grid_infotext": None}
+        self.writer = prefetch.WriterPool(workers=1, max_pending=4)
+
+        prune_progress(keep=opts.xyz_grid_resume_keep, exclude=self.path)
+
+        try:
+            with open(os.path.join(self.path, "state.json"), "r", encoding="utf8") as file:
+                self.state.update(json.load(file))
+        except FileNotFoundError:
+            pass
+        except Exception:
+            errors.report(f"Error reading progress of X/Y/Z plot from {self.path}", exc_info=True)
+
+    def axis_values(self, name, opt, values):
+        """Returns the fixed seeds saved for a seed axis in a previous run, remembering the new ones if there are none."""
+
+        if opt.label not in ('Seed', 'Var. seed'):
+            return values
+
+        saved = self.state["axes"].get(name)
+        if saved is not None and len(saved) == len(values):
+            return saved
+
+        self.state["axes"][name] = values
+        return values
+
+    def load_cell(self, idx):
+        info = self.state["cells"].get(str(idx))
+        if info is None:
+            return None
+
+        try:
+            image = Image.open(os.path.join(self.path, f"{idx}.png"))
+            image.load()
+        except OSError:
+            return None
+
+        return image, info
+
+    def save_cell(self, idx, image, prompt, seed, infotext):
+        self.state["cells"][str(idx)] = {"prompt": prompt, "seed": seed, "infotext": infotext}
+        state_json = json.dumps(self.state)
+
+        def write():
+            os.makedirs(self.path, exist_ok=True)
+            image.save(os.path.join(self.path, f"{idx}.png"))
+
+            filename = os.path.join(self.path, "state.json")
+            with open(f"{filename}.tmp", "w", encoding="utf8") as file:
+                file.write(state_json)
+            os.replace(f"{filename}.tmp", filename)
+
+        self.writer.submit(write)
+
+    def close(self, complete):
+        """Waits for cells being saved; removes everything saved if the grid is complete."""
+
+        try:
+            self.writer.close()
+        except Exception:
+            errors.report(f"Error saving progress of X/Y/Z plot to {self.path}", exc_info=True)
+
+        if complete:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+
+def draw_xyz_grid(p, xs, ys, zs, x_labels, y_labels, z_labels, process_run, draw_legend, include_lone_images, include_sub_grids, runs, margin_size):
     hor_texts = [[images.GridAnnotation(x)] for x in x_labels]
     ver_texts = [[images.GridAnnotation(y)] for y in y_labels]
     title_texts = [[images.GridAnnotation(z)] for z in z_labels]
@@ -293,18 +461,12 @@ def draw_xyz_grid(p, xs, ys, zs, x_labels, y_labels, z_labels, cell, draw_legend
 
     processed_result = None
 
-    state.job_count = list_size * p.n_iter
-
-    def process_cell(x, y, z, ix, iy, iz):
+    def process_cell(processed: Processed, ix, iy, iz):
         nonlocal processed_result
 
         def index(ix, iy, iz):
             return ix + iy * len(xs) + iz * len(xs) * len(ys)
 
-        state.job = f"{index(ix, iy, iz) + 1} out of {list_size}"
-
-        processed: Processed = cell(x, y, z, ix, iy, iz)
-
         if processed_result is None:
             # Use our first processed result object as a template container to hold our full results
             processed_result = copy(processed)
@@ -330,36 +492,9 @@ def draw_xyz_grid(p, xs, ys, zs, x_labels, y_labels, z_labels, cell, draw_legend
                 cell_size = processed_result.images[0].size
             processed_result.images[idx] = Image.new(cell_mode, cell_size)
 
-    if first_axes_processed == 'x':
-        for ix, x in enumerate(xs):
-            if second_axes_processed == 'y':
-                for iy, y in enumerate(ys):
-                    for iz, z in enumerate(zs):
-                        process_cell(x, y, z, ix, iy, iz)
-            else:
-                for iz, z in enumerate(zs):
-                    for iy, y in enumerate(ys):
-                        process_cell(x, y, z, ix, iy, iz)
-    elif first_axes_processed == 'y':
-        for iy, y in enumerate(ys):
-            if second_axes_processed == 'x':
-                for ix, x in enumerate(xs):
-                    for iz, z in enumerate(zs):
-                        process_cell(x, y, z, ix, iy, iz)
-            else:
-                for iz, z in enumerate(zs):
-                    for ix, x in enumerate(xs):
-                        process_cell(x, y, z, ix, iy, iz)
-    elif first_axes_processed == 'z':
-        for iz, z in enumerate(zs):
-            if second_axes_processed == 'x':
-                for ix, x in enumerate(xs):
-                    for iy, y in enumerate(ys):
-                        process_cell(x, y, z, ix, iy, iz)
-            else:
-                for iy, y in enumerate(ys):
-                    for ix, x in enumerate(xs):
-                        process_cell(x, y, z, ix, iy, iz)
+    for run in runs:
+        for (ix, iy, iz), processed in process_run(run):
+            process_cell(processed, ix, iy, iz)
 
     if not processed_result:
         # Should never happen, I've only seen it on one of four open tabs and it needed to refresh.
@@ -371,6 +506,11 @@ def draw_xyz_grid(p, xs, ys, zs, x_labels, y_labels, z_labels, cell, draw_legend
 
     z_count = len(zs)
 
+    cell_w, cell_h = map(max, zip(*(img.size for img in processed_result.images if img is not None)))
+    grid_megapixels = cell_w * cell_h * list_size / 1000000
+    if opts.grid_stream_threshold_mp and grid_megapixels > opts.grid_stream_threshold_mp:
+        return lazy_xyz_grid(processed_result, xs, ys, z_count, hor_texts, ver_texts, title_texts, draw_legend, margin_size)
+
     for i in range(z_count):
         start_index = (i * len(xs) * len(ys)) + i
         end_index = start_index + len(xs) * len(ys)
@@ -396,6 +536,41 @@ def draw_xyz_grid(p, xs, ys, zs, x_labels, y_labels, z_labels, cell, draw_legend
     return processed_result
 
 
+def lazy_xyz_grid(processed_result, xs, ys, z_count, hor_texts, ver_texts, title_texts, draw_legend, margin_size):
+    """Same as the end of draw_xyz_grid, for grids too large to draw: the grids are only drawn scaled down to
+    grid_preview_max_side for the UI, and the full size ones are kept in full_size_grids for saving with grid_writer."""
+
+    cells_per_grid = len(xs) * len(ys)
+
+    sub_grids = []
+    for i in range(z_count):
+        cells = processed_result.images[i * cells_per_grid:(i + 1) * cells_per_grid]
+        if draw_legend:
+            sub_grids.append(grid_writer.LazyGrid(cells, len(xs), len(ys), grid_writer.copy_texts(hor_texts), grid_writer.copy_texts(ver_texts), margin_size))
+        else:
+            sub_grids.append(grid_writer.LazyGrid(cells, len(xs), len(ys)))
+
+    if draw_legend:
+        z_grid = grid_writer.LazyGrid(sub_grids, z_count, 1, title_texts, [[images.GridAnnotation()]])
+    else:
+        z_grid = grid_writer.LazyGrid(sub_grids, z_count, 1)
+
+    for i, sub_grid in enumerate(sub_grids):
+        start_index = i * cells_per_grid + i
+        processed_result.images.insert(i, sub_grid.preview(opts.grid_preview_max_side))
+        processed_result.all_prompts.insert(i, processed_result.all_prompts[start_index])
+        processed_result.all_seeds.insert(i, processed_result.all_seeds[start_index])
+        processed_result.infotexts.insert(i, processed_result.infotexts[start_index])
+
+    processed_result.images.insert(0, z_grid.preview(opts.grid_preview_max_side))
+    processed_result.infotexts.insert(0, processed_result.infotexts[0])
+    processed_result.full_size_grids = [z_grid] + sub_grids
+
+    print(f"X/Y/Z plot grid is {z_grid.width}x{z_grid.height}; showing a preview, the full size grid is saved separately")
+
+    return processed_result
+
+
 class SharedSettingsStackHelper(object):
     def __enter__(self):
         pass
@@ -538,9 +713,20 @@ class Script(scripts.Script):
     def run(self, p, x_type, x_values, x_values_dropdown, y_type, y_values, y_values_dropdown, z_type, z_values, z_values_dropdown, draw_legend, include_lone_images, include_sub_grids, no_fixed_seeds, vary_seeds_x, vary_seeds_y, vary_seeds_z, margin_size, csv_mode):
         x_type, y_type, z_type = x_type or 0, y_type or 0, z_type or 0  # if axle type is None set to 0
 
-        if not no_fixed_seeds:
+        progress = None
+        if opts.xyz_grid_resume:
+            axes = [(self.current_axis_options[t].label, v, vd) for t, v, vd in ((x_type, x_values, x_values_dropdown), (y_type, y_values, y_values_dropdown), (z_type, z_values, z_values_dropdown))]
+            progress = GridProgress(grid_key(p, [axes, no_fixed_seeds, vary_seeds_x, vary_seeds_y, vary_seeds_z, csv_mode, opts.return_grid]))
+
+        if progress is not None and progress.state["seed"] is not None:
+            p.seed, p.subseed = progress.state["seed"], progress.state["subseed"]
+            print(f"X/Y/Z plot: resuming a previous run with {len(progress.state['cells'])} cells done.")
+        elif not no_fixed_seeds:
             modules.processing.fix_seed(p)
 
+        if progress is not None:
+            progress.state["seed"], progress.state["subseed"] = p.seed, p.subseed
+
         if not opts.return_grid:
             p.batch_size = 1
 
@@ -645,34 +831,10 @@ class Script(scripts.Script):
             ys = fix_axis_seeds(y_opt, ys)
             zs = fix_axis_seeds(z_opt, zs)
 
-        if x_opt.label == 'Steps':
-            total_steps = sum(xs) * len(ys) * len(zs)
-        elif y_opt.label == 'Steps':
-            total_steps = sum(ys) * len(xs) * len(zs)
-        elif z_opt.label == 'Steps':
-            total_steps = sum(zs) * len(xs) * len(ys)
-        else:
-            total_steps = p.steps * len(xs) * len(ys) * len(zs)
-
-        if isinstance(p, StableDiffusionProcessingTxt2Img) and p.enable_hr:
-            if x_opt.label == "Hires steps":
-                total_steps += sum(xs) * len(ys) * len(zs)
-            elif y_opt.label == "Hires steps":
-                total_steps += sum(ys) * len(xs) * len(zs)
-            elif z_opt.label == "Hires steps":
-                total_steps += sum(zs) * len(xs) * len(ys)
-            elif p.hr_second_pass_steps:
-                total_steps += p.hr_second_pass_steps * len(xs) * len(ys) * len(zs)
-            else:
-                total_steps *= 2
-
-        total_steps *= p.n_iter
-
-        image_cell_count = p.n_iter * p.batch_size
-        cell_console_text = f"; {image_cell_count} images per cell" if image_cell_count > 1 else ""
-        plural_s = 's' if len(zs) > 1 else ''
-        print(f"X/Y/Z plot will create {len(xs) * len(ys) * len(zs) * image_cell_count} images on {len(zs)} {len(xs)}x{len(ys)} grid{plural_s}{cell_console_text}. (Total steps to process: {total_steps})")
-        shared.total_tqdm.updateTotal(total_steps)
+        if progress is not None:
+            xs = progress.axis_values("x", x_opt, xs)
+            ys = progress.axis_values("y", y_opt, ys)
+            zs = progress.axis_values("z", z_opt, zs)
 
         state.xyz_plot_x = AxisInfo(x_opt, xs)
         state.xyz_plot_y = AxisInfo(y_opt, ys)
@@ -680,7 +842,7 @@ class Script(scripts.Script):
 
         # If one of the axes is very slow to change between (like SD model
         # checkpoint), then make sure it is in the outer iteration of the nested
-        # `for` loop.
+        # `for` loop; plan_runs() then also groups cells by what they load.
         first_axes_processed = 'z'
         second_axes_processed = 'y'
         if x_opt.cost > y_opt.cost and x_opt.cost > z_opt.cost:
@@ -702,17 +864,26 @@ class Script(scripts.Script):
             else:
                 second_axes_processed = 'y'
 
-        grid_infotext = [None] * (1 + len(zs))
-
-        def cell(x, y, z, ix, iy, iz):
-            if shared.state.interrupted or state.stopping_generation:
-                return Processed(p, [], p.seed, "")
+        axis_order = {'x': 0, 'y': 1, 'z': 2}
+        third_axes_processed = next(x for x in 'xyz' if x not in (first_axes_processed, second_axes_processed))
+        nesting = [axis_order[first_axes_processed], axis_order[second_axes_processed], axis_order[third_axes_processed]]
+        cells = []
+        for indexes in product(*[range(len((xs, ys, zs)[axis])) for axis in nesting]):
+            cell = [0, 0, 0]
+            for axis, i in zip(nesting, indexes):
+                cell[axis] = i
+            cells.append(tuple(cell))
+
+        def cell_index(ix, iy, iz):
+            return ix + iy * len(xs) + iz * len(xs) * len(ys)
 
+        def cell_processing(ix, iy, iz):
             pc = copy(p)
             pc.styles = pc.styles[:]
-            x_opt.apply(pc, x, xs)
-            y_opt.apply(pc, y, ys)
-            z_opt.apply(pc, z, zs)
+            pc.override_settings = copy(pc.override_settings)
+            x_opt.apply(pc, xs[ix], xs)
+            y_opt.apply(pc, ys[iy], ys)
+            z_opt.apply(pc, zs[iz], zs)
 
             xdim = len(xs) if vary_seeds_x else 1
             ydim = len(ys) if vary_seeds_y else 1
@@ -724,12 +895,70 @@ class Script(scripts.Script):
             if vary_seeds_z:
                 pc.seed += iz * xdim * ydim
 
-            try:
-                res = process_images(pc)
-            except Exception as e:
-                errors.display(e, "generating image for xyz plot")
+            return pc
 
-                res = Processed(p, [], p.seed, "")
+        # keys and step counts come from throwaway processing objects; the ones that render a cell are made right before it
+        # is rendered, so that axes applying changes to shared state do so for their own cell, and are dropped afterwards
+        switch_keys = {}
+        cell_prompts = {}
+        cell_steps = {}
+        for cell in cells:
+            pc = cell_processing(*cell)
+            switch_keys[cell] = cell_switch_key(pc)
+            cell_prompts[cell] = pc.prompt
+            cell_steps[cell] = pc.steps
+            if isinstance(pc, StableDiffusionProcessingTxt2Img) and pc.enable_hr:
+                cell_steps[cell] += pc.hr_second_pass_steps or pc.steps
+            cell_steps[cell] *= pc.n_iter
+
+        batch_keys = {
+            (ix, iy, iz): (switch_keys[(ix, iy, iz)], tuple(values[i] for opt, values, i in ((x_opt, xs, ix), (y_opt, ys, iy), (z_opt, zs, iz)) if opt.label not in batchable_axes))
+            for ix, iy, iz in cells
+        }
+
+        # cells with more than one image each show them in a grid of their own, so only single image cells are batched
+        batch_size = opts.xyz_grid_batch_size if p.batch_size * p.n_iter == 1 else 1
+        runs = plan_runs(cells, switch_keys, batch_keys, batch_size)
+
+        done = set()
+        if progress is not None:
+            done = {cell for cell in cells if str(cell_index(*cell)) in progress.state["cells"]}
+
+        runs_to_render = [run for run in runs if any(cell not in done for cell in run)]
+
+        total_steps = sum(cell_steps[run[0]] for run in runs_to_render)
+
+        image_cell_count = p.n_iter * p.batch_size
+        cell_console_text = f"; {image_cell_count} images per cell" if image_cell_count > 1 else ""
+        plural_s = 's' if len(zs) > 1 else ''
+        batches_text = f" in {len(runs_to_render)} batches" if len(runs_to_render) != len(cells) - len(done) else ""
+        print(f"X/Y/Z plot will create {len(xs) * len(ys) * len(zs) * image_cell_count} images on {len(zs)} {len(xs)}x{len(ys)} grid{plural_s}{cell_console_text}{batches_text}. (Total steps to process: {total_steps})")
+        shared.total_tqdm.updateTotal(total_steps)
+
+        state.job_count = len(runs_to_render) * p.n_iter
+        jobs_started = 0
+        failed_cells = []
+
+        grid_infotext = [None] * (1 + len(zs))
+        if progress is not None and progress.state["grid_infotext"] is not None and len(progress.state["grid_infotext"]) == len(grid_infotext):
+            grid_infotext = progress.state["grid_infotext"]
+
+        # conds are cached by prompt, so that every cell with the same prompts reuses them, not just the next one
+        cond_caches = {}
+
+        def share_conds(pc):
+            prompt = tuple(pc.prompt) if isinstance(pc.prompt, list) else pc.prompt
+            negative_prompt = tuple(pc.negative_prompt) if isinstance(pc.negative_prompt, list) else pc.negative_prompt
+            styles = tuple(pc.styles)
+
+            pc.cached_c = cond_caches.setdefault(("c", prompt, styles), [None, None])
+            pc.cached_uc = cond_caches.setdefault(("uc", negative_prompt, styles), [None, None])
+            if isinstance(pc, StableDiffusionProcessingTxt2Img):
+                pc.cached_hr_c = cond_caches.setdefault(("hr_c", prompt, styles), [None, None])
+                pc.cached_hr_uc = cond_caches.setdefault(("hr_uc", negative_prompt, styles), [None, None])
+
+        def set_grid_infotexts(ix, iy, iz, pc, index):
+            """Sets infotexts of the grids from the processing object that rendered their first cell; index is the cell's image in pc."""
 
             # Sets subgrid infotexts
             subgrid_index = 1 + iz
@@ -749,7 +978,7 @@ class Script(scripts.Script):
                     if y_opt.label in ["Seed", "Var. seed"] and not no_fixed_seeds:
                         pc.extra_generation_params["Fixed Y Values"] = ", ".join([str(y) for y in ys])
 
-                grid_infotext[subgrid_index] = processing.create_infotext(pc, pc.all_prompts, pc.all_seeds, pc.all_subseeds)
+                grid_infotext[subgrid_index] = processing.create_infotext(pc, pc.all_prompts, pc.all_seeds, pc.all_subseeds, index=index)
 
             # Sets main grid infotext
             if grid_infotext[0] is None and ix == 0 and iy == 0 and iz == 0:
@@ -761,27 +990,130 @@ class Script(scripts.Script):
                     if z_opt.label in ["Seed", "Var. seed"] and not no_fixed_seeds:
                         pc.extra_generation_params["Fixed Z Values"] = ", ".join([str(z) for z in zs])
 
-                grid_infotext[0] = processing.create_infotext(pc, pc.all_prompts, pc.all_seeds, pc.all_subseeds)
+                grid_infotext[0] = processing.create_infotext(pc, pc.all_prompts, pc.all_seeds, pc.all_subseeds, index=index)
+
+        def render_cell(cell):
+            pc = cell_processing(*cell)
+            share_conds(pc)
+
+            try:
+                res = process_images(pc)
+            except Exception as e:
+                errors.display(e, "generating image for xyz plot")
+
+                return Processed(p, [], p.seed, "")
 
+            set_grid_infotexts(*cell, pc, 0)
             return res
 
+        def render_batch(run):
+            """Renders cells that differ only in prompts and seeds as one batch; returns None if its images cannot be told apart by cell."""
+
+            pcs_run = [cell_processing(*cell) for cell in run]
+
+            pb = copy(pcs_run[0])
+            pb.prompt = [pc.prompt for pc in pcs_run]
+            pb.negative_prompt = [pc.negative_prompt for pc in pcs_run]
+            pb.seed = [processing.get_fixed_seed(pc.seed) for pc in pcs_run]
+            pb.subseed = [processing.get_fixed_seed(pc.subseed) for pc in pcs_run]
+            pb.batch_size = len(run)
+            pb.n_iter = 1
+            pb.do_not_save_grid = True
+            share_conds(pb)
+
+            try:
+                res = process_images(pb)
+            except Exception as e:
+                errors.display(e, "generating image for xyz plot")
+
+                return [Processed(p, [], p.seed, "") for _ in run]
+
+            result_images = res.images[res.index_of_first_image:]
+            infotexts = res.infotexts[res.index_of_first_image:]
+            if len(result_images) != len(run) or len(infotexts) != len(run):
+                if state.interrupted or state.stopping_generation:
+                    return [Processed(p, [], p.seed, "") for _ in run]
+
+                return None
+
+            results = []
+            for i, (cell, pc) in enumerate(zip(run, pcs_run)):
+                cell_res = copy(res)
+                cell_res.images = [result_images[i]]
+                cell_res.prompt = pc.prompt
+                cell_res.negative_prompt = pc.negative_prompt
+                cell_res.seed = pb.all_seeds[i]
+                cell_res.subseed = pb.all_subseeds[i]
+                cell_res.info = infotexts[i]
+                cell_res.infotexts = [infotexts[i]]
+                cell_res.all_prompts = [pb.all_prompts[i]]
+                cell_res.all_negative_prompts = [pb.all_negative_prompts[i]]
+                cell_res.all_seeds = [pb.all_seeds[i]]
+                cell_res.all_subseeds = [pb.all_subseeds[i]]
+                cell_res.index_of_first_image = 0
+                results.append(cell_res)
+
+                set_grid_infotexts(*cell, pb, i)
+
+            return results
+
+        def process_run(run):
+            nonlocal jobs_started
+
+            results = {}
+            for cell in run:
+                saved = progress.load_cell(cell_index(*cell)) if progress is not None and cell in done else None
+                if saved is not None:
+                    image, info = saved
+                    res = Processed(p, [image], info["seed"], info["infotext"], all_prompts=[info["prompt"]], infotexts=[info["infotext"]])
+                    res.prompt = cell_prompts[cell]
+                    results[cell] = res
+
+            todo = [cell for cell in run if cell not in results]
+            if todo:
+                if shared.state.interrupted or state.stopping_generation:
+                    rendered = [Processed(p, [], p.seed, "") for _ in todo]
+                else:
+                    state.job = f"{jobs_started + 1} out of {len(runs_to_render)}"
+                    jobs_started += 1
+
+                    rendered = render_batch(todo) if len(todo) > 1 else None
+                    if rendered is None:
+                        rendered = [render_cell(cell) for cell in todo]
+
+                for cell, res in zip(todo, rendered):
+                    results[cell] = res
+
+                    if not res.images:
+                        failed_cells.append(cell)
+                    elif progress is not None:
+                        progress.state["grid_infotext"] = grid_infotext
+                        progress.save_cell(cell_index(*cell), res.images[0], res.prompt, res.seed, res.infotexts[0])
+
+            for cell in run:
+                yield cell, results[cell]
+
+        processed = None
         with SharedSettingsStackHelper():
-            processed = draw_xyz_grid(
-                p,
-                xs=xs,
-                ys=ys,
-                zs=zs,
-                x_labels=[x_opt.format_value(p, x_opt, x) for x in xs],
-                y_labels=[y_opt.format_value(p, y_opt, y) for y in ys],
-                z_labels=[z_opt.format_value(p, z_opt, z) for z in zs],
-                cell=cell,
-                draw_legend=draw_legend,
-                include_lone_images=include_lone_images,
-                include_sub_grids=include_sub_grids,
-                first_axes_processed=first_axes_processed,
-                second_axes_processed=second_axes_processed,
-                margin_size=margin_size
-            )
+            try:
+                processed = draw_xyz_grid(
+                    p,
+                    xs=xs,
+                    ys=ys,
+                    zs=zs,
+                    x_labels=[x_opt.format_value(p, x_opt, x) for x in xs],
+                    y_labels=[y_opt.format_value(p, y_opt, y) for y in ys],
+                    z_labels=[z_opt.format_value(p, z_opt, z) for z in zs],
+                    process_run=process_run,
+                    draw_legend=draw_legend,
+                    include_lone_images=include_lone_images,
+                    include_sub_grids=include_sub_grids,
+                    runs=runs,
+                    margin_size=margin_size
+                )
+            finally:
+                if progress is not None:
+                    progress.close(complete=processed is not None and not failed_cells and not (state.interrupted or state.stopping_generation))
 
         if not processed.images:
             # It broke, no further handling needed.
@@ -790,19 +1122,29 @@ class Script(scripts.Script):
         z_count = len(zs)
 
         # Set the grid infotexts to the real ones with extra_generation_params (1 main grid + z_count sub-grids)
-        processed.infotexts[:1 + z_count] = grid_infotext[:1 + z_count]
+        processed.infotexts[:1 + z_count] = [new or old for new, old in zip(grid_infotext[:1 + z_count], processed.infotexts[:1 + z_count])]
 
         if not include_lone_images:
             # Don't need sub-images anymore, drop from list:
             processed.images = processed.images[:z_count + 1]
 
-        if opts.grid_save:
+        # too large grids are only shown as a preview, so the full size ones are saved even if saving grids is off
+        full_size_grids = getattr(processed, "full_size_grids", None)
+        if opts.grid_save or full_size_grids:
             # Auto-save main and sub-grids:
             grid_count = z_count + 1 if z_count > 1 else 1
             for g in range(grid_count):
                 # TODO: See previous comment about intentional data misalignment.
                 adj_g = g - 1 if g > 0 else g
-                images.save_image(processed.images[g], p.outpath_grids, "xyz_grid", info=processed.infotexts[g], extension=opts.grid_format, prompt=processed.all_prompts[adj_g], seed=processed.all_seeds[adj_g], grid=True, p=processed)
+                if opts.grid_save:
+                    fullfn, _ = images.save_image(processed.images[g], p.outpath_grids, "xyz_grid", info=processed.infotexts[g], extension=opts.grid_format, prompt=processed.all_prompts[adj_g], seed=processed.all_seeds[adj_g], grid=True, p=processed)
+                    full_size_filename = f"{os.path.splitext(fullfn)[0]}-full.png"
+                else:
+                    os.makedirs(p.outpath_grids, exist_ok=True)
+                    full_size_filename = os.path.join(p.outpath_grids, f"xyz_grid-{images.get_next_sequence_number(p.outpath_grids, 'xyz_grid'):04}-full.png")
+                if full_size_grids:
+                    # the grid saved above, if any, is the preview; the full size one is written strip by strip
+                    grid_writer.write_png(full_size_grids[g], full_size_filename, info=processed.infotexts[g])
                 if not include_sub_grids:  # if not include_sub_grids then skip saving after the first grid
                     break
 
@@ -0,0 +1,83 @@
+import ast
+import glob
+import os
+import warnings
+
+from modules.paths_internal import script_path
+
+
+def resolve(name, extension_dir=None):
+    """Returns the file of a module from this repository, or of a module next to an extension's scripts, or None for other modules."""
+
+    parts = name.split(".")
+    roots = [script_path] if parts[0] == "modules" else [extension_dir] if extension_dir else []
+
+    for root in roots:
+        path = os.path.join(root, *parts)
+        for filename in (f"{path}.py", os.path.join(path, "__init__.py")):
+            if os.path.isfile(filename):
+                return filename
+
+    return None
+
+
+def module_level_nodes(nodes):
+    """Statements that run when a module is imported: everything except the bodies of functions."""
+
+    for node in nodes:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+
+        yield node
+        for field in ("body", "orelse", "finalbody", "handlers"):
+            yield from module_level_nodes(getattr(node, field, []))
+
+
+def imported_modules(filename):
+    with open(filename, encoding="utf8") as file, warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)  # invalid escape sequences in some scripts
+        tree = ast.parse(file.read())
+
+    for node in module_level_nodes(tree.body):
+        if isinstance(node, ast.Import):
+            yield from (alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            yield node.module
+            yield from (f"{node.module}.{alias.name}" for alias in node.names)
+
+
+def imported_at_startup(filenames):
+    """Names of the modules of this repository that get imported along with the files, following module-level imports."""
+
+    found = {}
+    pending = [(filename, os.path.dirname(os.path.dirname(filename))) for filename in filenames]
+    seen = set()
+
+    while pending:
+        filename, extension_dir = pending.pop()
+        if filename in seen:
+            continue
+
+        seen.add(filename)
+        for name in imported_modules(filename):
+            path = resolve(name, extension_dir)
+            if path is not None:
+                found.setdefault(name, filename)
+                pending.append((path, extension_dir if not name.startswith("modules") else None))
+
+    return found
+
+
+def test_scripts_do_not_import_ui():
+    # with --nowebui --api-fast-startup, only the API and the scripts are loaded, and the UI module must stay unimported
+    filenames = [
+        resolve("modules.api.api"),
+        resolve("modules.initialize"),
+        *glob.glob(os.path.join(script_path, "scripts", "*.py")),
+        *glob.glob(os.path.join(script_path, "modules", "processing_scripts", "*.py")),
+        *glob.glob(os.path.join(script_path, "extensions-builtin", "*", "scripts", "*.py")),
+    ]
+
+    found = imported_at_startup(filenames)
+
+    assert "modules.ui" not in found, f"modules.ui is imported by {found.get('modules.ui')}"
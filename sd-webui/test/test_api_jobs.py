@@ -0,0 +1,152 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from fastapi.exceptions import HTTPException
+
+from modules import priority_lock
+from modules.api import jobs
+
+
+class Response:
+    def __init__(self, **values):
+        self.values = values
+
+    def dict(self):
+        return self.values
+
+
+def make_request(**kwargs):
+    return SimpleNamespace(**{"force_task_id": None, "priority": None, "queue_timeout": None, **kwargs})
+
+
+def wait_for(manager, id_task, statuses, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(id_task)
+        if job is not None and job["status"] in statuses:
+            return job
+
+        time.sleep(0.005)
+
+    raise AssertionError(f"job {id_task} did not get to {statuses}")
+
+
+def test_submit_poll_fetch(tmp_path):
+    started = threading.Event()
+    release = threading.Event()
+
+    def handler(request):
+        manager.started(request.force_task_id)
+        started.set()
+        release.wait(5)
+        return Response(images=["image"], prompt=request.prompt)
+
+    manager = jobs.JobManager({"txt2img": handler}, runners=1, store_dir=str(tmp_path))
+    job = manager.submit("txt2img", make_request(prompt="a dress"))
+
+    started.wait(5)
+    assert manager.get(job.id_task)["status"] == "running"
+    assert manager.get(job.id_task)["started_at"] is not None
+
+    release.set()
+    result = wait_for(manager, job.id_task, {"done"})
+
+    assert result["result"] == {"images": ["image"], "prompt": "a dress"}
+    assert result["finished_at"] >= result["started_at"]
+
+    assert manager.delete(job.id_task)
+    assert manager.get(job.id_task) is None
+
+
+def test_queued_until_started(tmp_path):
+    waiting = threading.Event()
+    release = threading.Event()
+
+    def handler(request):
+        waiting.set()
+        release.wait(5)  # waiting for the queue lock
+        manager.started(request.force_task_id)
+        return Response()
+
+    manager = jobs.JobManager({"txt2img": handler}, runners=1, store_dir=str(tmp_path))
+    job = manager.submit("txt2img", make_request())
+
+    waiting.wait(5)
+    assert manager.get(job.id_task)["status"] == "queued"
+
+    release.set()
+    wait_for(manager, job.id_task, {"done"})
+
+
+def test_priority_order_and_cancel(tmp_path):
+    release = threading.Event()
+    order = []
+
+    def handler(request):
+        release.wait(5)
+        order.append(request.force_task_id)
+        return Response()
+
+    manager = jobs.JobManager({"txt2img": handler}, runners=1, store_dir=str(tmp_path))
+    first = manager.submit("txt2img", make_request(force_task_id="first"))
+    while manager.queue_position(first) is not None:
+        time.sleep(0.005)
+
+    manager.submit("txt2img", make_request(force_task_id="batch", priority="batch"))
+    manager.submit("txt2img", make_request(force_task_id="normal"))
+    manager.submit("txt2img", make_request(force_task_id="cancelled"))
+    manager.submit("txt2img", make_request(force_task_id="interactive", priority="interactive"))
+
+    assert manager.get("batch")["queue_position"] == 4
+    assert manager.get("interactive")["queue_position"] == 1
+    assert manager.cancel("cancelled")
+    assert manager.get("cancelled")["status"] == "cancelled"
+
+    release.set()
+    wait_for(manager, "batch", {"done"})
+
+    assert order == ["first", "interactive", "normal", "batch"]
+
+
+def test_expiry(tmp_path):
+    release = threading.Event()
+    timeouts = []
+
+    def handler(request):
+        timeouts.append(request.queue_timeout)
+        release.wait(5)
+        if request.force_task_id == "lock-expired":
+            raise HTTPException(status_code=503, detail="expired") from priority_lock.TaskExpired("expired")
+
+        return Response()
+
+    manager = jobs.JobManager({"txt2img": handler}, runners=1, store_dir=str(tmp_path))
+    manager.submit("txt2img", make_request(force_task_id="running"))
+    manager.submit("txt2img", make_request(force_task_id="stale", queue_timeout=0.01))
+    manager.submit("txt2img", make_request(force_task_id="lock-expired", queue_timeout=60))
+
+    time.sleep(0.05)
+    release.set()
+
+    stale = wait_for(manager, "stale", {"expired", "done", "failed"})
+    lock_expired = wait_for(manager, "lock-expired", {"expired", "done", "failed"})
+
+    assert stale["status"] == "expired"
+    assert stale["started_at"] is None
+    assert lock_expired["status"] == "expired"
+
+    # the handler only waits for what is left of the job's queue_timeout
+    assert timeouts[0] is None
+    assert 0 < timeouts[1] < 60
+
+
+def test_failed_job(tmp_path):
+    def handler(request):
+        raise ValueError("bad request")
+
+    manager = jobs.JobManager({"txt2img": handler}, runners=1, store_dir=str(tmp_path))
+    job = manager.submit("txt2img", make_request())
+
+    result = wait_for(manager, job.id_task, {"failed"})
+    assert result["error"] == "ValueError: bad request"
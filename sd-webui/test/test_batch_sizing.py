@@ -0,0 +1,46 @@
+import pytest
+
+from modules import batch_sizing
+
+
+@pytest.mark.parametrize("count,max_batch_size,expected", [
+    (9, 8, (5, 2)),
+    (8, 8, (8, 1)),
+    (16, 8, (8, 2)),
+    (17, 8, (6, 3)),
+    (3, 8, (3, 1)),
+    (1, 1, (1, 1)),
+    (5, 0, (1, 5)),
+])
+def test_even_batches(count, max_batch_size, expected):
+    assert batch_sizing.even_batches(count, max_batch_size) == expected
+
+
+@pytest.mark.parametrize("count", range(1, 40))
+@pytest.mark.parametrize("max_batch_size", [1, 2, 3, 4, 8, 16])
+def test_even_batches_cover_all_images(count, max_batch_size):
+    batch_size, n_iter = batch_sizing.even_batches(count, max_batch_size)
+
+    assert batch_size <= max_batch_size
+    assert n_iter == -(-count // max_batch_size)
+    assert (n_iter - 1) * batch_size < count <= n_iter * batch_size
+
+
+@pytest.mark.parametrize("count,max_batch_size,expected", [
+    (17, 8, (1, 17)),
+    (18, 8, (6, 3)),
+    (16, 8, (8, 2)),
+    (9, 8, (3, 3)),
+    (3, 8, (3, 1)),
+])
+def test_even_batches_exact(count, max_batch_size, expected):
+    assert batch_sizing.even_batches(count, max_batch_size, exact=True) == expected
+
+
+@pytest.mark.parametrize("count", range(1, 40))
+@pytest.mark.parametrize("max_batch_size", [1, 2, 3, 4, 8, 16])
+def test_even_batches_exact_are_full(count, max_batch_size):
+    batch_size, n_iter = batch_sizing.even_batches(count, max_batch_size, exact=True)
+
+    assert batch_size <= max_batch_size
+    assert batch_size * n_iter == count
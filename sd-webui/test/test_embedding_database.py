@@ -0,0 +1,108 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from modules import shared
+from modules.textual_inversion import textual_inversion
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    tokenize = lambda texts: [[sum(map(ord, text))] for text in texts]  # noqa: E731
+    # shared.sd_model would load a checkpoint when read, so the module gets a stand-in for shared with just a tokenizer
+    monkeypatch.setattr(textual_inversion, "shared", SimpleNamespace(sd_model=SimpleNamespace(cond_stage_model=SimpleNamespace(tokenize=tokenize)), opts=shared.opts))
+
+    db = textual_inversion.EmbeddingDatabase()
+    db.expected_shape = 768
+    db.add_embedding_dir(str(tmp_path))
+    db.reads = []
+
+    def read_from_file(path, filename):
+        db.reads.append(filename)
+        with open(path, "r", encoding="utf8") as file:
+            name = file.read().strip()
+
+        return SimpleNamespace(name=name, shape=768, filename=filename)
+
+    monkeypatch.setattr(db, "read_from_file", read_from_file)
+
+    yield db
+
+    if db.background_scan is not None:
+        db.background_scan.join()
+
+
+def write(path, name):
+    with open(path, "w", encoding="utf8") as file:
+        file.write(name)
+
+
+def test_reload_reads_only_changed_files(database, tmp_path):
+    write(tmp_path / "a.pt", "a")
+    write(tmp_path / "b.pt", "b")
+
+    database.load_textual_inversion_embeddings()
+    assert sorted(database.reads) == ["a.pt", "b.pt"]
+    assert list(database.word_embeddings) == ["a", "b"]
+
+    database.reads.clear()
+    database.load_textual_inversion_embeddings()
+    assert database.reads == []
+
+    write(tmp_path / "a.pt", "a-renamed")
+    os.remove(tmp_path / "b.pt")
+    database.load_textual_inversion_embeddings()
+
+    assert database.reads == ["a.pt"]
+    assert list(database.word_embeddings) == ["a-renamed"]
+    assert database.ids_lookup == {sum(map(ord, "a-renamed")): [([sum(map(ord, "a-renamed"))], database.word_embeddings["a-renamed"])]}
+
+
+def test_same_name_uses_last_loaded_file(database, tmp_path):
+    write(tmp_path / "a.pt", "same")
+    write(tmp_path / "b.pt", "same")
+
+    database.load_textual_inversion_embeddings()
+    assert database.word_embeddings["same"].filename == "b.pt"
+
+    os.remove(tmp_path / "b.pt")
+    database.load_textual_inversion_embeddings()
+    assert database.word_embeddings["same"].filename == "a.pt"
+
+
+def test_update_for_generation(database, tmp_path):
+    write(tmp_path / "a.pt", "a")
+    database.update_for_generation()
+    database.background_scan.join()
+    assert list(database.word_embeddings) == ["a"]
+
+    # a new file changes the directory's mtime, so it is loaded right away
+    write(tmp_path / "b.pt", "b")
+    database.update_for_generation()
+    assert list(database.word_embeddings) == ["a", "b"]
+    database.background_scan.join()
+
+    # a file edited in place is found by the background scan and applied by the next update
+    database.reads.clear()
+    mtime = os.stat(tmp_path).st_mtime_ns
+    write(tmp_path / "a.pt", "a-edited")
+    os.utime(tmp_path, ns=(mtime, mtime))
+
+    database.update_for_generation()
+    database.background_scan.join()
+    assert database.reads == ["a.pt"]
+    assert list(database.word_embeddings) == ["a", "b"]
+
+    database.update_for_generation()
+    assert list(database.word_embeddings) == ["a-edited", "b"]
+
+
+def test_outdated_background_scan_is_not_applied(database, tmp_path):
+    write(tmp_path / "a.pt", "a")
+    database.load_textual_inversion_embeddings()
+
+    database.pending_changes = (database.version - 1, {}, dict(database.dir_mtimes), {})
+    database.update_for_generation()
+
+    assert list(database.word_embeddings) == ["a"]
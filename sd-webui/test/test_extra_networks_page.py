@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from modules import ui_extra_networks
+
+
+def make_item(name, description="", date_modified=1):
+    return {
+        "name": name,
+        "filename": f"/models/{name}.safetensors",
+        "preview": f"./sd_extra_networks/thumb?filename={name}.png",
+        "description": description,
+        "search_terms": [f"{name}.safetensors"],
+        "local_preview": f"/models/{name}.png",
+        "prompt": f"'<lora:{name}:1>'",
+        "sort_keys": {"name": name.lower(), "date_modified": date_modified},
+        "user_metadata": {},
+    }
+
+
+class Page(ui_extra_networks.ExtraNetworksPage):
+    def __init__(self, items):
+        super().__init__("Test")
+        self.listed = items
+        self.created = []
+
+    def list_items(self):
+        return list(self.listed)
+
+    def create_item_html(self, tabname, item, template=None):
+        self.created.append(item["name"])
+        return super().create_item_html(tabname, item, template)
+
+
+@pytest.fixture
+def page():
+    page = Page([make_item(name, description=f"{name} style") for name in ["b10", "a", "b2", "C"]])
+    page.refresh_items()
+    return page
+
+
+def test_query_items_sorts_and_pages(page):
+    total, items = page.query_items(sort="name")
+    assert total == 4
+    assert [x["name"] for x in items] == ["a", "b2", "b10", "C"]
+
+    total, items = page.query_items(sort="name", reverse=True, offset=1, limit=2)
+    assert total == 4
+    assert [x["name"] for x in items] == ["b10", "b2"]
+
+    assert page.query_items(sort="name", offset=10)[1] == []
+
+
+def test_query_items_searches(page):
+    total, items = page.query_items(search="B1")
+    assert total == 1
+    assert [x["name"] for x in items] == ["b10"]
+
+    total, items = page.query_items(search="style", sort="name", limit=1)
+    assert total == 4
+    assert [x["name"] for x in items] == ["a"]
+
+
+def test_card_html_cache(page):
+    item = page.items["a"]
+    card = page.card_html("txt2img", item)
+    assert page.card_html("txt2img", item) == card
+    assert page.created == ["a"]
+
+    page.card_html("img2img", item)
+    assert page.created == ["a", "a"]
+
+    item["description"] = "edited"
+    assert "edited" in page.card_html("txt2img", item)
+    assert page.created == ["a", "a", "a"]
+
+    item["sort_keys"]["date_modified"] = 2
+    page.card_html("txt2img", item)
+    assert page.created == ["a", "a", "a", "a"]
+
+
+def test_card_html_cache_evicts_removed_items(page):
+    page.card_html("txt2img", page.items["a"])
+    page.card_html("txt2img", page.items["C"])
+
+    page.listed = [x for x in page.listed if x["name"] != "a"]
+    page.refresh_items()
+
+    assert list(page.cards_html) == [("txt2img", "C")]
+
+
+def test_list_page_items(page, monkeypatch):
+    monkeypatch.setattr(ui_extra_networks, "extra_pages", [page])
+
+    response = ui_extra_networks.list_page_items(page="test", sort="name", order="descending", offset=0, limit=2)
+    data = json.loads(response.body)
+
+    assert data["total"] == 4
+    assert [x["name"] for x in data["items"]] == ["C", "b10"]
+    assert all(x["html"] for x in data["items"])
+
+    response = ui_extra_networks.list_page_items(page="test", search="b2", include_html=False)
+    data = json.loads(response.body)
+
+    assert [x["name"] for x in data["items"]] == ["b2"]
+    assert "html" not in data["items"][0]
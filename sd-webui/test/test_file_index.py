@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from modules import file_index
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = file_index.FileIndex()
+    monkeypatch.setattr(file_index, "mtime_granularity_ns", -1)
+    monkeypatch.setattr(file_index.cache, "cache", lambda subsection: {})
+    monkeypatch.setattr(file_index.shared.opts, "list_hidden_files", True, raising=False)
+    return index
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(path)
+
+
+def test_walk_files_order_and_changes(tmp_path, index):
+    for name in ["b/model10.safetensors", "b/model2.safetensors", "a.safetensors", "b/c/x.pt", "notes.txt"]:
+        touch(os.path.join(tmp_path, name))
+
+    def walk():
+        return [os.path.relpath(x.path, tmp_path) for x in index.walk_files(str(tmp_path), allowed_extensions=[".safetensors", ".pt"])]
+
+    assert walk() == ["a.safetensors", os.path.join("b", "model2.safetensors"), os.path.join("b", "model10.safetensors"), os.path.join("b", "c", "x.pt")]
+
+    touch(os.path.join(tmp_path, "b", "model3.safetensors"))
+    os.utime(os.path.join(tmp_path, "b"), ns=(0, 10**9))  # so that the mtime differs from the cached one even with coarse timestamps
+    os.remove(os.path.join(tmp_path, "a.safetensors"))
+
+    assert walk() == [os.path.join("b", "model2.safetensors"), os.path.join("b", "model3.safetensors"), os.path.join("b", "model10.safetensors"), os.path.join("b", "c", "x.pt")]
+
+
+def test_file_objects(tmp_path):
+    objects = file_index.FileObjects()
+    created = []
+
+    def create():
+        created.append(1)
+        return object()
+
+    first = objects.get(file_index.FileEntry("a", 1, 1.0), create)
+    assert objects.get(file_index.FileEntry("a", 1, 1.0), create) is first
+    assert objects.get(file_index.FileEntry("a", 2, 2.0), create) is not first
+    assert len(created) == 2
+
+    objects.retain(["b"])
+    assert not objects.objects
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from modules import grid_writer, images
+
+
+def random_image(w, h, seed):
+    pixels = np.random.default_rng(seed).integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+    return Image.fromarray(pixels, "RGB")
+
+
+def texts(*lines):
+    return [[images.GridAnnotation(text)] for text in lines]
+
+
+@pytest.fixture
+def cells():
+    return [random_image(64, 48, seed) for seed in range(6)]
+
+
+def test_crop_matches_image_grid(cells):
+    grid = grid_writer.LazyGrid(cells, 3, 2)
+    expected = images.image_grid(cells, rows=2)
+
+    assert grid.size == expected.size
+    assert np.array_equal(np.asarray(grid.crop((0, 0, grid.width, grid.height))), np.asarray(expected))
+    assert np.array_equal(np.asarray(grid.crop((10, 30, 150, 70))), np.asarray(expected.crop((10, 30, 150, 70))))
+
+
+@pytest.mark.parametrize("margin", [0, 5])
+def test_crop_matches_draw_grid_annotations(cells, margin):
+    grid = grid_writer.LazyGrid(cells, 3, 2, texts("x one", "x two", "x three"), texts("y one", "y two"), margin)
+    expected = images.draw_grid_annotations(images.image_grid(cells, rows=2), 64, 48, texts("x one", "x two", "x three"), texts("y one", "y two"), margin)
+
+    assert grid.size == expected.size
+
+    # drawn in strips like write_png() does, so the texts are cut across strips
+    strips = [grid.crop((0, y, grid.width, min(grid.height, y + 17))) for y in range(0, grid.height, 17)]
+    drawn = np.concatenate([np.asarray(strip) for strip in strips])
+
+    assert np.array_equal(drawn, np.asarray(expected))
+
+
+def test_grid_of_grids(cells):
+    sub_grids = [grid_writer.LazyGrid(cells[:3], 3, 1), grid_writer.LazyGrid(cells[3:], 3, 1)]
+    grid = grid_writer.LazyGrid(sub_grids, 2, 1)
+    expected = images.image_grid([images.image_grid(cells[:3], rows=1), images.image_grid(cells[3:], rows=1)], rows=1)
+
+    assert np.array_equal(np.asarray(grid.crop((0, 0, grid.width, grid.height))), np.asarray(expected))
+
+
+@pytest.mark.parametrize("strip_height", [1, 20, 256])
+def test_write_png(tmp_path, cells, strip_height):
+    grid = grid_writer.LazyGrid(cells, 3, 2)
+    filename = str(tmp_path / "grid.png")
+
+    grid_writer.write_png(grid, filename, info="a dress, Steps: 20", strip_height=strip_height)
+
+    with Image.open(filename) as image:
+        assert image.size == grid.size
+        assert image.info["parameters"] == "a dress, Steps: 20"
+        assert np.array_equal(np.asarray(image.convert("RGB")), np.asarray(images.image_grid(cells, rows=2)))
+
+    assert list(tmp_path.iterdir()) == [tmp_path / "grid.png"]
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from modules import images
+
+
+def random_image(w, h, mode="RGB"):
+    channels = {"L": 1, "RGB": 3, "RGBA": 4}[mode]
+    pixels = np.random.default_rng(0).integers(0, 256, size=(h, w, channels), dtype=np.uint8)
+    return Image.fromarray(pixels.squeeze(2) if channels == 1 else pixels, mode)
+
+
+@pytest.mark.parametrize("mode", ["L", "RGB", "RGBA"])
+@pytest.mark.parametrize("size", [(1000, 700), (512, 512), (300, 200)])
+def test_split_grid_matches_crop(mode, size):
+    image = random_image(*size, mode=mode)
+    grid = images.split_grid(image, tile_w=256, tile_h=256, overlap=64)
+
+    for y, h, row in grid.tiles:
+        for x, w, tile in row:
+            assert tile.mode == mode
+            assert np.array_equal(np.asarray(tile), np.asarray(image.crop((x, y, x + w, y + h))))
+
+
+@pytest.mark.parametrize("size", [(1000, 700), (512, 512), (640, 256)])
+def test_combine_grid_restores_image(size):
+    image = random_image(*size)
+    grid = images.split_grid(image, tile_w=256, tile_h=256, overlap=64)
+
+    combined = images.combine_grid(grid)
+
+    assert combined.size == image.size
+    assert np.array_equal(np.asarray(combined), np.asarray(image))
+
+
+def test_combine_grid_blends_overlap():
+    grid = images.split_grid(Image.new("RGB", (448, 256)), tile_w=256, tile_h=256, overlap=64)
+    (_, _, row), = grid.tiles
+    row[0][2] = Image.new("RGB", (256, 256), "black")
+    row[1][2] = Image.new("RGB", (256, 256), "white")
+
+    line = np.asarray(images.combine_grid(grid))[128, :, 0].astype(int)
+
+    assert line[:192].max() == 0
+    assert line[256:].min() == 255
+    assert np.all(np.diff(line[192:256]) > 0)
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from modules import devices, shared_state
+
+
+class FakeDecoder:
+    """Stands in for State.decode_preview: returns the latent as the image, and blocks on latents in hold until released."""
+
+    def __init__(self, hold=()):
+        self.hold = set(hold)
+        self.decoding = threading.Event()
+        self.release = threading.Event()
+        self.decoded = []
+
+    def __call__(self, latent):
+        self.decoded.append(latent)
+        if latent in self.hold:
+            self.decoding.set()
+            self.release.wait(5)
+
+        return f"image {latent}"
+
+
+@pytest.fixture
+def state(monkeypatch):
+    monkeypatch.setattr(devices, "torch_gc", lambda: None)
+
+    state = shared_state.State()
+    state.time_start = 1
+    state.assigned = []
+    state.assign_current_image = state.assigned.append
+    state.current_image_data_url = lambda: None
+    return state
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_only_latest_is_decoded(state):
+    state.decode_preview = decoder = FakeDecoder(hold={"1"})
+
+    state.preview_worker.submit("1")
+    decoder.decoding.wait(5)
+
+    state.sampling_step = 3
+    state.preview_worker.submit("2")
+    state.preview_worker.submit("3")
+    decoder.release.set()
+
+    wait_for(lambda: state.assigned == ["image 1", "image 3"])
+    assert decoder.decoded == ["1", "3"]
+    assert state.current_image_sampling_step == 3
+
+
+def test_preview_of_ended_job_is_dropped(state):
+    state.decode_preview = decoder = FakeDecoder(hold={"old"})
+
+    state.preview_worker.submit("old")
+    decoder.decoding.wait(5)
+
+    state.time_start = 2
+    decoder.release.set()
+
+    state.preview_worker.submit("new")
+    wait_for(lambda: state.assigned)
+
+    assert decoder.decoded == ["old", "new"]
+    assert state.assigned == ["image new"]
+
+
+def test_begin_cancels_pending(state):
+    state.decode_preview = decoder = FakeDecoder(hold={"1"})
+
+    state.preview_worker.submit("1")
+    decoder.decoding.wait(5)
+
+    state.preview_worker.submit("2")
+    state.begin()
+    decoder.release.set()
+
+    state.preview_worker.submit("3")
+    wait_for(lambda: state.assigned)
+
+    assert decoder.decoded == ["1", "3"]
+    assert state.assigned == ["image 3"]
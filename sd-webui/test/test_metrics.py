@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from modules import metrics, prefetch
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    registered = list(metrics.metrics)
+    yield
+    metrics.metrics[:] = registered
+
+
+def test_counter_exposition():
+    counter = metrics.Counter("test_requests_total", "Requests.")
+    counter.inc(endpoint="/a", status=200)
+    counter.inc(endpoint="/a", status=200)
+    counter.inc(3, endpoint="/b", status=500)
+
+    assert counter.exposition().split("\n") == [
+        "# HELP test_requests_total Requests.",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{endpoint="/a",status="200"} 2',
+        'test_requests_total{endpoint="/b",status="500"} 3',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = metrics.Counter("test_escaped_total", "Escaped labels.")
+    counter.inc(name='a "quoted" \\ path\nwith a newline')
+
+    assert counter.exposition().split("\n")[-1] == 'test_escaped_total{name="a \\"quoted\\" \\\\ path\\nwith a newline"} 1'
+
+
+def test_histogram_exposition():
+    histogram = metrics.Histogram("test_seconds", "Durations.", buckets=[1, 0.1])
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5, stage="a")
+
+    assert histogram.exposition().split("\n") == [
+        "# HELP test_seconds Durations.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="a",le="0.1"} 1',
+        'test_seconds_bucket{stage="a",le="1"} 2',
+        'test_seconds_bucket{stage="a",le="+Inf"} 3',
+        'test_seconds_sum{stage="a"} 5.55',
+        'test_seconds_count{stage="a"} 3',
+    ]
+
+
+def test_gauge_function_exposition():
+    gauge = metrics.Gauge("test_memory_bytes", "Memory.", lambda: {(("kind", "ram"),): 10, (("kind", "vram"),): 20})
+    failing = metrics.Gauge("test_failing", "Fails.", lambda: 1 / 0)
+    plain = metrics.Gauge("test_plain", "Plain.", lambda: 7)
+
+    assert gauge.exposition().split("\n")[2:] == ['test_memory_bytes{kind="ram"} 10', 'test_memory_bytes{kind="vram"} 20']
+    assert failing.exposition().split("\n")[2:] == []
+    assert plain.exposition().split("\n")[2:] == ["test_plain 7"]
+
+
+def test_exposition_includes_all_metrics():
+    metrics.Counter("test_included_total", "Included.").inc()
+
+    text = metrics.exposition()
+
+    assert text.endswith("\n")
+    assert "# TYPE test_included_total counter\ntest_included_total 1\n" in text
+    assert "# TYPE sd_webui_stage_seconds histogram" in text
+
+
+def test_timeline_only_records_its_trace():
+    histogram = metrics.Histogram("test_stage_seconds", "Stages.", buckets=[1])
+
+    def other_request():
+        with histogram.time(stage="other"):
+            pass
+
+    def prefetched(item):
+        with histogram.time(stage="prefetched"):
+            return item
+
+    timeline = metrics.start_timeline("trace")
+    try:
+        with histogram.time(stage="own"):
+            pass
+
+        thread = threading.Thread(target=other_request)
+        thread.start()
+        thread.join()
+
+        assert [result for _, result, _ in prefetch.prefetch(prefetched, [1, 2])] == [1, 2]
+    finally:
+        metrics.stop_timeline()
+
+    with histogram.time(stage="after"):
+        pass
+
+    assert [x["stage"] for x in timeline] == ["own", "prefetched", "prefetched"]
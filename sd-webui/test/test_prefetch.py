@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+from modules import prefetch
+
+
+def test_prefetch_order_and_errors():
+    def function(x):
+        time.sleep(0.01 * (5 - x % 5))
+        if x == 3:
+            raise ValueError(x)
+        return x * 2
+
+    stats = prefetch.StageStats("test_read", workers=4)
+    results = list(prefetch.prefetch(function, range(10), workers=4, ahead=4, stats=stats))
+
+    assert [item for item, _, _ in results] == list(range(10))
+    assert [result for item, result, _ in results if item != 3] == [x * 2 for x in range(10) if x != 3]
+    assert isinstance(results[3][2], ValueError)
+    assert stats.count == 10
+
+
+def test_prefetch_stays_ahead_by_at_most_ahead():
+    started = []
+
+    reader = prefetch.prefetch(started.append, range(100), workers=2, ahead=3)
+    next(reader)
+    time.sleep(0.05)
+    reader.close()
+
+    assert len(started) <= 4
+
+
+def test_writer_pool():
+    written = []
+    lock = threading.Lock()
+
+    def write(x):
+        time.sleep(0.001)
+        with lock:
+            written.append(x)
+
+    with prefetch.WriterPool(workers=1, max_pending=2) as writer:
+        for i in range(10):
+            writer.submit(write, i)
+
+    assert written == list(range(10))
+
+    def fail():
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        with prefetch.WriterPool() as writer:
+            writer.submit(fail)
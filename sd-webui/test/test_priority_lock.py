@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from modules import priority_lock
+
+
+def start_waiters(lock, specs, order):
+    """Starts a thread per (id_task, priority, client, timeout) that records the id once it gets the lock, or the exception type it got."""
+
+    def wait(id_task, priority, client, timeout):
+        try:
+            with lock.task(id_task, priority=priority, client=client, timeout=timeout):
+                order.append(id_task)
+        except (priority_lock.TaskCancelled, priority_lock.TaskExpired) as e:
+            order.append(type(e).__name__)
+
+    threads = []
+    for spec in specs:
+        thread = threading.Thread(target=wait, args=spec)
+        thread.start()
+        threads.append(thread)
+
+        # a waiter with a short timeout can expire before it is seen in the queue; it has recorded its exception then
+        deadline = time.time() + 5
+        while lock.stats()["queue_depth"] + len(order) < len(threads):
+            assert time.time() < deadline, f"waiter {spec[0]} did not get queued"
+            time.sleep(0.001)
+
+    return threads
+
+
+def test_priority_and_fairness():
+    lock = priority_lock.PriorityLock()
+    order = []
+
+    lock.acquire(id_task="running")
+    threads = start_waiters(lock, [
+        ("grid-1", "batch", "a", None),
+        ("grid-2", "batch", "a", None),
+        ("a-1", "normal", "a", None),
+        ("a-2", "normal", "a", None),
+        ("b-1", "normal", "b", None),
+        ("design", "interactive", "c", None),
+    ], order)
+    lock.release()
+
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert order == ["design", "a-1", "b-1", "a-2", "grid-1", "grid-2"]
+    assert lock.stats()["wait_time"]["batch"]["count"] == 2
+
+
+def test_cancel_and_deadline():
+    lock = priority_lock.PriorityLock()
+    order = []
+
+    lock.acquire(id_task="running")
+    threads = start_waiters(lock, [
+        ("stale", "normal", None, 0.01),
+        ("cancelled", "normal", None, None),
+        ("kept", "normal", None, None),
+    ], order)
+
+    assert lock.cancel("cancelled")
+    assert not lock.cancel("running")
+
+    time.sleep(0.05)
+    lock.release()
+
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert sorted(order) == ["TaskCancelled", "TaskExpired", "kept"]
+
+    stats = lock.stats()
+    assert stats["expired"] == 1
+    assert stats["cancelled"] == 1
+    assert not stats["locked"]
+
+
+def test_unknown_priority():
+    with pytest.raises(ValueError):
+        priority_lock.PriorityLock().acquire(priority="urgent")
@@ -0,0 +1,94 @@
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+
+from modules.paths_internal import script_path
+
+spec = importlib.util.spec_from_file_location("soft_inpainting", os.path.join(script_path, "extensions-builtin", "soft-inpainting", "scripts", "soft_inpainting.py"))
+soft_inpainting = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(soft_inpainting)
+
+
+def weighted_histogram_filter_reference(img, kernel, kernel_center, percentile_min=0.0, percentile_max=1.0, min_width=1.0):
+    """The original per-pixel implementation of the filter, kept to check the vectorized one against."""
+
+    kernel_min = -np.array(kernel_center)
+    kernel_max = np.array(kernel.shape) - kernel_center
+
+    def single(idx):
+        idx = np.array(idx)
+        min_index = np.maximum(0, idx + kernel_min)
+        max_index = np.minimum(np.array(img.shape), idx + kernel_max)
+
+        values = []
+        for window_index in np.ndindex(tuple(max_index - min_index)):
+            image_index = np.array(window_index) + min_index
+            kernel_index = image_index - idx + kernel_center
+            values.append([img[tuple(image_index)], kernel[tuple(kernel_index)], 0.0, 0.0])
+
+        values.sort(key=lambda x: x[0])
+
+        total = 0
+        for element in values:
+            element[2] = total
+            total += element[1]
+            element[3] = total
+
+        window_min = total * percentile_min
+        window_max = total * percentile_max
+
+        if window_max - window_min < min_width:
+            window_center = (window_min + window_max) / 2
+            window_min = window_center - min_width / 2
+            window_max = window_center + min_width / 2
+
+            if window_max > total:
+                window_max = total
+                window_min = total - min_width
+
+            if window_min < 0:
+                window_min = 0
+                window_max = min_width
+
+        value = 0
+        value_weight = 0
+        for element_value, _, element_min, element_max in values:
+            if window_min >= element_max:
+                continue
+            if window_max <= element_min:
+                break
+
+            w = min(window_max, element_max) - max(window_min, element_min)
+            value += element_value * w
+            value_weight += w
+
+        return value / value_weight if value_weight != 0 else 0
+
+    img_out = img.copy()
+    for index in np.ndindex(img.shape):
+        img_out[index] = single(index)
+
+    return img_out
+
+
+@pytest.mark.parametrize("percentile_min,percentile_max,min_width", [
+    (0.9, 1, 1),
+    (0.25, 0.75, 1),
+    (0, 1, 1),
+    (0.5, 0.5, 0.5),
+    (0, 0, 2),
+])
+@pytest.mark.parametrize("shape", [(17, 23), (3, 2), (1, 9)])
+def test_weighted_histogram_filter_parity(percentile_min, percentile_max, min_width, shape):
+    rng = np.random.default_rng(0)
+    img = rng.random(shape, dtype=np.float32) * 4
+    img[0, 0] = img[-1, -1]  # ties
+    kernel, kernel_center = soft_inpainting.get_gaussian_kernel(stddev_radius=1.5, max_radius=2)
+
+    expected = weighted_histogram_filter_reference(img, kernel, kernel_center, percentile_min, percentile_max, min_width)
+    actual = soft_inpainting.weighted_histogram_filter(img, kernel, kernel_center, percentile_min, percentile_max, min_width, rows_per_chunk=4)
+
+    assert actual.dtype == img.dtype
+    np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-6)
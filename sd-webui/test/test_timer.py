@@ -0,0 +1,34 @@
+import json
+
+from modules import timer
+
+
+def record(total, **records):
+    return {"total": total, "records": records}
+
+
+def test_write_benchmark_reports_slower_phases(tmp_path):
+    filename = str(tmp_path / "startup.jsonl")
+
+    for total in (10.0, 11.0, 10.5):
+        assert timer.write_benchmark(filename, "api fast", record(total, imports=5.0, scripts=2.0)) == []
+
+    timer.write_benchmark(filename, "webui", record(60.0, imports=5.0, scripts=40.0))
+
+    slower = timer.write_benchmark(filename, "api fast", record(14.0, imports=5.2, scripts=4.0))
+    assert slower == [("total", 14.0, 10.5), ("scripts", 4.0, 2.0)]
+
+    with open(filename, encoding="utf8") as file:
+        entries = [json.loads(line) for line in file]
+
+    assert [x["profile"] for x in entries] == ["api fast"] * 3 + ["webui", "api fast"]
+    assert entries[-1]["records"] == {"imports": 5.2, "scripts": 4.0}
+
+
+def test_write_benchmark_ignores_new_phases_and_bad_lines(tmp_path):
+    filename = tmp_path / "startup.jsonl"
+    filename.write_text("not json\n", encoding="utf8")
+
+    timer.write_benchmark(str(filename), "api", record(10.0, imports=5.0))
+
+    assert timer.write_benchmark(str(filename), "api", record(10.1, imports=5.0, deferred=30.0)) == []
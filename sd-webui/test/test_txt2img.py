@@ -1,3 +1,4 @@
+import base64
 
 import pytest
 import requests
@@ -88,3 +89,20 @@ def test_txt2img_multiple_batches_performed(url_txt2img, simple_txt2img_request)
 def test_txt2img_batch_performed(url_txt2img, simple_txt2img_request):
     simple_txt2img_request["batch_size"] = 2
     assert requests.post(url_txt2img, json=simple_txt2img_request).status_code == 200
+
+
+@pytest.mark.parametrize("image_format,magic", [("jpeg", b"\xff\xd8"), ("webp", b"RIFF"), ("png", b"\x89PNG")])
+def test_txt2img_image_format(url_txt2img, simple_txt2img_request, image_format, magic):
+    simple_txt2img_request["batch_size"] = 2
+    simple_txt2img_request["image_format"] = image_format
+    simple_txt2img_request["image_quality"] = 1 if image_format == "png" else 90
+    response = requests.post(url_txt2img, json=simple_txt2img_request)
+    assert response.status_code == 200
+    assert all(base64.b64decode(image).startswith(magic) for image in response.json()["images"])
+
+
+@pytest.mark.parametrize("image_format,image_quality", [("png", 50), ("jpeg", 0), ("webp", 101), ("bmp", None)])
+def test_txt2img_invalid_image_encoding(url_txt2img, simple_txt2img_request, image_format, image_quality):
+    simple_txt2img_request["image_format"] = image_format
+    simple_txt2img_request["image_quality"] = image_quality
+    assert requests.post(url_txt2img, json=simple_txt2img_request).status_code == 422
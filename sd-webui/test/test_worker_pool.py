@@ -0,0 +1,55 @@
+import json
+import time
+
+from modules import worker_pool
+
+
+def test_jobs_are_spread_over_free_workers():
+    pool = worker_pool.WorkerPool([worker_pool.StubWorker("a", step_time=0.005), worker_pool.StubWorker("b", step_time=0.005)])
+
+    jobs = [pool.submit(f"task-{i}", "txt2img", {"steps": 4}) for i in range(6)]
+    results = [job.future.result(timeout=10) for job in jobs]
+    pool.stop()
+
+    assert [json.loads(res["info"])["id_task"] for res in results] == [f"task-{i}" for i in range(6)]
+    assert {json.loads(res["info"])["worker"] for res in results} == {"a", "b"}
+    assert sum(worker.jobs_done for worker in pool.workers) == 6
+
+
+def test_worker_progress_and_interrupt():
+    worker = worker_pool.StubWorker("slow", step_time=0.05)
+    pool = worker_pool.WorkerPool([worker])
+
+    job = pool.submit("task-long", "txt2img", {"steps": 1000})
+    queued = pool.submit("task-queued", "txt2img", {"steps": 1})
+
+    while not worker.busy:
+        time.sleep(0.01)
+
+    assert pool.queued_tasks() == ["task-queued"]
+    assert pool.progress()[0]["current_task"] == "task-long"
+
+    pool.interrupt()
+    job.future.result(timeout=10)
+    queued.future.result(timeout=10)
+    pool.stop()
+
+    assert worker.jobs_done == 2
+
+
+def test_unreachable_worker_does_not_stop_interrupt():
+    unreachable = worker_pool.RemoteWorker("unreachable", "http://127.0.0.1:9")
+    stub = worker_pool.StubWorker("stub", step_time=0.05)
+    pool = worker_pool.WorkerPool([unreachable, stub])
+
+    unreachable.busy = True
+    job = pool.submit("task-long", "txt2img", {"steps": 1000})
+
+    while not stub.busy:
+        time.sleep(0.01)
+
+    pool.interrupt()
+    job.future.result(timeout=10)
+    pool.stop()
+
+    assert stub.jobs_done == 1
@@ -0,0 +1,71 @@
+import importlib.util
+import os
+from types import SimpleNamespace
+
+from modules.paths_internal import script_path
+
+spec = importlib.util.spec_from_file_location("xyz_grid", os.path.join(script_path, "scripts", "xyz_grid.py"))
+xyz_grid = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(xyz_grid)
+
+
+def test_plan_runs_orders_by_switch_keys():
+    cells = ["a", "b", "c", "d", "e"]
+    switch_keys = {"a": ("ckpt1", "vae1"), "b": ("ckpt2", "vae1"), "c": ("ckpt1", "vae2"), "d": ("ckpt2", "vae2"), "e": ("ckpt1", "vae1")}
+    batch_keys = dict.fromkeys(cells)
+
+    runs = xyz_grid.plan_runs(cells, switch_keys, batch_keys, batch_size=8)
+
+    assert runs == [["a"], ["e"], ["c"], ["b"], ["d"]]
+
+
+def test_plan_runs_groups_batches():
+    cells = [(ix, iy) for iy in range(2) for ix in range(3)]
+    switch_keys = {cell: ("ckpt",) for cell in cells}
+    batch_keys = {(ix, iy): (("ckpt",), iy) for ix, iy in cells}
+
+    runs = xyz_grid.plan_runs(cells, switch_keys, batch_keys, batch_size=2)
+
+    assert runs == [[(0, 0), (1, 0)], [(2, 0)], [(0, 1), (1, 1)], [(2, 1)]]
+    assert sorted(cell for run in runs for cell in run) == sorted(cells)
+
+
+def test_plan_runs_unbatched():
+    cells = ["a", "b", "c"]
+    switch_keys = {cell: ("ckpt",) for cell in cells}
+    batch_keys = {"a": "key", "b": "key", "c": None}
+
+    assert xyz_grid.plan_runs(cells, switch_keys, batch_keys, batch_size=1) == [["a"], ["b"], ["c"]]
+    assert xyz_grid.plan_runs(cells, switch_keys, batch_keys, batch_size=0) == [["a"], ["b"], ["c"]]
+    assert xyz_grid.plan_runs(cells, switch_keys, batch_keys, batch_size=4) == [["a", "b"], ["c"]]
+
+
+def make_p(**kwargs):
+    return SimpleNamespace(**{"prompt": "a dress", "seed": 1, "steps": 20, "script_args": [], **kwargs})
+
+
+def test_grid_key():
+    axes = [["Steps", ["10", "20"]]]
+
+    assert xyz_grid.grid_key(make_p(), axes) == xyz_grid.grid_key(make_p(), axes)
+    assert xyz_grid.grid_key(make_p(), axes) != xyz_grid.grid_key(make_p(prompt="a coat"), axes)
+    assert xyz_grid.grid_key(make_p(), axes) != xyz_grid.grid_key(make_p(seed=2), axes)
+    assert xyz_grid.grid_key(make_p(), axes) != xyz_grid.grid_key(make_p(), [["Steps", ["10", "30"]]])
+
+
+def test_prune_progress_keeps_newest(tmp_path, monkeypatch):
+    monkeypatch.setattr(xyz_grid, "progress_dir", str(tmp_path))
+
+    for i, name in enumerate(["oldest", "old", "current", "new"]):
+        (tmp_path / name).mkdir()
+        os.utime(tmp_path / name, (1000 + i, 1000 + i))
+
+    xyz_grid.prune_progress(keep=1, exclude=str(tmp_path / "oldest"))
+
+    assert sorted(os.listdir(tmp_path)) == ["new", "oldest"]
+
+
+def test_prune_progress_without_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(xyz_grid, "progress_dir", str(tmp_path / "missing"))
+
+    xyz_grid.prune_progress(keep=0)
@@ -24,6 +24,7 @@ def create_api(app):
 
 
 def api_only():
+    from threading import Thread
     from fastapi import FastAPI
     from modules.shared_cmd_options import cmd_opts
 
@@ -37,7 +38,13 @@ def api_only():
     script_callbacks.before_ui_callback()
     script_callbacks.app_started_callback(None, app)
 
+    timer.startup_record = startup_timer.dump()
     print(f"Startup time: {startup_timer.summary()}.")
+
+    if cmd_opts.startup_benchmark:
+        profile = "api fast" if initialize.api_fast_startup() else "api"
+        Thread(target=initialize_util.write_startup_benchmark, args=(profile, ), name="startup benchmark", daemon=True).start()
+
     api.launch(
         server_name=initialize_util.gradio_server_name(),
         port=cmd_opts.port if cmd_opts.port else 7861,
@@ -50,6 +57,7 @@ def webui():
 
     launch_api = cmd_opts.api
     initialize.initialize()
+    profile = "webui"
 
     from modules import shared, ui_tempdir, script_callbacks, ui, progress, ui_extra_networks
 
@@ -120,6 +128,7 @@ def webui():
 
         timer.startup_record = startup_timer.dump()
         print(f"Startup time: {startup_timer.summary()}.")
+        initialize_util.write_startup_benchmark(profile)
 
         try:
             while True:
@@ -143,6 +152,7 @@ def webui():
         os.environ.setdefault('SD_WEBUI_RESTARTING', '1')
 
         print('Restarting UI...')
+        profile = "webui reload"
         shared.demo.close()
         time.sleep(0.5)
         startup_timer.reset()
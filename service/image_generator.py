@@ -3,10 +3,26 @@ Image generation service for Fashion Design.
 """
 import os
 import base64
+import json
+import random
 import requests
 from datetime import datetime
 from uuid import uuid4
 
+# Previews are generated with few steps at a fraction of the size
+PREVIEW_STEPS = 6
+PREVIEW_SCALE = 0.5
+
+# Variations start from the design's image, so only this share of the steps is sampled
+VARIATION_DENOISING = 0.45
+VARIATION_SUBSEED_STRENGTH = 0.5
+
+
+def preview_size(width, height):
+    """Size of the preview of a design of the given size, rounded down to a multiple of 8."""
+    return max(64, int(width * PREVIEW_SCALE) // 8 * 8), max(64, int(height * PREVIEW_SCALE) // 8 * 8)
+
+
 class ImageGenerator:
     def __init__(self, webui_url="http://127.0.0.1:7860", output_dir="service/static/images", sd_model_checkpoint="chilloutmix_NiPrunedFp32Fix"):
         self.webui_url = webui_url
@@ -19,29 +35,29 @@ class ImageGenerator:
         self.default_negative_prompt = "EasyNegative, paintings, sketches, (worst quality:2), (low quality:2), (normal quality:2), lowres, normal quality, ((monochrome)), ((grayscale)), skin spots, acnes, skin blemishes, age spot, ,extra fingers,fewer fingers, strange fingers, bad hand, fat ass, hole, naked, fat thigh,6 fingers, underwear, nsfw, nude,leg open, fat"
         self.lora = "<lora:fashion-lora:1.3>,"
 
-    def generate_image(self, prompt, negative_prompt=None, width=512, height=1024, steps=20):
+    def build_payload(self, prompt, width, height, steps, seed=-1):
         """
-        Generate an image using the web UI.
-        
+        Build the txt2img request for a design prompt.
+
         Args:
             prompt (str): The main prompt for image generation
-            negative_prompt (str, optional): Negative prompt. Defaults to None.
-            width (int, optional): Image width. Defaults to 512.
-            height (int, optional): Image height. Defaults to 1024.
-            steps (int, optional): Number of steps. Defaults to 20.
-            
+            width (int): Image width
+            height (int): Image height
+            steps (int): Number of steps
+            seed (int, optional): Seed, -1 for a random one. Defaults to -1.
+
         Returns:
-            str: Path to the generated image
+            dict: The txt2img payload
         """
         final_prompt = self.lora + "(" + prompt + ": 1.4)" + self.general_prompt
-        # Prepare the payload
-        payload = {
+        return {
             "prompt": final_prompt,
             #"negative_prompt": negative_prompt or self.default_negative_prompt,
             "negative_prompt": self.default_negative_prompt,
             "steps": steps,
             "width": width,
             "height": height,
+            "seed": seed,
             "sampler_name": "DPM++ SDE", 
             "sampler_index": "DPM++ SDE",
             "cfg_scale": 7,
@@ -51,29 +67,178 @@ class ImageGenerator:
             #}
         }
 
+    def txt2img(self, payload, suffix=""):
+        """
+        Send a txt2img request to the web UI and save the image it returns.
+
+        Args:
+            payload (dict): The txt2img payload
+            suffix (str, optional): Added to the file name, e.g. "_preview". Defaults to "".
+
+        Returns:
+            tuple: (path to the generated image, generation info from the web UI)
+        """
+        return self.request_image("txt2img", payload, suffix)
+
+    def img2img(self, payload, suffix=""):
+        """
+        Send an img2img request to the web UI and save the image it returns.
+
+        Args:
+            payload (dict): The img2img payload, with init_images
+            suffix (str, optional): Added to the file name, e.g. "_variation". Defaults to "".
+
+        Returns:
+            tuple: (path to the generated image, generation info from the web UI)
+        """
+        return self.request_image("img2img", payload, suffix)
+
+    def request_image(self, endpoint, payload, suffix=""):
+        """
+        Send a request to a web UI image generation endpoint and save the image it returns.
+
+        Args:
+            endpoint (str): "txt2img" or "img2img"
+            payload (dict): The request payload
+            suffix (str, optional): Added to the file name. Defaults to "".
+
+        Returns:
+            tuple: (path to the generated image, generation info from the web UI, like the seed used; {} if it has none)
+        """
         try:
             # Send request to web UI
             response = requests.post(
-                f"{self.webui_url}/sdapi/v1/txt2img",
+                f"{self.webui_url}/sdapi/v1/{endpoint}",
                 json=payload
             )
             response.raise_for_status()
             
-            # Get the image data
-            image_data = response.json()['images'][0]
+            # Get the image data and the parameters it was generated with
+            result = response.json()
+            image_data = result['images'][0]
+            try:
+                info = json.loads(result.get('info') or '{}')
+            except ValueError:
+                info = {}
             
             # Generate unique filename
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{timestamp}_{uuid4()}.png"
+            filename = f"{timestamp}_{uuid4()}{suffix}.png"
             filepath = os.path.join(self.output_dir, filename)
             
             # Save the image
             with open(filepath, 'wb') as f:
                 f.write(base64.b64decode(image_data))
                 
-            return filepath
+            return filepath, info
             
         except requests.exceptions.RequestException as e:
             raise Exception(f"Failed to generate image: {str(e)}")
         except Exception as e:
-            raise Exception(f"Error during image generation: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Error during image generation: {str(e)}")
+
+    def generate_image(self, prompt, negative_prompt=None, width=512, height=1024, steps=20, seed=-1):
+        """
+        Generate an image using the web UI.
+        
+        Args:
+            prompt (str): The main prompt for image generation
+            negative_prompt (str, optional): Negative prompt. Defaults to None.
+            width (int, optional): Image width. Defaults to 512.
+            height (int, optional): Image height. Defaults to 1024.
+            steps (int, optional): Number of steps. Defaults to 20.
+            seed (int, optional): Seed, -1 for a random one. Defaults to -1.
+            
+        Returns:
+            tuple: (path to the generated image, seed it was generated with, or None if the web UI did not say)
+        """
+        filepath, info = self.txt2img(self.build_payload(prompt, width, height, steps, seed))
+        return filepath, info.get('seed', seed if seed != -1 else None)
+
+    def generate_preview(self, prompt, negative_prompt=None, width=512, height=1024, seed=None):
+        """
+        Generate a cheap preview of a design: PREVIEW_STEPS steps at PREVIEW_SCALE of the size, decoded with TAESD.
+
+        Args:
+            prompt (str): The main prompt for image generation
+            negative_prompt (str, optional): Negative prompt. Defaults to None.
+            width (int, optional): Width of the full render. Defaults to 512.
+            height (int, optional): Height of the full render. Defaults to 1024.
+            seed (int, optional): Seed; a random one is picked if None. Defaults to None.
+
+        Returns:
+            tuple: (path to the preview image, seed), to pass to render_design() if the design is kept
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+
+        preview_width, preview_height = preview_size(width, height)
+        payload = self.build_payload(prompt, preview_width, preview_height, PREVIEW_STEPS, seed)
+        payload["preview"] = True
+
+        filepath, _ = self.txt2img(payload, suffix="_preview")
+        return filepath, seed
+
+    def render_design(self, prompt, seed, preview_path, width=512, height=1024, steps=20, denoising_strength=0.5):
+        """
+        Render a kept preview at full quality with a hires pass from the preview image, so the composition stays the same.
+
+        Args:
+            prompt (str): The main prompt the preview was made with
+            seed (int): The seed generate_preview() returned
+            preview_path (str): The preview image
+            width (int, optional): Image width. Defaults to 512.
+            height (int, optional): Image height. Defaults to 1024.
+            steps (int, optional): Number of steps. Defaults to 20.
+            denoising_strength (float, optional): Denoising strength of the hires pass. Defaults to 0.5.
+
+        Returns:
+            str: Path to the generated image
+        """
+        preview_width, preview_height = preview_size(width, height)
+        payload = self.build_payload(prompt, preview_width, preview_height, steps, seed)
+
+        with open(preview_path, 'rb') as f:
+            payload["firstpass_image"] = base64.b64encode(f.read()).decode('ascii')
+        payload["enable_hr"] = True
+        payload["hr_resize_x"] = width
+        payload["hr_resize_y"] = height
+        payload["denoising_strength"] = denoising_strength
+
+        filepath, _ = self.txt2img(payload)
+        return filepath
+
+    def generate_variation(self, prompt, source_path, seed=None, width=512, height=1024, steps=20, subseed=None, denoising_strength=VARIATION_DENOISING, subseed_strength=VARIATION_SUBSEED_STRENGTH):
+        """
+        Generate a variation of a design with img2img from its image at a low denoising strength.
+
+        The web UI samples only about denoising_strength of the steps, so a variation costs a fraction of a new design.
+        The design's seed is reused with a new subseed mixed in, so the variations of a design differ from each other
+        but stay close to it.
+
+        Args:
+            prompt (str): The main prompt the design was made with
+            source_path (str): The design's image
+            seed (int, optional): The design's seed; a random one is used if None. Defaults to None.
+            width (int, optional): Image width. Defaults to 512.
+            height (int, optional): Image height. Defaults to 1024.
+            steps (int, optional): Number of steps at full denoising strength. Defaults to 20.
+            subseed (int, optional): Subseed; a random one is picked if None. Defaults to None.
+            denoising_strength (float, optional): How far the variation may move from the design. Defaults to VARIATION_DENOISING.
+            subseed_strength (float, optional): How much of the noise comes from the subseed. Defaults to VARIATION_SUBSEED_STRENGTH.
+
+        Returns:
+            tuple: (path to the variation image, subseed)
+        """
+        if subseed is None:
+            subseed = random.randrange(2 ** 32)
+
+        payload = self.build_payload(prompt, width, height, steps, seed if seed is not None else -1)
+        with open(source_path, 'rb') as f:
+            payload["init_images"] = [base64.b64encode(f.read()).decode('ascii')]
+        payload["denoising_strength"] = denoising_strength
+        payload["subseed"] = subseed
+        payload["subseed_strength"] = subseed_strength
+
+        filepath, _ = self.img2img(payload, suffix="_variation")
+        return filepath, subseed
@@ -6,7 +6,7 @@ All of the models are stored in this module
 import logging
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, String, Integer, DateTime
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, inspect, text
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 
@@ -36,6 +36,13 @@ class FashionDesign(db.Model):
     height = Column(Integer, nullable=False)
     file_path = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    # a design starts as a "preview" and becomes "final" once it is kept and rendered at full quality
+    status = Column(String(16), nullable=True, default="final")
+    seed = Column(BigInteger, nullable=True)
+    preview_path = Column(String, nullable=True)
+    # variations are made from another design's image with its seed and a subseed of their own
+    parent_id = Column(String(36), nullable=True)
+    subseed = Column(BigInteger, nullable=True)
 
     def __repr__(self):
         """String representation of a FashionDesign"""
@@ -72,7 +79,12 @@ class FashionDesign(db.Model):
             "width": self.width,
             "height": self.height,
             "file_path": self.file_path,
-            "created_at": self.created_at.isoformat() if self.created_at else None
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "status": self.status,
+            "seed": self.seed,
+            "preview_path": self.preview_path,
+            "parent_id": self.parent_id,
+            "subseed": self.subseed
         }
 
     def deserialize(self, data):
@@ -91,6 +103,11 @@ class FashionDesign(db.Model):
             except (ValueError, TypeError):
                 raise DataValidationError("Invalid type for integer fields")
             self.file_path = data["file_path"]
+            self.status = data.get("status", "final")
+            self.seed = data.get("seed")
+            self.preview_path = data.get("preview_path")
+            self.parent_id = data.get("parent_id")
+            self.subseed = data.get("subseed")
         except KeyError as error:
             raise DataValidationError("Invalid FashionDesign: missing " + error.args[0])
         except TypeError as error:
@@ -108,6 +125,18 @@ class FashionDesign(db.Model):
         db.init_app(app)
         app.app_context().push()
         db.create_all()  # make our SQLAlchemy tables
+        cls.add_missing_columns()
+
+    @classmethod
+    def add_missing_columns(cls):
+        """Adds columns that were added to the model after its table was created, which create_all() does not do"""
+        existing = {column["name"] for column in inspect(db.engine).get_columns(cls.__tablename__)}
+        for column in cls.__table__.columns:
+            if column.name not in existing:
+                logger.info("Adding column %s to %s", column.name, cls.__tablename__)
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                db.session.execute(text(f"ALTER TABLE {cls.__tablename__} ADD COLUMN {column.name} {column_type}"))
+        db.session.commit()
 
     @classmethod
     def all(cls):
@@ -32,7 +32,7 @@ def create_design():
     
     try:
         # Generate the image
-        file_path = image_generator.generate_image(
+        file_path, seed = image_generator.generate_image(
             prompt=data['prompt'],
             negative_prompt=data.get('negative_prompt', ''),
             width=data.get('width', 512),
@@ -45,7 +45,8 @@ def create_design():
             negative_prompt=data.get('negative_prompt', ''),
             width=data.get('width', 512),
             height=data.get('height', 512),
-            file_path=file_path
+            file_path=file_path,
+            seed=seed
         )
         
         db.session.add(design)
@@ -55,6 +56,133 @@ def create_design():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@fashion_design_bp.route('/designs/previews', methods=['POST'])
+def create_preview():
+    """Create a design from a quick low-step preview; keep it with POST /designs/<id>/keep."""
+    data = request.get_json()
+    
+    # Validate required fields
+    if not data or 'prompt' not in data:
+        return jsonify({'error': 'Prompt is required'}), 400
+    
+    try:
+        # Generate the preview
+        file_path, seed = image_generator.generate_preview(
+            prompt=data['prompt'],
+            negative_prompt=data.get('negative_prompt', ''),
+            width=data.get('width', 512),
+            height=data.get('height', 512),
+            seed=data.get('seed')
+        )
+        
+        # Create new design, rendered at full quality only if it is kept
+        design = FashionDesign(
+            prompt=data['prompt'],
+            negative_prompt=data.get('negative_prompt', ''),
+            width=data.get('width', 512),
+            height=data.get('height', 512),
+            file_path=file_path,
+            status='preview',
+            seed=seed,
+            preview_path=file_path
+        )
+        
+        db.session.add(design)
+        db.session.commit()
+        return jsonify(design.serialize()), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@fashion_design_bp.route('/designs/<string:design_id>/keep', methods=['POST'])
+def keep_design(design_id):
+    """Render a previewed design at full quality with a hires pass from the preview."""
+    design = FashionDesign.query.get(design_id)
+    if not design:
+        return jsonify({'error': 'Design not found'}), 404
+    if design.status != 'preview':
+        return jsonify(design.serialize())
+    
+    data = request.get_json(silent=True) or {}
+    options = {}
+    try:
+        if 'denoising_strength' in data:
+            options['denoising_strength'] = float(data['denoising_strength'])
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid denoising_strength'}), 400
+    if not 0 < options.get('denoising_strength', 0.5) <= 1:
+        return jsonify({'error': 'denoising_strength must be between 0 and 1'}), 400
+    
+    try:
+        design.file_path = image_generator.render_design(
+            prompt=design.prompt,
+            seed=design.seed,
+            preview_path=design.preview_path,
+            width=design.width,
+            height=design.height,
+            **options
+        )
+        design.status = 'final'
+        db.session.commit()
+        return jsonify(design.serialize())
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@fashion_design_bp.route('/designs/<string:design_id>/variations', methods=['POST'])
+def create_variation(design_id):
+    """Create a variation of a design with img2img from its image, reusing its seed with a new subseed."""
+    design = FashionDesign.query.get(design_id)
+    if not design:
+        return jsonify({'error': 'Design not found'}), 404
+    if design.status == 'preview':
+        return jsonify({'error': 'Keep the preview before making variations of it'}), 409
+    if not design.file_path or not os.path.isfile(design.file_path):
+        return jsonify({'error': 'Design image not found'}), 409
+    
+    data = request.get_json(silent=True) or {}
+    options = {}
+    try:
+        if 'denoising_strength' in data:
+            options['denoising_strength'] = float(data['denoising_strength'])
+        if 'subseed' in data:
+            options['subseed'] = int(data['subseed'])
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid denoising_strength or subseed'}), 400
+    if not 0 < options.get('denoising_strength', 0.5) <= 1:
+        return jsonify({'error': 'denoising_strength must be between 0 and 1'}), 400
+    
+    try:
+        # Generate the variation
+        file_path, subseed = image_generator.generate_variation(
+            prompt=design.prompt,
+            source_path=design.file_path,
+            seed=design.seed,
+            width=design.width,
+            height=design.height,
+            **options
+        )
+        
+        # Create new design for the variation
+        variation = FashionDesign(
+            prompt=design.prompt,
+            negative_prompt=design.negative_prompt,
+            width=design.width,
+            height=design.height,
+            file_path=file_path,
+            status='final',
+            seed=design.seed,
+            parent_id=design.id,
+            subseed=subseed
+        )
+        
+        db.session.add(variation)
+        db.session.commit()
+        return jsonify(variation.serialize()), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @fashion_design_bp.route('/designs/<string:design_id>', methods=['GET'])
 def get_design(design_id):
     """Get a specific fashion design by ID."""
@@ -71,9 +199,12 @@ def delete_design(design_id):
         return jsonify({'error': 'Design not found'}), 404
     
     try:
-        # Remove the image file if it exists
-        if design.file_path and os.path.isfile(design.file_path):
-            os.remove(design.file_path)
+        # Remove the image files if they exist
+        for path in {design.file_path, design.preview_path}:
+            if path and os.path.isfile(path):
+                os.remove(path)
+        # Variations of the design stay, as designs of their own
+        FashionDesign.query.filter_by(parent_id=design.id).update({'parent_id': None})
         db.session.delete(design)
         db.session.commit()
         return '', 204
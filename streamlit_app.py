@@ -115,6 +115,19 @@ def create_design(prompt):
     except Exception as e:
         return None, f"Error creating design: {str(e)}"
 
+def create_variation(design_id, denoising_strength):
+    """Create a variation of a design using the API"""
+    try:
+        response = requests.post(
+            f"{API_BASE_URL}/designs/{design_id}/variations",
+            json={"denoising_strength": denoising_strength}
+        )
+        if response.status_code == 201:
+            return response.json(), None
+        return None, f"Error creating variation: {response.text}"
+    except Exception as e:
+        return None, f"Error creating variation: {str(e)}"
+
 def get_design(design_id):
     """Fetch a specific design from the API"""
     try:
@@ -249,6 +262,23 @@ def show_design():
                     mime="image/png"
                 )
             
+            variation_strength = st.slider(
+                "Variation strength",
+                min_value=0.2,
+                max_value=0.8,
+                value=0.45,
+                step=0.05,
+                help="How far a variation may move from this design; lower is faster"
+            )
+            if st.button("Variation of This Design"):
+                with st.spinner("Generating variation..."):
+                    variation, error = create_variation(design["id"], variation_strength)
+                if error:
+                    st.error(error)
+                else:
+                    st.session_state.current_design = variation
+                    st.rerun()
+            
             if st.button("New Design with Same Prompt"):
                 st.session_state.create_prompt = design["prompt"]
                 st.session_state.current_page = "Create"
@@ -3,7 +3,7 @@ Tests for the image generator module.
 """
 import os
 import pytest
-from service.image_generator import ImageGenerator
+from service.image_generator import ImageGenerator, preview_size
 import requests
 
 @pytest.fixture
@@ -38,7 +38,7 @@ def test_generate_image_success(image_generator, monkeypatch):
     monkeypatch.setattr("base64.b64decode", mock_b64decode)
     
     # Test image generation
-    filepath = image_generator.generate_image(
+    filepath, seed = image_generator.generate_image(
         prompt="test prompt",
         negative_prompt="test negative prompt",
         width=512,
@@ -77,4 +77,76 @@ def test_generate_image_invalid_response(image_generator, monkeypatch):
     
     with pytest.raises(Exception) as exc_info:
         image_generator.generate_image("test prompt")
-    assert "Error during image generation" in str(exc_info.value) 
\ No newline at end of file
+    assert "Error during image generation" in str(exc_info.value) 
+
+def test_generate_preview(image_generator, monkeypatch):
+    """Test that previews are small, low-step and use TAESD, and that the seed is kept."""
+    payloads = []
+    def mock_post(url, json):
+        payloads.append(json)
+        class MockResponse:
+            def raise_for_status(self):
+                pass
+            def json(self):
+                return {"images": ["aW1hZ2U="]}
+        return MockResponse()
+    monkeypatch.setattr("requests.post", mock_post)
+
+    filepath, seed = image_generator.generate_preview("test prompt", width=512, height=1024)
+
+    assert os.path.exists(filepath)
+    assert payloads[0]["preview"] is True
+    assert payloads[0]["seed"] == seed
+    assert (payloads[0]["width"], payloads[0]["height"]) == preview_size(512, 1024)
+    assert payloads[0]["steps"] < 20
+
+    # the full render is a hires pass from the preview, with the same seed
+    image_generator.render_design("test prompt", seed, filepath, width=512, height=1024)
+    assert payloads[1]["seed"] == seed
+    assert "preview" not in payloads[1]
+    assert payloads[1]["enable_hr"] is True
+    assert payloads[1]["firstpass_image"] == "aW1hZ2U="
+    assert (payloads[1]["width"], payloads[1]["height"]) == preview_size(512, 1024)
+    assert (payloads[1]["hr_resize_x"], payloads[1]["hr_resize_y"]) == (512, 1024)
+
+def test_generate_variation(image_generator, monkeypatch, tmp_path):
+    """Test that variations are made with img2img from the design's image, its seed and a new subseed."""
+    requests_made = []
+    def mock_post(url, json):
+        requests_made.append((url, json))
+        class MockResponse:
+            def raise_for_status(self):
+                pass
+            def json(self):
+                return {"images": ["aW1hZ2U="]}
+        return MockResponse()
+    monkeypatch.setattr("requests.post", mock_post)
+
+    source = tmp_path / "design.png"
+    source.write_bytes(b"image")
+    filepath, subseed = image_generator.generate_variation("test prompt", str(source), seed=1234, width=512, height=1024)
+
+    assert os.path.exists(filepath)
+    url, payload = requests_made[0]
+    assert url.endswith("/sdapi/v1/img2img")
+    assert payload["init_images"] == ["aW1hZ2U="]
+    assert payload["seed"] == 1234
+    assert payload["subseed"] == subseed
+    assert 0 < payload["denoising_strength"] < 1
+    assert (payload["width"], payload["height"]) == (512, 1024)
+
+def test_generate_image_seed(image_generator, monkeypatch):
+    """Test that the seed the web UI picked is returned."""
+    def mock_post(url, json):
+        class MockResponse:
+            def raise_for_status(self):
+                pass
+            def json(self):
+                return {"images": ["aW1hZ2U="], "info": '{"seed": 1234, "subseed": 5678}'}
+        return MockResponse()
+    monkeypatch.setattr("requests.post", mock_post)
+
+    filepath, seed = image_generator.generate_image("test prompt")
+
+    assert os.path.exists(filepath)
+    assert seed == 1234
@@ -173,4 +173,133 @@ def test_search_designs_empty(client):
 def test_search_designs_missing_prompt(client):
     """Test searching designs without a prompt."""
     response = client.get('/designs/search')
-    assert response.status_code == 400 
\ No newline at end of file
+    assert response.status_code == 400 
+
+def test_create_preview(client, monkeypatch):
+    """Test creating a design from a preview."""
+    def mock_generate_preview(prompt, negative_prompt=None, width=512, height=1024, seed=None):
+        return "/path/to/preview.png", 1234
+    monkeypatch.setattr("service.routes.image_generator.generate_preview", mock_generate_preview)
+
+    response = client.post('/designs/previews', json={'prompt': 'New design', 'width': 512, 'height': 1024})
+    assert response.status_code == 201
+    assert response.json['status'] == 'preview'
+    assert response.json['seed'] == 1234
+    assert response.json['file_path'] == "/path/to/preview.png"
+    assert response.json['preview_path'] == "/path/to/preview.png"
+
+def test_create_preview_missing_prompt(client):
+    """Test creating a preview without a prompt."""
+    response = client.post('/designs/previews', json={'width': 512})
+    assert response.status_code == 400
+
+def test_keep_design(client, monkeypatch):
+    """Test rendering a kept preview with a hires pass from the preview."""
+    monkeypatch.setattr("service.routes.image_generator.generate_preview", lambda **kwargs: ("/path/to/preview.png", 1234))
+    calls = []
+    def mock_render_design(**kwargs):
+        calls.append(kwargs)
+        return "/path/to/final.png"
+    monkeypatch.setattr("service.routes.image_generator.render_design", mock_render_design)
+
+    design_id = client.post('/designs/previews', json={'prompt': 'New design', 'width': 512, 'height': 1024}).json['id']
+
+    response = client.post(f'/designs/{design_id}/keep')
+    assert response.status_code == 200
+    assert response.json['id'] == design_id
+    assert response.json['status'] == 'final'
+    assert response.json['file_path'] == "/path/to/final.png"
+    assert response.json['preview_path'] == "/path/to/preview.png"
+    assert calls == [{'prompt': 'New design', 'seed': 1234, 'preview_path': "/path/to/preview.png", 'width': 512, 'height': 1024}]
+
+    # a design that is already rendered is not rendered again
+    response = client.post(f'/designs/{design_id}/keep')
+    assert response.status_code == 200
+    assert len(calls) == 1
+
+def test_keep_design_denoising_strength(client, monkeypatch):
+    """Test keeping a preview with a given denoising strength."""
+    monkeypatch.setattr("service.routes.image_generator.generate_preview", lambda **kwargs: ("/path/to/preview.png", 1234))
+    calls = []
+    def mock_render_design(**kwargs):
+        calls.append(kwargs)
+        return "/path/to/final.png"
+    monkeypatch.setattr("service.routes.image_generator.render_design", mock_render_design)
+
+    design_id = client.post('/designs/previews', json={'prompt': 'New design'}).json['id']
+
+    response = client.post(f'/designs/{design_id}/keep', json={'denoising_strength': 2})
+    assert response.status_code == 400
+    assert calls == []
+
+    response = client.post(f'/designs/{design_id}/keep', json={'denoising_strength': 0.3})
+    assert response.status_code == 200
+    assert calls[0]['denoising_strength'] == 0.3
+
+def test_keep_nonexistent_design(client):
+    """Test keeping a design that doesn't exist."""
+    response = client.post('/designs/999/keep')
+    assert response.status_code == 404
+
+def test_create_design_stores_seed(client, monkeypatch):
+    """Test that a new design keeps the seed it was generated with."""
+    monkeypatch.setattr("service.routes.image_generator.generate_image", lambda **kwargs: ("/path/to/image.png", 1234))
+
+    response = client.post('/designs', json={'prompt': 'New design'})
+    assert response.status_code == 201
+    assert response.json['seed'] == 1234
+
+def test_create_variation(client, monkeypatch, tmp_path):
+    """Test creating a variation of a design."""
+    image = tmp_path / "design.png"
+    image.write_bytes(b"fake_image_data")
+    monkeypatch.setattr("service.routes.image_generator.generate_image", lambda **kwargs: (str(image), 1234))
+    calls = []
+    def mock_generate_variation(**kwargs):
+        calls.append(kwargs)
+        return "/path/to/variation.png", 5678
+    monkeypatch.setattr("service.routes.image_generator.generate_variation", mock_generate_variation)
+
+    design_id = client.post('/designs', json={'prompt': 'New design', 'width': 512, 'height': 1024}).json['id']
+
+    response = client.post(f'/designs/{design_id}/variations', json={'denoising_strength': 0.3})
+    assert response.status_code == 201
+    assert response.json['id'] != design_id
+    assert response.json['parent_id'] == design_id
+    assert response.json['seed'] == 1234
+    assert response.json['subseed'] == 5678
+    assert response.json['file_path'] == "/path/to/variation.png"
+    assert calls == [{'prompt': 'New design', 'source_path': str(image), 'seed': 1234, 'width': 512, 'height': 1024, 'denoising_strength': 0.3}]
+
+    # variations outlive the design they were made from
+    image.unlink()
+    variation_id = response.json['id']
+    assert client.delete(f'/designs/{design_id}').status_code == 204
+    response = client.get(f'/designs/{variation_id}')
+    assert response.status_code == 200
+    assert response.json['parent_id'] is None
+
+def test_create_variation_of_preview(client, monkeypatch, tmp_path):
+    """Test that variations are not made from a preview that was not kept."""
+    image = tmp_path / "preview.png"
+    image.write_bytes(b"fake_image_data")
+    monkeypatch.setattr("service.routes.image_generator.generate_preview", lambda **kwargs: (str(image), 1234))
+    design_id = client.post('/designs/previews', json={'prompt': 'New design'}).json['id']
+
+    response = client.post(f'/designs/{design_id}/variations')
+    assert response.status_code == 409
+
+def test_create_variation_bad_strength(client, monkeypatch, tmp_path):
+    """Test creating a variation with an invalid denoising strength."""
+    image = tmp_path / "design.png"
+    image.write_bytes(b"fake_image_data")
+    monkeypatch.setattr("service.routes.image_generator.generate_image", lambda **kwargs: (str(image), 1234))
+    design_id = client.post('/designs', json={'prompt': 'New design'}).json['id']
+
+    response = client.post(f'/designs/{design_id}/variations', json={'denoising_strength': 2})
+    assert response.status_code == 400
+
+def test_create_variation_nonexistent_design(client):
+    """Test creating a variation of a design that doesn't exist."""
+    response = client.post('/designs/999/variations')
+    assert response.status_code == 404